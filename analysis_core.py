@@ -0,0 +1,693 @@
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from article_archive import ArticleArchive, url_key
+from article_store import ArticleStore, FileNewsApiClient
+from hpr_engine import ABNORMAL_COLUMNS, compute_event_hprs_panel, events_frame
+from metrics import metrics_from_env
+from near_duplicates import NearDuplicateIndex
+from news_scheduler import TokenBucket
+from prewarm import Prewarmer, parse_windows
+from sentiment_backends import DEFAULT_BACKEND, load_backend
+from price_store import CsvPriceSource, PriceStore
+from result_cache import ResultCache
+from earnings_calendar import EarningsCalendar, fetch_yfinance_earnings
+from security_master import SecurityMaster, securities_from_ticker_labels
+from sentiment_index import NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD, SentimentIndex
+from sentiment_scoring import (
+    BatchSentimentScorer, SentimentAccumulator, SentimentMemo, load_vader,
+)
+
+# ─────────────────────────────────────────────
+# Compute core shared by the Streamlit UI and the batch scanner
+# ─────────────────────────────────────────────
+#
+# Nothing in here touches Streamlit: failures raise, and the callers decide
+# how to report them. Shared resources are process-wide singletons.
+
+load_dotenv()
+
+CACHE_DIR = os.getenv("SENTIMENT_CACHE_DIR", ".cache")
+
+# How far back NewsAPI serves articles on the free plan; longer windows are
+# read from the local article archive.
+LIVE_WINDOW_DAYS = 30
+
+# Finished analyses shared across sessions; see cached_sentiment / cached_event_hprs.
+sentiment_results = ResultCache(maxsize=256, ttl=900)
+hpr_results = ResultCache(maxsize=256, ttl=3600)
+
+
+class ConfigurationError(RuntimeError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_metrics():
+    return metrics_from_env()
+
+
+# ─────────────────────────────────────────────
+# NLTK / Sentiment
+# ─────────────────────────────────────────────
+
+@lru_cache(maxsize=None)
+def get_sentiment_analyzer():
+    return load_vader()
+
+@lru_cache(maxsize=None)
+def get_sentiment_backend():
+    return load_backend(os.getenv("SENTIMENT_BACKEND", DEFAULT_BACKEND),
+                        analyzer=get_sentiment_analyzer())
+
+@lru_cache(maxsize=None)
+def get_sentiment_scorer():
+    backend = get_sentiment_backend()
+    # Scores are memoized per backend, so switching backends never mixes them.
+    suffix = "" if backend.name == DEFAULT_BACKEND else f".{backend.name}"
+    memo = SentimentMemo.load(os.path.join(CACHE_DIR, f"sentiment_memo{suffix}.json"))
+    return BatchSentimentScorer(backend, memo=memo)
+
+@lru_cache(maxsize=None)
+def get_sentiment_index():
+    return SentimentIndex(
+        os.path.join(CACHE_DIR, "sentiment_index.db"),
+        positive_threshold=float(os.getenv("SENTIMENT_POSITIVE_THRESHOLD", POSITIVE_THRESHOLD)),
+        negative_threshold=float(os.getenv("SENTIMENT_NEGATIVE_THRESHOLD", NEGATIVE_THRESHOLD)),
+    )
+
+def new_near_duplicate_index():
+    # One per analysis run: clusters only span the articles of that run.
+    return NearDuplicateIndex(threshold=float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.6")))
+
+
+# ─────────────────────────────────────────────
+# Sentiment helpers
+# ─────────────────────────────────────────────
+
+@lru_cache(maxsize=None)
+def get_news_quota():
+    """The NewsAPI token bucket every fetch in this process (and cache dir) draws from.
+
+    NEWSAPI_DAILY_REQUESTS is the plan's daily allowance and NEWSAPI_BURST
+    how many requests may go out back to back.
+    """
+    daily = int(os.getenv("NEWSAPI_DAILY_REQUESTS", "100"))
+    return TokenBucket.per_day(daily, burst=int(os.getenv("NEWSAPI_BURST", "0")) or None,
+                               path=os.path.join(CACHE_DIR, "newsapi_quota.json"))
+
+@lru_cache(maxsize=None)
+def get_article_store(api_key):
+    fixture_path = os.getenv("NEWSAPI_FIXTURE_PATH")
+    if fixture_path:
+        # Fixtures cost nothing, so they are not charged to the quota.
+        return ArticleStore(os.path.join(CACHE_DIR, "articles.db"),
+                            FileNewsApiClient(fixture_path))
+    from newsapi import NewsApiClient
+    return ArticleStore(os.path.join(CACHE_DIR, "articles.db"),
+                        NewsApiClient(api_key=api_key), bucket=get_news_quota())
+
+@lru_cache(maxsize=None)
+def get_article_archive():
+    return ArticleArchive(os.path.join(CACHE_DIR, "archive"))
+
+def _require_article_store():
+    api_key = os.getenv("NEWSAPI_KEY")
+    if not api_key and not os.getenv("NEWSAPI_FIXTURE_PATH"):
+        raise ConfigurationError("API key not found")
+    return get_article_store(api_key)
+
+def get_articles(query, from_date):
+    return _require_article_store().get_articles(query, from_date)
+
+def iter_article_pages(query, from_date, page_size=100, max_pages=None):
+    """Articles since ``from_date`` one page at a time, newest first.
+
+    ``max_pages`` caps the NewsAPI requests made for new articles.
+    """
+    return _require_article_store().iter_pages(query, from_date, page_size=page_size,
+                                               max_pages=max_pages)
+
+def articles_to_frame(articles):
+    articles_df = pd.DataFrame(articles)
+    articles_df = articles_df[['title', 'description', 'publishedAt', 'url', 'source']]
+    articles_df['source'] = articles_df['source'].apply(lambda x: x['name'])
+    return articles_df
+
+def cluster_articles(articles_df, clusters):
+    """Tag near-duplicates over title + description before scoring.
+
+    Adds ``cluster_key`` (URL hash of the first copy ``clusters`` has seen)
+    and ``duplicate`` (False for that first copy).
+    """
+    texts = (articles_df['title'].fillna('').astype(str) + ' '
+             + articles_df['description'].fillna('').astype(str)).tolist()
+    keys = np.fromiter((url_key(u) for u in articles_df['url']), dtype=np.uint64,
+                       count=len(articles_df))
+    articles_df['cluster_key'] = clusters.assign(texts, keys.tolist())
+    articles_df['duplicate'] = articles_df['cluster_key'].to_numpy() != keys
+    return articles_df
+
+def score_clusters(articles_df, cluster_scores, scorer=None, save_memo=True):
+    """calculate_sentiment on one copy per cluster; the other copies reuse its score.
+
+    ``cluster_scores`` maps cluster_key -> score and carries over between
+    pages of the same run.
+    """
+    firsts = calculate_sentiment(articles_df[~articles_df['duplicate']].copy(),
+                                 scorer=scorer, save_memo=save_memo)
+    cluster_scores.update(zip(firsts['cluster_key'].tolist(), firsts['sentiment'].tolist()))
+    articles_df['sentiment'] = [cluster_scores.get(k, 0) for k in articles_df['cluster_key'].tolist()]
+    return articles_df
+
+def calculate_sentiment(articles_df, scorer=None, save_memo=True):
+    scorer = scorer or get_sentiment_scorer()
+    articles_df['sentiment'] = scorer.score(articles_df['description'].tolist())
+    if save_memo:
+        scorer.memo.save()
+    return articles_df
+
+def summarize_sentiment(articles_df, positive_threshold=POSITIVE_THRESHOLD,
+                        negative_threshold=NEGATIVE_THRESHOLD):
+    positive_count = int((articles_df['sentiment'] > positive_threshold).sum())
+    negative_count = int((articles_df['sentiment'] < negative_threshold).sum())
+    return {
+        "articles": len(articles_df),
+        "avg_sentiment": float(articles_df['sentiment'].mean()),
+        "positive": positive_count,
+        "neutral": len(articles_df) - positive_count - negative_count,
+        "negative": negative_count,
+    }
+
+def search_query(ticker, company_name):
+    return f"{ticker} stock OR {company_name} stock"
+
+def window_start(days):
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+def run_sentiment(ticker, days, company_name=None):
+    """Fetch and score the last ``days`` of articles; returns (company_name, articles_df)."""
+    metrics = get_metrics()
+    company_name = company_name or get_company_name(ticker)
+    from_date = window_start(days)
+    with metrics.span("get_articles", ticker):
+        articles = get_articles(search_query(ticker, company_name), from_date)
+    if not articles:
+        return company_name, pd.DataFrame(
+            columns=['title', 'description', 'publishedAt', 'url', 'source', 'sentiment']
+        )
+    with metrics.span("near_duplicates", ticker):
+        articles_df = cluster_articles(articles_to_frame(articles), new_near_duplicate_index())
+    with metrics.span("calculate_sentiment", ticker):
+        articles_df = score_clusters(articles_df, {})
+    with metrics.span("sentiment_index", ticker):
+        get_sentiment_index().add(ticker, articles_df)
+    with metrics.span("archive_append", ticker):
+        get_article_archive().append(ticker, articles_df)
+    return company_name, articles_df
+
+def stream_sentiment(ticker, days, company_name=None, page_size=100, max_pages=None):
+    """Yield scored article frames page by page for the last ``days`` of news.
+
+    Each page is scored as soon as it arrives, so callers can show partial
+    results long before a wide window has been fetched in full. Near-duplicate
+    copies of earlier articles in the stream are tagged and not re-scored.
+    """
+    metrics = get_metrics()
+    company_name = company_name or get_company_name(ticker)
+    from_date = window_start(days)
+    scorer = get_sentiment_scorer()
+    clusters, cluster_scores = new_near_duplicate_index(), {}
+    pages = iter_article_pages(search_query(ticker, company_name), from_date, page_size,
+                               max_pages)
+    try:
+        while True:
+            with metrics.span("get_articles", ticker):
+                articles = next(pages, None)
+            if articles is None:
+                return
+            with metrics.span("near_duplicates", ticker):
+                page_df = cluster_articles(articles_to_frame(articles), clusters)
+            with metrics.span("calculate_sentiment", ticker):
+                page_df = score_clusters(page_df, cluster_scores, scorer=scorer,
+                                         save_memo=False)
+            yield page_df
+    finally:
+        scorer.memo.save()
+
+def accumulate_sentiment(ticker, days, on_page=None, page_size=100, max_pages=None):
+    """Fold stream_sentiment into a SentimentAccumulator, the daily index and the archive.
+
+    Returns (company_name, acc). ``on_page(company_name, acc)`` is called
+    after every page for progressive display. Windows longer than
+    LIVE_WINDOW_DAYS refresh the live window first and are then read back
+    from the article archive.
+    """
+    metrics = get_metrics()
+    company_name = get_company_name(ticker)
+    index, archive = get_sentiment_index(), get_article_archive()
+    acc = SentimentAccumulator(positive_threshold=index.positive_threshold,
+                               negative_threshold=index.negative_threshold)
+    from_archive = days > LIVE_WINDOW_DAYS
+    live_days = min(days, LIVE_WINDOW_DAYS)
+    for page_df in stream_sentiment(ticker, live_days, company_name, page_size, max_pages):
+        page_df['publishedAt'] = pd.to_datetime(page_df['publishedAt'])
+        with metrics.span("sentiment_index", ticker):
+            index.add(ticker, page_df)
+        with metrics.span("archive_append", ticker):
+            archive.append(ticker, page_df)
+        if not from_archive:
+            acc.add(page_df)
+            if on_page is not None:
+                on_page(company_name, acc)
+
+    if from_archive:
+        chunks = archive.iter_chunks(ticker, start=window_start(days), text_rows=acc.table_rows)
+        while True:
+            with metrics.span("archive_query", ticker):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            acc.add(chunk)
+            if on_page is not None:
+                on_page(company_name, acc)
+    return company_name, acc
+
+def sentiment_dashboard(ticker, days):
+    """Summary, trend and daily rows for the window, read from the daily index."""
+    index = get_sentiment_index()
+    start = window_start(days)
+    return {
+        "summary": index.summary(ticker, start),
+        "trend": index.trend(ticker, start),
+        "daily": index.daily(ticker, start),
+    }
+
+def cached_sentiment(ticker, days, on_page=None):
+    """accumulate_sentiment shared across sessions per (ticker, days, calendar day).
+
+    Only the session that computes the result sees ``on_page`` updates; the
+    accumulator returned is shared and must be treated as read-only. If that
+    session's script is stopped or rerun mid-stream, a waiting session
+    recomputes rather than receiving its control-flow exception.
+    """
+    return sentiment_results.get_or_compute(
+        sentiment_key(ticker, days), lambda: accumulate_sentiment(ticker, days, on_page=on_page)
+    )
+
+def sentiment_key(ticker, days):
+    return (ticker, days, datetime.now().strftime('%Y-%m-%d'))
+
+@lru_cache(maxsize=None)
+def get_security_master():
+    master = SecurityMaster(
+        os.path.join(CACHE_DIR, "security_master.csv"),
+        seed=securities_from_ticker_labels(get_popular_sp500_tickers()),
+    )
+    master.refresh_if_stale()
+    return master
+
+# Dates the calendar starts from before any snapshot or refresh exists.
+SEED_EARNINGS_DATES = {
+    "NVDA": [
+        "2023-02-22", "2023-05-24", "2023-08-23", "2023-11-21",
+        "2024-02-21", "2024-05-22", "2024-08-28", "2024-11-20",
+        "2025-02-26", "2025-05-28", "2025-08-27", "2025-11-19",
+    ],
+}
+
+@lru_cache(maxsize=None)
+def get_earnings_calendar():
+    """Earnings calendar under CACHE_DIR; EARNINGS_CALENDAR_CSV bulk-imports a ticker,event_date file."""
+    calendar = EarningsCalendar(
+        os.path.join(CACHE_DIR, "earnings_calendar.csv"),
+        seed=SEED_EARNINGS_DATES,
+        fetch_dates=None if os.getenv("PRICE_FIXTURE_DIR") else fetch_yfinance_earnings,
+    )
+    snapshot = os.getenv("EARNINGS_CALENDAR_CSV")
+    if snapshot:
+        calendar.load_csv(snapshot)
+    return calendar
+
+def earnings_dates(tickers, start_year, end_year):
+    """{ticker: dates} from the local calendar, queuing background refreshes for stale tickers."""
+    calendar = get_earnings_calendar()
+    for ticker in tickers:
+        calendar.refresh_if_stale(ticker)
+    return calendar.query(tickers, start_year, end_year)
+
+def get_sp500_tickers():
+    return get_security_master().ticker_options() or get_popular_sp500_tickers()
+
+def get_popular_sp500_tickers():
+    return {
+        'AAPL': 'AAPL - Apple Inc.',
+        'MSFT': 'MSFT - Microsoft Corporation',
+        'GOOGL': 'GOOGL - Alphabet Inc. Class A',
+        'AMZN': 'AMZN - Amazon.com Inc.',
+        'NVDA': 'NVDA - NVIDIA Corporation',
+        'META': 'META - Meta Platforms Inc.',
+        'TSLA': 'TSLA - Tesla Inc.',
+        'BRK.B': 'BRK.B - Berkshire Hathaway Inc. Class B',
+        'JPM': 'JPM - JPMorgan Chase & Co.',
+        'JNJ': 'JNJ - Johnson & Johnson',
+        'V': 'V - Visa Inc.',
+        'UNH': 'UNH - UnitedHealth Group Inc.',
+        'XOM': 'XOM - Exxon Mobil Corporation',
+        'PG': 'PG - Procter & Gamble Co.',
+        'MA': 'MA - Mastercard Inc.',
+        'HD': 'HD - Home Depot Inc.',
+        'CVX': 'CVX - Chevron Corporation',
+        'BAC': 'BAC - Bank of America Corp.',
+        'ABBV': 'ABBV - AbbVie Inc.',
+        'KO': 'KO - Coca-Cola Co.',
+        'PEP': 'PEP - PepsiCo Inc.',
+        'COST': 'COST - Costco Wholesale Corporation',
+        'AVGO': 'AVGO - Broadcom Inc.',
+        'MRK': 'MRK - Merck & Co. Inc.',
+        'TMO': 'TMO - Thermo Fisher Scientific Inc.',
+        'WMT': 'WMT - Walmart Inc.',
+        'CSCO': 'CSCO - Cisco Systems Inc.',
+        'DIS': 'DIS - Walt Disney Co.',
+        'ABT': 'ABT - Abbott Laboratories',
+        'ACN': 'ACN - Accenture plc',
+        'ADBE': 'ADBE - Adobe Inc.',
+        'AMD': 'AMD - Advanced Micro Devices Inc.',
+        'NFLX': 'NFLX - Netflix Inc.',
+        'NKE': 'NKE - NIKE Inc.',
+        'ORCL': 'ORCL - Oracle Corporation',
+        'CRM': 'CRM - Salesforce Inc.',
+        'INTC': 'INTC - Intel Corporation',
+        'QCOM': 'QCOM - QUALCOMM Inc.',
+        'TXN': 'TXN - Texas Instruments Inc.',
+        'UPS': 'UPS - United Parcel Service Inc.',
+        'BA': 'BA - Boeing Co.',
+        'CAT': 'CAT - Caterpillar Inc.',
+        'GE': 'GE - General Electric Co.',
+        'IBM': 'IBM - International Business Machines Corp.',
+        'MMM': 'MMM - 3M Co.',
+        'GS': 'GS - Goldman Sachs Group Inc.',
+        'SPGI': 'SPGI - S&P Global Inc.',
+        'BLK': 'BLK - BlackRock Inc.',
+        'AXP': 'AXP - American Express Co.',
+        'NOW': 'NOW - ServiceNow Inc.',
+    }
+
+def get_company_name(ticker):
+    with get_metrics().span("get_company_name", ticker):
+        return get_security_master().name(ticker, default=ticker)
+
+
+# ─────────────────────────────────────────────
+# HPR helpers (ported from notebook)
+# ─────────────────────────────────────────────
+
+# Benchmark for abnormal returns, and the market-model estimation window
+# (trading days, ending one longest horizon before each event).
+DEFAULT_BENCHMARK = "SPY"
+ESTIMATION_WINDOW_DAYS = 120
+# Years offered for a ticker the earnings calendar does not know yet.
+HPR_DEFAULT_YEARS = 4
+
+def hpr_year_options(ticker):
+    """Years with earnings dates for ``ticker`` up to this one, else the last HPR_DEFAULT_YEARS."""
+    this_year = datetime.now().year
+    years = [y for y in (get_earnings_calendar().years(ticker) if ticker else [])
+             if y <= this_year]
+    return years or list(range(this_year - HPR_DEFAULT_YEARS + 1, this_year + 1))
+
+def hpr_price_window(start_year, end_year, max_horizon=20,
+                     estimation_window=ESTIMATION_WINDOW_DAYS):
+    """(start, end) price dates for events in ``start_year``..``end_year``, ending by today.
+
+    The window reaches ``max_horizon`` plus ``estimation_window`` trading
+    days before the first year and ``max_horizon`` after the last, so the
+    pre/post windows and market-model fits of every event in those years fit.
+    """
+    def calendar_days(trading_days):
+        # Five trading days a week, plus slack for holidays.
+        return timedelta(days=trading_days * 7 // 5 + 14)
+
+    start = datetime(int(start_year), 1, 1) - calendar_days(max_horizon + estimation_window)
+    end = min(datetime(int(end_year) + 1, 1, 1) + calendar_days(max_horizon), datetime.now())
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+@lru_cache(maxsize=None)
+def get_price_store():
+    fixture_dir = os.getenv("PRICE_FIXTURE_DIR")
+    source = CsvPriceSource(fixture_dir) if fixture_dir else None
+    return PriceStore(os.path.join(CACHE_DIR, "prices"), source=source)
+
+def download_daily_prices(ticker, start_date, end_date):
+    with get_metrics().span("download_daily_prices", ticker):
+        return get_price_store().get(ticker, start_date, end_date)
+
+def load_prices(ticker, start_date, end_date):
+    """Adjusted closes with daily returns, or an empty frame when there is no data."""
+    raw = download_daily_prices(ticker, start_date, end_date)
+    if raw.empty:
+        return pd.DataFrame(columns=["date", "adj_close", "daily_return"])
+    return add_daily_returns(extract_adjusted_close(raw))
+
+def extract_adjusted_close(df):
+    x = df.copy()
+    if isinstance(x.columns, pd.MultiIndex):
+        x.columns = x.columns.get_level_values(0)
+    return (
+        x[["Adj Close"]]
+        .rename(columns={"Adj Close": "adj_close"})
+        .reset_index()
+        .rename(columns={"Date": "date"})
+    )
+
+def add_daily_returns(df, price_col="adj_close"):
+    df = df.copy()
+    df["daily_return"] = df[price_col].pct_change()
+    return df
+
+def compute_event_hprs(prices, event_dates, horizons=(1, 5, 10, 20),
+                       ticker=None, date_col="date", price_col="adj_close",
+                       event_col="event_date", direction="backward"):
+    df = prices[[date_col, price_col]].copy()
+    df[date_col] = pd.to_datetime(df[date_col])
+    df = df.sort_values(date_col).reset_index(drop=True)
+    df["pos"] = df.index
+
+    cal = df[[date_col]].drop_duplicates().sort_values(date_col).reset_index(drop=True)
+    events = pd.DataFrame({event_col: pd.to_datetime(event_dates)}).sort_values(event_col)
+
+    event_map = (
+        pd.merge_asof(
+            events,
+            cal.rename(columns={date_col: "event_trading_date"}),
+            left_on=event_col,
+            right_on="event_trading_date",
+            direction=direction,
+        )
+        .merge(
+            df[[date_col, "pos"]].rename(columns={date_col: "event_trading_date"}),
+            on="event_trading_date",
+            how="left",
+        )
+        .dropna(subset=["pos"])
+    )
+    event_map["pos"] = event_map["pos"].astype(int)
+
+    rows = []
+    n_obs = len(df)
+
+    for _, r in event_map.iterrows():
+        t = r["pos"]
+        for n in horizons:
+            s, e = t - n, t - 1
+            if s >= 0 and e >= 0:
+                rows.append({
+                    "ticker": ticker, event_col: r[event_col],
+                    "event_trading_date": r["event_trading_date"],
+                    "pre_post": "pre", "days": int(n),
+                    "start_date": df.loc[s, date_col],
+                    "end_date": df.loc[e, date_col],
+                    "hpr": df.loc[e, price_col] / df.loc[s, price_col] - 1,
+                })
+            s, e = t, t + n
+            if e < n_obs:
+                rows.append({
+                    "ticker": ticker, event_col: r[event_col],
+                    "event_trading_date": r["event_trading_date"],
+                    "pre_post": "post", "days": int(n),
+                    "start_date": df.loc[s, date_col],
+                    "end_date": df.loc[e, date_col],
+                    "hpr": df.loc[e, price_col] / df.loc[s, price_col] - 1,
+                })
+
+    columns = ["ticker", event_col, "event_trading_date", "pre_post", "days",
+               "start_date", "end_date", "hpr"]
+    return (
+        pd.DataFrame(rows, columns=columns)
+        .sort_values([event_col, "pre_post", "days"])
+        .reset_index(drop=True)
+    )
+
+def event_hprs(ticker, event_dates, horizons, start_date, end_date, event_col="earnings_date"):
+    prices = load_prices(ticker, start_date, end_date)
+    if prices.empty:
+        return pd.DataFrame()
+    with get_metrics().span("compute_event_hprs", ticker):
+        return compute_event_hprs_panel(
+            prices=prices.assign(ticker=ticker),
+            events=events_frame(event_dates, ticker, event_col=event_col),
+            horizons=horizons,
+            event_col=event_col,
+        )
+
+def cached_event_hprs(ticker, event_dates, horizons, start_date, end_date,
+                      event_col="earnings_date"):
+    """event_hprs shared across sessions per (ticker, dates, horizons)."""
+    key = (ticker, tuple(event_dates), tuple(int(h) for h in horizons),
+           start_date, end_date, event_col)
+    return hpr_results.get_or_compute(
+        key, lambda: event_hprs(ticker, event_dates, horizons, start_date, end_date, event_col)
+    ).copy()
+
+# ─────────────────────────────────────────────
+# Cross-ticker HPR comparison
+# ─────────────────────────────────────────────
+#
+# Peers are priced with one batched download and all tickers and years go
+# through compute_event_hprs_panel in a single pass.
+
+HPR_PANEL_COLUMNS = ["ticker", "date", "adj_close", "daily_return"]
+
+def download_price_panel(tickers, start_date, end_date):
+    with get_metrics().span("download_daily_prices"):
+        return get_price_store().get_many(tickers, start_date, end_date)
+
+def load_price_panel(tickers, start_date, end_date):
+    """Long-format (ticker, date, adj_close, daily_return) for every ticker with data."""
+    raw = download_price_panel(tickers, start_date, end_date)
+    frames = [
+        add_daily_returns(extract_adjusted_close(df)).assign(ticker=ticker)
+        for ticker, df in raw.items() if not df.empty
+    ]
+    if not frames:
+        return pd.DataFrame(columns=HPR_PANEL_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[HPR_PANEL_COLUMNS]
+
+def _event_dates_by_ticker(tickers, event_dates):
+    # One shared list of dates, or {ticker: dates} for per-ticker calendars.
+    if isinstance(event_dates, dict):
+        return {t: tuple(event_dates.get(t, ())) for t in tickers}
+    return {t: tuple(event_dates) for t in tickers}
+
+def peer_event_hprs(tickers, event_dates, horizons, start_date, end_date,
+                    event_col="earnings_date", benchmark=None,
+                    estimation_window=ESTIMATION_WINDOW_DAYS):
+    """Event HPRs for several tickers at once, with a ``year`` column per event.
+
+    ``event_dates`` is either one list applied to every ticker or a
+    {ticker: dates} mapping. Tickers without prices are simply absent.
+
+    With a ``benchmark`` ticker (e.g. "SPY"), its prices come from the same
+    batched download and the table gains market-model columns (see
+    hpr_engine.ABNORMAL_COLUMNS); they are NaN when the benchmark has no data.
+    """
+    by_ticker = _event_dates_by_ticker(tickers, event_dates)
+    events = [events_frame(dates, t, event_col=event_col) for t, dates in by_ticker.items() if dates]
+    if not events:
+        return pd.DataFrame()
+    with_events = [t for t, dates in by_ticker.items() if dates]
+    prices = load_price_panel(list(dict.fromkeys(with_events + ([benchmark] if benchmark else []))),
+                              start_date, end_date)
+    bench = None
+    if benchmark:
+        bench = prices.loc[prices["ticker"] == benchmark, ["date", "adj_close"]]
+        prices = prices[prices["ticker"].isin(with_events)]
+        bench = bench if not bench.empty else None
+    if prices.empty:
+        return pd.DataFrame()
+    events = pd.concat(events, ignore_index=True)
+    with get_metrics().span("compute_event_hprs"):
+        table = compute_event_hprs_panel(prices=prices, events=events, horizons=horizons,
+                                         event_col=event_col, benchmark=bench,
+                                         estimation_window=estimation_window)
+    if benchmark and bench is None:
+        table = table.reindex(columns=[*table.columns, *ABNORMAL_COLUMNS])
+    table["year"] = pd.to_datetime(table[event_col]).dt.year
+    return table
+
+def cached_peer_event_hprs(tickers, event_dates, horizons, start_date, end_date,
+                           event_col="earnings_date", benchmark=None,
+                           estimation_window=ESTIMATION_WINDOW_DAYS):
+    """peer_event_hprs shared across sessions per (tickers, dates, horizons, benchmark)."""
+    tickers = list(dict.fromkeys(tickers))
+    by_ticker = _event_dates_by_ticker(tickers, event_dates)
+    key = ("peers", tuple(sorted(by_ticker.items())), tuple(int(h) for h in horizons),
+           start_date, end_date, event_col, benchmark, int(estimation_window))
+    return hpr_results.get_or_compute(
+        key, lambda: peer_event_hprs(tickers, by_ticker, horizons, start_date, end_date,
+                                     event_col, benchmark, estimation_window)
+    ).copy()
+
+def hpr_summary(hpr_table, by=("ticker", "pre_post", "days"), value_col="hpr"):
+    """Event count, mean/median and hit rate of ``value_col`` per group (default: ticker, side, horizon)."""
+    by = list(by)
+    if hpr_table.empty:
+        return pd.DataFrame(columns=[*by, "events", "mean_hpr", "median_hpr", "hit_rate"])
+    values = hpr_table.dropna(subset=[value_col])
+    return (
+        values.assign(up=values[value_col] > 0)
+        .groupby(by, sort=True)
+        .agg(events=(value_col, "size"), mean_hpr=(value_col, "mean"),
+             median_hpr=(value_col, "median"), hit_rate=("up", "mean"))
+        .reset_index()
+    )
+
+
+# ─────────────────────────────────────────────
+# Background pre-warming
+# ─────────────────────────────────────────────
+#
+# PREWARM_WATCHLIST (comma-separated, default: the popular S&P 500 list),
+# PREWARM_WINDOWS ("22:00-06:00,...", local time; "always" for no limit),
+# PREWARM_RESERVE_REQUESTS (NewsAPI tokens the pre-warmer leaves in the
+# shared quota for interactive use) and PREWARM_INTERVAL_HOURS configure
+# get_prewarmer; PREWARM_ENABLED starts it inside the app process.
+
+def prewarm_sentiment(ticker, max_requests=None):
+    """Refresh the default sentiment window for ``ticker``; returns NewsAPI requests spent.
+
+    Articles, scores, the daily index and the archive are updated on disk and
+    the result is primed into sentiment_results for this process.
+    """
+    store = _require_article_store()
+    before = store.api_calls
+    result = accumulate_sentiment(ticker, LIVE_WINDOW_DAYS, max_pages=max_requests)
+    sentiment_results.put(sentiment_key(ticker, LIVE_WINDOW_DAYS), result)
+    return store.api_calls - before
+
+def prewarm_prices(tickers):
+    this_year = datetime.now().year
+    download_price_panel(tickers, *hpr_price_window(this_year - HPR_DEFAULT_YEARS + 1, this_year))
+
+@lru_cache(maxsize=None)
+def get_prewarmer():
+    watchlist = [t.strip().upper() for t in os.getenv("PREWARM_WATCHLIST", "").split(",")
+                 if t.strip()] or list(get_popular_sp500_tickers())
+    return Prewarmer(
+        watchlist,
+        refresh_articles=prewarm_sentiment,
+        refresh_prices=prewarm_prices,
+        state_path=os.path.join(CACHE_DIR, "prewarm_state.json"),
+        quota=get_news_quota(),
+        reserve=int(os.getenv("PREWARM_RESERVE_REQUESTS", "50")),
+        windows=parse_windows(os.getenv("PREWARM_WINDOWS", "22:00-06:00")),
+        interval=float(os.getenv("PREWARM_INTERVAL_HOURS", "6")) * 3600,
+    )
+
+def prewarm_enabled():
+    return os.getenv("PREWARM_ENABLED", "").lower() in ("1", "true", "yes")
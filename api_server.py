@@ -0,0 +1,339 @@
+import argparse
+import base64
+import binascii
+import io
+import json
+import math
+import os
+import sys
+import threading
+from contextlib import asynccontextmanager
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import analysis_core as core
+from news_scheduler import QuotaExhausted
+from user_db import UserDB
+
+
+# ─────────────────────────────────────────────
+# HTTP API for sentiment and HPR
+# ─────────────────────────────────────────────
+#
+#   GET /health
+#   GET /v1/usage
+#   GET /v1/sentiment/{ticker}?days=7&table=daily|articles
+#   GET /v1/hpr/{ticker}?horizons=1,5,10,20&years=2023-2025&peers=AMD,AVGO
+#                       &benchmark=SPY&dates=2024-02-21,...&summary=1&measure=hpr|abnormal_hpr|car
+#
+# ``years`` defaults to every year the earnings calendar has for the ticker,
+# and prices are read for those years only, up to today.
+#
+# Requests authenticate with HTTP Basic credentials from the users table.
+# Every sentiment or HPR request adds one to the user's api_usage (buffered,
+# like the UI's), and API_USAGE_LIMIT, when set, rejects requests once a
+# user's total reaches it. When the shared NewsAPI quota is empty, a request
+# that needs new articles gets 429 with a Retry-After header. Tables are
+# returned as compact split-orient JSON, or as an Arrow IPC stream with
+# ``format=arrow`` or an Accept header naming Arrow; the rest of the payload
+# then travels in the schema metadata.
+#
+# Handlers run the same analysis_core calls as the Streamlit UI on a thread
+# pool. Started inside the app process (API_SERVER_PORT), the API shares the
+# UI's in-memory result caches as well; as a separate ``python api_server.py``
+# process it shares the on-disk caches under SENTIMENT_CACHE_DIR.
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MEASURES = ("hpr", "abnormal_hpr", "car")
+MAX_DAYS = 365
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _credentials(request):
+    scheme, _, encoded = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "basic" or not encoded:
+        raise ApiError(401, "HTTP Basic credentials required")
+    try:
+        username, _, password = base64.b64decode(encoded).decode("utf-8").partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        raise ApiError(401, "Malformed credentials")
+    return username, password
+
+
+def _int_list(value, name):
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise ApiError(400, f"{name} must be comma-separated integers")
+
+
+def _year_range(value):
+    start, _, end = (value or "").partition("-")
+    try:
+        years = int(start), int(end or start)
+    except ValueError:
+        raise ApiError(400, "years must look like 2023 or 2023-2025")
+    if years[0] > years[1]:
+        raise ApiError(400, "years must be increasing")
+    return years
+
+
+def _tickers(value):
+    return [t.strip().upper() for t in (value or "").replace(";", ",").split(",") if t.strip()]
+
+
+def _wants_arrow(request):
+    fmt = request.query_params.get("format")
+    if fmt:
+        if fmt not in ("json", "arrow"):
+            raise ApiError(400, "format must be json or arrow")
+        return fmt == "arrow"
+    return "arrow" in request.headers.get("accept", "")
+
+
+def _json_default(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def _clean(value):
+    # NaN is not JSON; send null like DataFrame.to_json does.
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    return value
+
+
+def _dumps(payload):
+    return json.dumps(_clean(payload), separators=(",", ":"), default=_json_default)
+
+
+def table_response(frame, meta, arrow):
+    """``meta`` plus ``frame`` as {"columns": [...], "data": [[...]]}, or an Arrow stream."""
+    if arrow:
+        import pyarrow as pa
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b"meta": _dumps(meta).encode("utf-8")})
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue(), media_type=ARROW_MEDIA_TYPE)
+    body = frame.to_json(orient="split", index=False, date_format="iso")
+    # The frame is already serialised; splice it in rather than re-parsing it.
+    return Response(_dumps(meta)[:-1] + (',"table":' if meta else '"table":') + body + "}",
+                    media_type="application/json")
+
+
+class SentimentApi:
+    def __init__(self, user_db, usage_limit=None):
+        self.user_db = user_db
+        self.usage_limit = usage_limit
+        self._usage_lock = threading.Lock()
+
+    # ── auth / accounting ────────────────────
+
+    def _authenticate(self, request):
+        username, password = _credentials(request)
+        if not self.user_db.verify_user(username, password):
+            raise ApiError(401, "Invalid username or password")
+        return username
+
+    def _charge(self, username):
+        """Account one billable request, refusing it once the user's limit is reached."""
+        with self._usage_lock:
+            if self.usage_limit and (self.user_db.get_api_usage(username) or 0) >= self.usage_limit:
+                raise ApiError(429, f"API usage limit of {self.usage_limit} requests reached")
+            self.user_db.track_api_usage(username)
+
+    async def _handle(self, request, work):
+        try:
+            return await run_in_threadpool(work, request)
+        except ApiError as e:
+            headers = {"WWW-Authenticate": 'Basic realm="sentiment"'} if e.status == 401 else None
+            return JSONResponse({"error": str(e)}, status_code=e.status, headers=headers)
+        except core.ConfigurationError as e:
+            return JSONResponse({"error": f"Server configuration error: {e}"}, status_code=503)
+        except QuotaExhausted as e:
+            # The shared NewsAPI quota is empty: the client should come back later.
+            return JSONResponse({"error": str(e)}, status_code=429,
+                                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+        except Exception as e:
+            return JSONResponse({"error": str(e)}, status_code=500)
+
+    # ── endpoints ────────────────────────────
+
+    async def health(self, request):
+        return JSONResponse({"status": "ok"})
+
+    async def usage(self, request):
+        def work(request):
+            username = self._authenticate(request)
+            return JSONResponse({"username": username,
+                                 "api_usage": self.user_db.get_api_usage(username),
+                                 "limit": self.usage_limit})
+        return await self._handle(request, work)
+
+    async def sentiment(self, request):
+        return await self._handle(request, self._sentiment)
+
+    def _sentiment(self, request):
+        username = self._authenticate(request)
+        ticker = request.path_params["ticker"].upper()
+        params = request.query_params
+        days = _int_list(params.get("days", "7"), "days")
+        if len(days) != 1 or not 1 <= days[0] <= MAX_DAYS:
+            raise ApiError(400, f"days must be between 1 and {MAX_DAYS}")
+        days = days[0]
+        table = params.get("table", "daily")
+        if table not in ("daily", "articles"):
+            raise ApiError(400, "table must be daily or articles")
+        arrow = _wants_arrow(request)
+        self._charge(username)
+
+        with core.get_metrics().span("api_sentiment", ticker):
+            company_name, acc = core.cached_sentiment(ticker, days)
+            dashboard = core.sentiment_dashboard(ticker, days)
+        if table == "daily":
+            frame = dashboard["daily"][["day", "count", "mean", "std", "positive", "neutral",
+                                        "negative"]]
+        else:
+            frame = acc.recent()[["publishedAt", "title", "source", "url", "sentiment"]]
+        trend = dashboard["trend"]
+        meta = {
+            "ticker": ticker,
+            "company": company_name,
+            "days": days,
+            "summary": dashboard["summary"],
+            "duplicates": acc.duplicates,
+            "clusters": acc.clusters,
+            # No articles in the window: no trend, rather than a flat one.
+            "trend_per_day": trend[0] * 86400 if trend is not None else None,
+        }
+        return table_response(frame.reset_index(drop=True), meta, arrow)
+
+    async def hpr(self, request):
+        return await self._handle(request, self._hpr)
+
+    def _hpr(self, request):
+        username = self._authenticate(request)
+        ticker = request.path_params["ticker"].upper()
+        params = request.query_params
+        horizons = _int_list(params.get("horizons", "1,5,10,20"), "horizons")
+        if not horizons or min(horizons) < 1:
+            raise ApiError(400, "horizons must be positive trading-day counts")
+        if params.get("years"):
+            start_year, end_year = _year_range(params["years"])
+        else:
+            options = core.hpr_year_options(ticker)
+            start_year, end_year = options[0], options[-1]
+        tickers = list(dict.fromkeys([ticker] + _tickers(params.get("peers"))))
+        benchmark = params.get("benchmark", core.DEFAULT_BENCHMARK).strip().upper() or None
+        measure = params.get("measure", "hpr")
+        if measure not in MEASURES:
+            raise ApiError(400, f"measure must be one of {', '.join(MEASURES)}")
+        summary = params.get("summary", "0").lower() in ("1", "true", "yes")
+        arrow = _wants_arrow(request)
+
+        event_dates = core.earnings_dates(tickers, start_year, end_year)
+        if params.get("dates"):
+            try:
+                explicit = pd.to_datetime(params["dates"].split(","))
+            except (ValueError, TypeError):
+                raise ApiError(400, "dates must be comma-separated YYYY-MM-DD values")
+            event_dates[ticker] = [d.strftime("%Y-%m-%d") for d in explicit]
+        price_start, price_end = core.hpr_price_window(start_year, end_year, max(horizons))
+        self._charge(username)
+
+        with core.get_metrics().span("api_hpr", ticker):
+            table = core.cached_peer_event_hprs(
+                tickers, event_dates, horizons, price_start, price_end,
+                event_col="earnings_date", benchmark=benchmark,
+            )
+        meta = {
+            "tickers": tickers,
+            "horizons": horizons,
+            "years": [start_year, end_year],
+            "benchmark": benchmark,
+            "events": {t: len(d) for t, d in event_dates.items()},
+        }
+        if summary:
+            if not table.empty and measure not in table.columns:
+                raise ApiError(400, f"{measure} needs a benchmark with price data")
+            return table_response(core.hpr_summary(table, value_col=measure),
+                                  {**meta, "measure": measure}, arrow)
+        return table_response(table, meta, arrow)
+
+    def routes(self):
+        return [
+            Route("/health", self.health),
+            Route("/v1/usage", self.usage),
+            Route("/v1/sentiment/{ticker}", self.sentiment),
+            Route("/v1/hpr/{ticker}", self.hpr),
+        ]
+
+
+def create_app(user_db=None, usage_limit=None):
+    """Starlette app over ``user_db`` (default: USERS_DB_PATH, else users.db)."""
+    if user_db is None:
+        user_db = UserDB(os.getenv("USERS_DB_PATH", "users.db"))
+    if usage_limit is None:
+        usage_limit = int(os.getenv("API_USAGE_LIMIT", "0")) or None
+    api = SentimentApi(user_db, usage_limit)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        # Usage still buffered in this process reaches users.db before exit.
+        user_db.flush()
+
+    return Starlette(routes=api.routes(), lifespan=lifespan)
+
+
+def start_in_background(user_db=None, host=None, port=None):
+    """Serve the API on a daemon thread of the current process; returns the uvicorn Server."""
+    import uvicorn
+    config = uvicorn.Config(
+        create_app(user_db),
+        host=host or os.getenv("API_SERVER_HOST", "127.0.0.1"),
+        port=int(port or os.getenv("API_SERVER_PORT", "8600")),
+        log_level="warning",
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, name="api-server", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve sentiment and HPR results over HTTP")
+    parser.add_argument("--host", default=os.getenv("API_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_SERVER_PORT", "8600")))
+    parser.add_argument("--users-db", default=os.getenv("USERS_DB_PATH", "users.db"),
+                        help="The Streamlit app's users.db")
+    args = parser.parse_args(argv)
+
+    user_db = UserDB(args.users_db)
+    try:
+        uvicorn.run(create_app(user_db), host=args.host, port=args.port, log_level="info")
+    finally:
+        user_db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
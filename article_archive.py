@@ -0,0 +1,331 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from file_lock import file_lock
+
+
+# ─────────────────────────────────────────────
+# Columnar long-history archive of scored articles
+# ─────────────────────────────────────────────
+#
+# Per ticker, one memory-mapped .npy file per column: int64 timestamps,
+# float32 scores, int16 source codes (the source names live in the meta
+# file), uint64 URL hashes for de-duplication and the URL hash of each
+# article's near-duplicate cluster representative. Title, description and
+# URL are appended to a UTF-8 blob and referenced by byte offsets, so
+# date-range queries touch only the fixed-width columns and text is decoded
+# just for the rows that are displayed.
+#
+# Columns are stored as segments, each sorted by publication time. An append
+# writes its rows as a new segment and then the meta file, so its cost is the
+# size of the page rather than of the whole history. When the newest segment
+# is at least half the size of the one before, the two are merged, which
+# keeps the number of segments logarithmic in the archive size. The meta file
+# lists the segments and their row counts and is what readers trust.
+#
+# The app, prewarm.py and api_server.py may write the same archive from
+# separate processes. Appends hold an exclusive lock on the ticker's ".lock"
+# file for the whole read-modify-write (segment number, text-blob offset,
+# meta); readers hold it shared while they read the meta and map the
+# segments, so a merge cannot delete a segment they are about to open.
+
+TEXT_FIELDS = ["title", "description", "url"]
+COLUMNS = ["published", "sentiment", "source", "key", "cluster", "offsets"]
+_DTYPES = {"published": np.int64, "sentiment": np.float32, "source": np.int16,
+           "key": np.uint64, "cluster": np.uint64, "offsets": np.int64}
+
+
+def url_key(url):
+    return int.from_bytes(hashlib.blake2b(str(url).encode("utf-8"), digest_size=8).digest(),
+                          "little")
+
+
+def _timestamp_ns(value):
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+    return ts.value
+
+
+class ArticleArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _stem(self, ticker):
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9._-]", "_", ticker))
+
+    def _file_lock(self, ticker, shared=False):
+        return file_lock(self._stem(ticker) + ".lock", shared=shared)
+
+    def _read_meta(self, ticker):
+        try:
+            with open(self._stem(ticker) + ".meta.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _column_path(self, ticker, segment, column):
+        # Segment None is the single-file layout of archives written before segments.
+        stem = self._stem(ticker)
+        return f"{stem}.{column}.npy" if segment is None else f"{stem}.s{segment}.{column}.npy"
+
+    @staticmethod
+    def _segments(meta):
+        return [tuple(s) for s in meta.get("segments", [[None, meta["count"]]])]
+
+    def _read_segment(self, ticker, segment, rows):
+        cols = {}
+        for c in COLUMNS:
+            path = self._column_path(ticker, segment, c)
+            if c == "cluster" and not os.path.exists(path):
+                # Archives written before clustering: every article is its own cluster.
+                continue
+            values = np.load(path, mmap_mode="r")
+            if len(values) < rows:
+                raise ValueError(f"Archive column {os.path.basename(path)} holds {len(values)} "
+                                 f"rows, meta expects {rows}")
+            cols[c] = values[:rows]
+        cols.setdefault("cluster", cols["key"])
+        return cols
+
+    def _read(self, ticker):
+        """Memory-mapped columns of every segment, or None when the ticker has no archive yet.
+
+        Callers hold the ticker's file lock.
+        """
+        meta = self._read_meta(ticker)
+        if meta is None:
+            return None, None
+        segments = [self._read_segment(ticker, seg, rows) for seg, rows in self._segments(meta)]
+        if sum(len(s["published"]) for s in segments) != meta["count"]:
+            raise ValueError(f"Archive for {ticker} lists {meta['count']} rows but its "
+                             "segments hold a different number")
+        return segments, meta
+
+    def _atomic_save(self, path, writer):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            writer(f)
+        os.replace(tmp, path)
+
+    def _write_segment(self, ticker, segment, cols):
+        order = np.argsort(cols["published"], kind="stable")
+        for c in COLUMNS:
+            self._atomic_save(self._column_path(ticker, segment, c),
+                              lambda f, a=np.asarray(cols[c])[order].astype(_DTYPES[c]):
+                              np.save(f, a))
+        return len(order)
+
+    def _delete_segment(self, ticker, segment):
+        for c in COLUMNS:
+            try:
+                os.remove(self._column_path(ticker, segment, c))
+            except FileNotFoundError:
+                pass
+
+    def count(self, ticker):
+        meta = self._read_meta(ticker)
+        return meta["count"] if meta else 0
+
+    # ── writes ───────────────────────────────
+
+    def append(self, ticker, scored_df):
+        """Add scored articles not archived yet; returns how many were added.
+
+        ``scored_df`` needs ``publishedAt``, ``sentiment``, ``source`` and the
+        text fields, and optionally ``cluster_key`` from near-duplicate
+        clustering. Rows are kept sorted by publication time.
+        """
+        if scored_df.empty:
+            return 0
+        keys = np.fromiter((url_key(u) for u in scored_df["url"]), dtype=np.uint64,
+                           count=len(scored_df))
+        stem = self._stem(ticker)
+
+        with self._lock(ticker), self._file_lock(ticker):
+            segments, meta = self._read(ticker)
+            meta = meta or {"count": 0, "sources": []}
+            known = [s["key"] for s in segments or []]
+            fresh = (~np.isin(keys, np.concatenate(known)) if known
+                     else np.ones(len(keys), bool))
+            _, first = np.unique(keys, return_index=True)
+            unique = np.zeros(len(keys), bool)
+            unique[first] = True
+            new = scored_df[fresh & unique]
+            if new.empty:
+                return 0
+
+            sources = list(meta["sources"])
+            codes = {name: i for i, name in enumerate(sources)}
+            new_codes = []
+            for name in new["source"].fillna("").astype(str):
+                if name not in codes:
+                    codes[name] = len(sources)
+                    sources.append(name)
+                new_codes.append(codes[name])
+
+            # Text goes to the end of the blob; rows only hold byte offsets.
+            blob_path = stem + ".text.bin"
+            base = os.path.getsize(blob_path) if os.path.exists(blob_path) else 0
+            offsets = np.empty((len(new), len(TEXT_FIELDS) + 1), dtype=np.int64)
+            chunks = []
+            pos = base
+            for i, row in enumerate(new[TEXT_FIELDS].itertuples(index=False, name=None)):
+                offsets[i, 0] = pos
+                for j, value in enumerate(row, 1):
+                    encoded = (value if isinstance(value, str) else "").encode("utf-8")
+                    chunks.append(encoded)
+                    pos += len(encoded)
+                    offsets[i, j] = pos
+            with open(blob_path, "ab") as f:
+                f.write(b"".join(chunks))
+
+            published = pd.to_datetime(new["publishedAt"], utc=True).to_numpy(dtype="datetime64[ns]")
+            added = {
+                "published": published.view(np.int64),
+                "sentiment": new["sentiment"].to_numpy(dtype=np.float32),
+                "source": np.asarray(new_codes, dtype=np.int16),
+                "key": keys[fresh & unique],
+                "cluster": (new["cluster_key"].to_numpy(dtype=np.uint64) if "cluster_key" in new
+                            else keys[fresh & unique]),
+                "offsets": offsets,
+            }
+
+            listed = self._segments(meta) if segments else []
+            next_segment = meta.get("next_segment", 0)
+            tail, merged = [added], []
+            tail_rows = len(added["published"])
+            # Fold the newest segments into this one while it is at least
+            # half their size.
+            while listed and 2 * tail_rows >= listed[-1][1]:
+                segment, rows = listed.pop()
+                merged.append(segment)
+                tail.insert(0, segments[len(listed)])
+                tail_rows += rows
+            cols = {c: np.concatenate([np.asarray(t[c]) for t in tail]) for c in COLUMNS}
+            rows = self._write_segment(ticker, next_segment, cols)
+
+            # The meta file goes last: readers treat it as the commit marker.
+            meta = {"count": sum(n for _, n in listed) + rows, "sources": sources,
+                    "segments": [list(s) for s in listed] + [[next_segment, rows]],
+                    "next_segment": next_segment + 1}
+            self._atomic_save(stem + ".meta.json",
+                              lambda f: f.write(json.dumps(meta).encode("utf-8")))
+            for segment in merged:
+                self._delete_segment(ticker, segment)
+        return len(new)
+
+    # ── queries ──────────────────────────────
+
+    def _bounds(self, published, start, end):
+        lo = 0 if start is None else int(np.searchsorted(published, _timestamp_ns(start), "left"))
+        hi = (len(published) if end is None
+              else int(np.searchsorted(published, _timestamp_ns(end), "left")))
+        return lo, hi
+
+    def _window(self, segments, start, end):
+        """Columns of the rows in [start, end) across segments, sorted by publication time."""
+        parts = []
+        for seg in segments:
+            lo, hi = self._bounds(seg["published"], start, end)
+            if hi > lo:
+                parts.append({c: seg[c][lo:hi] for c in COLUMNS})
+        if len(parts) == 1:
+            # One segment: the slices are still memory-mapped views.
+            return parts[0]
+        if not parts:
+            return {c: np.empty(0, dtype=_DTYPES[c]) for c in COLUMNS}
+        cols = {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+        order = np.argsort(cols["published"], kind="stable")
+        return {c: v[order] for c, v in cols.items()}
+
+    def _frame(self, cols, meta, idx, text_rows, blob):
+        cluster = np.asarray(cols["cluster"][idx])
+        frame = pd.DataFrame({
+            "publishedAt": pd.to_datetime(np.asarray(cols["published"][idx]), utc=True),
+            "sentiment": np.asarray(cols["sentiment"][idx]),
+            "source": pd.Categorical.from_codes(np.asarray(cols["source"][idx]),
+                                                categories=meta["sources"]),
+            "cluster_key": cluster,
+            "duplicate": cluster != np.asarray(cols["key"][idx]),
+        })
+        n_text = min(text_rows, len(frame))
+        text = {f: [None] * len(frame) for f in TEXT_FIELDS}
+        if n_text and blob is not None:
+            offsets = np.asarray(cols["offsets"][idx[:n_text]])
+            for i, row in enumerate(offsets):
+                for j, field in enumerate(TEXT_FIELDS):
+                    text[field][i] = blob[row[j]:row[j + 1]].decode("utf-8")
+        for field in TEXT_FIELDS:
+            frame[field] = text[field]
+        return frame
+
+    def _open_blob(self, ticker):
+        path = self._stem(ticker) + ".text.bin"
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def query(self, ticker, start=None, end=None, with_text=False):
+        """Articles published in [start, end), oldest first."""
+        for frame in self.iter_chunks(ticker, start, end, chunk_size=None, newest_first=False,
+                                      text_rows=None if with_text else 0):
+            return frame
+        return self._empty()
+
+    def iter_chunks(self, ticker, start=None, end=None, chunk_size=5000, newest_first=True,
+                    text_rows=0):
+        """Yield [start, end) in frames of ``chunk_size`` rows.
+
+        Text fields are decoded for the first ``text_rows`` rows yielded
+        (all of them when None) and left as None after that.
+        """
+        with self._lock(ticker), self._file_lock(ticker, shared=True):
+            segments, meta = self._read(ticker)
+            blob = self._open_blob(ticker) if segments is not None and text_rows != 0 else None
+        if segments is None:
+            return
+        cols = self._window(segments, start, end)
+        if not len(cols["published"]):
+            if blob is not None:
+                blob.close()
+            return
+        positions = np.arange(len(cols["published"]))
+        if newest_first:
+            positions = positions[::-1]
+        step = chunk_size or len(positions)
+        remaining_text = len(positions) if text_rows is None else text_rows
+        try:
+            for i in range(0, len(positions), step):
+                idx = positions[i:i + step]
+                yield self._frame(cols, meta, idx, remaining_text, blob)
+                remaining_text = max(0, remaining_text - len(idx))
+        finally:
+            if blob is not None:
+                blob.close()
+
+    @staticmethod
+    def _empty():
+        return pd.DataFrame({
+            "publishedAt": pd.to_datetime([], utc=True),
+            "sentiment": np.array([], dtype=np.float32),
+            "source": pd.Categorical([]),
+            "cluster_key": np.array([], dtype=np.uint64),
+            "duplicate": np.array([], dtype=bool),
+            **{f: [] for f in TEXT_FIELDS},
+        })
@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# ─────────────────────────────────────────────
+# Persistent NewsAPI article cache
+# ─────────────────────────────────────────────
+#
+# Articles are stored per (query, publishedAt, url). A fetch only asks
+# NewsAPI for articles newer than the latest one already stored, unless the
+# requested window reaches further back than anything fetched so far.
+# With a ``bucket`` (news_scheduler.TokenBucket) every request first takes a
+# token, so interactive fetches and background refreshes share one quota.
+
+def _api_timestamp(published_at):
+    # NewsAPI returns "...Z" but only accepts naive ISO timestamps in from/to.
+    return published_at.rstrip("Z")[:19]
+
+
+def _result_cap_reached(error):
+    # Pages past the plan's result cap are refused with HTTP 426
+    # "maximumResultsReached" (newsapi-python raises NewsAPIException with
+    # that code; NewsApiHttpClient raises NewsApiError with the status).
+    details = getattr(error, "exception", None)
+    code = details.get("code") if isinstance(details, dict) else None
+    return code == "maximumResultsReached" or getattr(error, "status", None) == 426
+
+
+class ArticleStore:
+    def __init__(self, path, client, min_refresh_seconds=900, bucket=None):
+        self.path = path
+        self.client = client
+        self.bucket = bucket
+        self.min_refresh_seconds = min_refresh_seconds
+        self.api_calls = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript('''
+        CREATE TABLE IF NOT EXISTS articles
+        (query TEXT, published_at TEXT, url TEXT, payload TEXT,
+         PRIMARY KEY (query, published_at, url));
+        CREATE TABLE IF NOT EXISTS fetch_log
+        (query TEXT PRIMARY KEY, covered_from TEXT, fetched_at REAL);
+        ''')
+        self._conn.commit()
+
+    def _coverage(self, query):
+        row = self._conn.execute(
+            "SELECT covered_from, fetched_at FROM fetch_log WHERE query = ?", (query,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def _latest(self, query):
+        row = self._conn.execute(
+            "SELECT MAX(published_at) FROM articles WHERE query = ?", (query,)
+        ).fetchone()
+        return row[0]
+
+    def _fetch(self, query, from_param, **paging):
+        if self.bucket is not None:
+            self.bucket.acquire_blocking()
+        self.api_calls += 1
+        response = self.client.get_everything(
+            q=query,
+            from_param=from_param,
+            language='en',
+            sort_by='publishedAt',
+            **paging
+        )
+        return response.get('articles', [])
+
+    def _merge(self, query, articles):
+        rows = [
+            (query, a.get('publishedAt') or "", a.get('url') or "", json.dumps(a))
+            for a in articles
+        ]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?)", rows
+        )
+
+    def _needs_fetch(self, query, from_date, force):
+        covered_from, fetched_at = self._coverage(query)
+        window_covered = covered_from is not None and covered_from <= from_date
+        return not (window_covered and not force and fetched_at is not None
+                    and time.time() - fetched_at < self.min_refresh_seconds)
+
+    def refresh(self, query, from_date, force=False, page_size=100):
+        """Pull anything new for ``query`` since ``from_date`` into the store.
+
+        Returns how many articles came back from the API.
+        """
+        return sum(len(page) for page in self._pull(query, from_date, page_size, None, force))
+
+    def _next_from(self, query, from_date):
+        covered_from, _ = self._coverage(query)
+        latest = None
+        if covered_from is not None and covered_from <= from_date:
+            latest = self._latest(query)
+        return _api_timestamp(latest) if latest else from_date
+
+    def _ingest(self, query, from_date, articles):
+        covered_from, _ = self._coverage(query)
+        if covered_from is not None and covered_from < from_date:
+            from_date = covered_from
+        self._merge(query, articles)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fetch_log VALUES (?, ?, ?)",
+            (query, from_date, time.time()),
+        )
+        self._conn.commit()
+
+    def _record_partial(self, query, oldest):
+        # Paging stopped before the end of the window: only articles from the
+        # oldest one merged onwards are known to be stored, so the next fetch
+        # has to ask for the whole window again rather than only newer ones.
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fetch_log VALUES (?, ?, ?)",
+            (query, _api_timestamp(oldest), time.time()),
+        )
+        self._conn.commit()
+
+    def cached(self, query, from_date):
+        """Stored articles for ``query`` published on or after ``from_date``, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM articles WHERE query = ? AND published_at >= ? "
+                "ORDER BY published_at DESC",
+                (query, from_date),
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get_articles(self, query, from_date):
+        self.refresh(query, from_date)
+        return self.cached(query, from_date)
+
+    def iter_pages(self, query, from_date, page_size=100, max_pages=None, force=False):
+        """Yield articles for ``query`` since ``from_date`` one page at a time, newest first.
+
+        New articles are paged from the API and merged into the store as each
+        page arrives; the older part of the window is then read back from the
+        store with keyset pagination. Only one page is held at a time.
+        """
+        boundary = yield from self._pull(query, from_date, page_size, max_pages, force)
+
+        cursor = None
+        while True:
+            sql = ("SELECT payload, published_at, url FROM articles "
+                   "WHERE query = ? AND published_at >= ?")
+            params = [query, from_date]
+            if boundary is not None:
+                sql += " AND published_at < ?"
+                params.append(boundary)
+            if cursor is not None:
+                sql += " AND (published_at, url) < (?, ?)"
+                params.extend(cursor)
+            sql += " ORDER BY published_at DESC, url DESC LIMIT ?"
+            params.append(page_size)
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            yield [json.loads(r[0]) for r in rows]
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1][1], rows[-1][2])
+
+    def _pull(self, query, from_date, page_size, max_pages, force):
+        """Page new articles from the API into the store, yielding each page.
+
+        Returns the publication time before which the window still has to be
+        read from the store, or None when nothing was fetched.
+        """
+        with self._lock:
+            if not self._needs_fetch(query, from_date, force):
+                return None
+            from_param = self._next_from(query, from_date)
+
+        page = 1
+        complete = capped = False
+        oldest = None
+        while max_pages is None or page <= max_pages:
+            try:
+                articles = self._fetch(query, from_param, page=page, page_size=page_size)
+            except Exception as e:
+                if page == 1:
+                    raise
+                # Later pages can be refused; what has been merged so far is
+                # still served. The plan's result cap is the end of what can
+                # be fetched for this window, so it is recorded as covered
+                # and the refresh throttle applies.
+                capped = _result_cap_reached(e)
+                break
+            with self._lock:
+                self._merge(query, articles)
+                self._conn.commit()
+            if articles:
+                page_oldest = min(a.get('publishedAt') or "" for a in articles)
+                oldest = page_oldest if oldest is None else min(oldest, page_oldest)
+                yield articles
+            if len(articles) < page_size:
+                complete = True
+                break
+            page += 1
+        with self._lock:
+            if complete or capped:
+                self._ingest(query, from_date, [])
+            elif oldest is not None:
+                self._record_partial(query, oldest)
+        # Everything at or after from_param (or, when paging stopped early,
+        # at or after the oldest article merged) has just been served.
+        return from_param if complete else oldest
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FileNewsApiClient:
+    """Offline stand-in for NewsApiClient serving articles from a JSON file.
+
+    The file holds either a list of NewsAPI article dicts or a full
+    ``get_everything`` response.
+    """
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.articles = data.get('articles', []) if isinstance(data, dict) else data
+        self.calls = []
+
+    def get_everything(self, q=None, from_param=None, to=None, language=None,
+                       sort_by=None, page=None, page_size=None, **kwargs):
+        self.calls.append({"q": q, "from_param": from_param, "to": to, "page": page})
+        matches = list(self.articles)
+        if from_param:
+            matches = [a for a in matches if _api_timestamp(a.get('publishedAt', "")) >= from_param]
+        if to:
+            matches = [a for a in matches if _api_timestamp(a.get('publishedAt', "")) <= to]
+        matches.sort(key=lambda a: a.get('publishedAt', ""), reverse=True)
+        total = len(matches)
+        if page_size:
+            start = ((page or 1) - 1) * page_size
+            matches = matches[start:start + page_size]
+        return {"status": "ok", "totalResults": total, "articles": matches}
+
@@ -0,0 +1,211 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+import analysis_core as core
+from event_study import quantile_summary, sentiment_event_hprs
+from hpr_engine import compute_event_hprs_panel
+from news_scheduler import QuotaExhausted
+
+
+# ─────────────────────────────────────────────
+# Headless universe-wide sentiment / HPR scan
+# ─────────────────────────────────────────────
+#
+#   python batch_scan.py --universe sp500 --workers 16 --output scan.csv
+#
+# Sentiment and prices are fetched per ticker on a thread pool (the work is
+# I/O bound and goes through the on-disk article and price caches); HPRs for
+# the whole universe are then computed in one vectorized pass. NewsAPI
+# requests draw from the shared quota (analysis_core.get_news_quota); once it
+# runs dry the remaining tickers are reported as skipped, not as failures.
+
+def sp500_listing():
+    """The full S&P 500 listing, fetched now if the snapshot is missing or stale.
+
+    The app serves the seeded popular tickers while the security master
+    refreshes in the background; a scan has to wait for the real list.
+    """
+    master = core.get_security_master()
+    age = master.snapshot_age()
+    if (age is None or age > master.max_age_seconds) and not master.refresh():
+        raise RuntimeError(f"Could not refresh the S&P 500 listing: {master.last_refresh_error}")
+    return master.ticker_options(listed_only=True)
+
+
+def resolve_universe(universe, tickers=None):
+    if tickers:
+        return {t.strip().upper(): t.strip().upper() for t in tickers.split(",") if t.strip()}
+    listing = sp500_listing() if universe == "sp500" else core.get_popular_sp500_tickers()
+    return {symbol: label.split(" - ", 1)[-1] for symbol, label in listing.items()}
+
+
+def scan_sentiment(ticker, company_name, days):
+    """Summary row plus the scored (ticker, publishedAt, sentiment) articles."""
+    _, articles_df = core.run_sentiment(ticker, days, company_name=company_name)
+    scored = articles_df.assign(ticker=ticker)[["ticker", "publishedAt", "sentiment"]]
+    if articles_df.empty:
+        return {"ticker": ticker, "articles": 0}, scored
+    summary = core.get_sentiment_index().summary(ticker, core.window_start(days))
+    return {"ticker": ticker, **summary}, scored
+
+
+def scan_prices(ticker, start_date, end_date):
+    prices = core.load_prices(ticker, start_date, end_date)
+    return prices.assign(ticker=ticker)[["ticker", "date", "adj_close"]]
+
+
+def run_parallel(fn, jobs, workers, label):
+    """(results, errors, skipped); ``skipped`` maps tickers refused for NewsAPI quota."""
+    results, errors, skipped = [], {}, {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fn, *args): ticker for ticker, args in jobs}
+        for i, future in enumerate(as_completed(futures), 1):
+            ticker = futures[future]
+            try:
+                results.append(future.result())
+            except QuotaExhausted as e:
+                skipped[ticker] = str(e)
+            except Exception as e:
+                errors[ticker] = str(e)
+            if i % 50 == 0 or i == len(futures):
+                elapsed = time.perf_counter() - started
+                print(f"[{label}] {i}/{len(futures)} tickers "
+                      f"({i / elapsed:.1f} tickers/sec"
+                      + (f", {len(skipped)} skipped for quota" if skipped else "") + ")",
+                      file=sys.stderr)
+    return results, errors, skipped
+
+
+def trailing_returns(panel, horizons):
+    panel = panel.sort_values(["ticker", "date"])
+    grouped = panel.groupby("ticker")["adj_close"]
+    out = pd.DataFrame({
+        f"ret_{n}d": grouped.pct_change(n) for n in horizons
+    }).assign(ticker=panel["ticker"])
+    return out.groupby("ticker").last()
+
+
+def event_hpr_means(panel, events_path, horizons):
+    events = pd.read_csv(events_path)
+    hprs = compute_event_hprs_panel(panel, events, horizons=horizons)
+    if hprs.empty:
+        return pd.DataFrame()
+    means = hprs.pivot_table(index="ticker", columns=["pre_post", "days"], values="hpr",
+                             aggfunc="mean")
+    means.columns = [f"{side}_hpr_{n}d" for side, n in means.columns]
+    return means
+
+
+def sentiment_event_study(articles, panel, horizons, study_path, mode="article", n_quantiles=5):
+    study = sentiment_event_hprs(articles, panel, horizons=horizons, mode=mode,
+                                 n_quantiles=n_quantiles)
+    summary = quantile_summary(study)
+    summary.to_csv(study_path, index=False)
+    print(f"Event study: {study['event_id'].nunique()} {mode} events -> {study_path}",
+          file=sys.stderr)
+    return summary
+
+
+def scan(universe, days=30, workers=8, horizons=(1, 5, 10, 20), start_date="2022-01-01",
+         end_date=None, events_path=None, skip_sentiment=False, skip_hpr=False,
+         study_path=None, study_mode="article", study_quantiles=5):
+    end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+    frames, errors, skipped = [], {}, {}
+    articles = None
+
+    if not skip_sentiment:
+        # Build the shared scorer once before the pool fans out.
+        core.get_sentiment_scorer()
+        results, errors, skipped = run_parallel(
+            scan_sentiment,
+            [(t, (t, name, days)) for t, name in universe.items()],
+            workers, "sentiment",
+        )
+        if results:
+            frames.append(pd.DataFrame([row for row, _ in results]).set_index("ticker"))
+            articles = pd.concat([scored for _, scored in results], ignore_index=True)
+
+    if not skip_hpr:
+        price_frames, price_errors, _ = run_parallel(
+            scan_prices,
+            [(t, (t, start_date, end_date)) for t in universe],
+            workers, "prices",
+        )
+        errors.update(price_errors)
+        price_frames = [p for p in price_frames if not p.empty]
+        if price_frames:
+            panel = pd.concat(price_frames, ignore_index=True)
+            frames.append(trailing_returns(panel, horizons))
+            if events_path:
+                frames.append(event_hpr_means(panel, events_path, horizons))
+            if study_path and articles is not None and not articles.empty:
+                sentiment_event_study(articles, panel, horizons, study_path,
+                                      mode=study_mode, n_quantiles=study_quantiles)
+
+    results = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+    results = results.reindex(list(universe))
+    results.index.name = "ticker"
+    results.insert(0, "company", pd.Series(universe))
+    if "avg_sentiment" in results:
+        results = results.sort_values("avg_sentiment", ascending=False, na_position="last")
+        results.insert(1, "sentiment_rank",
+                       results["avg_sentiment"].rank(ascending=False, method="min"))
+    if errors:
+        results["error"] = pd.Series(errors)
+    if skipped:
+        results["skipped"] = pd.Series(skipped)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Universe-wide sentiment and HPR scan")
+    parser.add_argument("--universe", choices=["sp500", "popular"], default="sp500")
+    parser.add_argument("--tickers", help="Comma-separated tickers (overrides --universe)")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--horizons", default="1,5,10,20")
+    parser.add_argument("--start-date", default="2022-01-01")
+    parser.add_argument("--end-date")
+    parser.add_argument("--events", help="CSV of ticker,event_date for event HPRs")
+    parser.add_argument("--event-study", help="Write sentiment-quantile event HPRs to this CSV")
+    parser.add_argument("--event-mode", choices=["article", "spike"], default="article")
+    parser.add_argument("--quantiles", type=int, default=5)
+    parser.add_argument("--skip-sentiment", action="store_true")
+    parser.add_argument("--skip-hpr", action="store_true")
+    parser.add_argument("--output", default="scan_results.csv")
+    args = parser.parse_args(argv)
+
+    try:
+        universe = resolve_universe(args.universe, args.tickers)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    horizons = [int(h) for h in args.horizons.split(",")]
+
+    started = time.perf_counter()
+    results = scan(universe, days=args.days, workers=args.workers, horizons=horizons,
+                   start_date=args.start_date, end_date=args.end_date,
+                   events_path=args.events, skip_sentiment=args.skip_sentiment,
+                   skip_hpr=args.skip_hpr, study_path=args.event_study,
+                   study_mode=args.event_mode, study_quantiles=args.quantiles)
+    elapsed = time.perf_counter() - started
+
+    results.to_csv(args.output)
+    if not args.skip_sentiment:
+        core.get_sentiment_scorer().close()
+    print(f"Scanned {len(universe)} tickers in {elapsed:.1f}s "
+          f"({len(universe) / elapsed:.2f} tickers/sec) -> {args.output}")
+    if "skipped" in results:
+        print(f"{results['skipped'].notna().sum()} tickers skipped: NewsAPI quota exhausted "
+              f"(see the skipped column; rerun once it refills)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+# Fully offline: never fetch the VADER lexicon, never open a display.
+os.environ.setdefault("NLTK_OFFLINE", "1")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import analysis_core as core
+import charts
+import synthetic_data as syn
+from sentiment_backends import load_backend
+from sentiment_scoring import BatchSentimentScorer, SentimentMemo
+
+
+# ─────────────────────────────────────────────
+# Hot-path benchmarks on synthetic data
+# ─────────────────────────────────────────────
+#
+#   python benchmarks.py                      # compare against benchmark_baseline.json
+#   python benchmarks.py --update-baseline    # record a new baseline
+#
+# Each benchmark runs at 1x/10x/100x the production sizes in synthetic_data.
+# Wall time is the best of --repeat runs; peak memory is the tracemalloc peak
+# of one extra run. A result regresses when either exceeds the baseline by
+# more than --tolerance.
+
+SCALES = {"1x": 1, "10x": 10, "100x": 100}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "benchmark_baseline.json")
+HORIZONS = (1, 5, 10, 20)
+
+
+def _setup_event_hprs(k):
+    n_days = syn.PRODUCTION_SIZES["price_days"] * k
+    prices = syn.synthetic_prices(n_days)
+    dates = syn.synthetic_event_dates(syn.PRODUCTION_SIZES["events"] * k, n_days)
+    return lambda: core.compute_event_hprs(prices, dates, horizons=HORIZONS, ticker="SYN",
+                                           event_col="earnings_date")
+
+
+def _setup_calculate_sentiment(k, backend_name="vader"):
+    articles = syn.synthetic_articles(syn.PRODUCTION_SIZES["articles"] * k)
+    backend = load_backend(backend_name, analyzer=core.get_sentiment_analyzer())
+
+    def run():
+        # A fresh memo each run, so every text is actually scored.
+        scorer = BatchSentimentScorer(backend, memo=SentimentMemo(), workers=1)
+        return core.calculate_sentiment(core.articles_to_frame(articles), scorer=scorer)
+    return run
+
+
+def _setup_cluster_articles(k):
+    frame = core.articles_to_frame(syn.synthetic_articles(syn.PRODUCTION_SIZES["articles"] * k))
+    return lambda: core.cluster_articles(frame.copy(), core.new_near_duplicate_index())
+
+
+def _setup_price_prep(k):
+    raw = syn.synthetic_download(syn.PRODUCTION_SIZES["price_days"] * k)
+    return lambda: core.add_daily_returns(core.extract_adjusted_close(raw))
+
+
+def _setup_hpr_overlay(k):
+    table = syn.synthetic_hpr_table(syn.PRODUCTION_SIZES["events"] * k, horizons=HORIZONS)
+    return lambda: charts.render_png(
+        charts.plot_event_hpr_overlay(table, horizons=HORIZONS), dpi=100
+    )
+
+
+BENCHMARKS = {
+    "compute_event_hprs": _setup_event_hprs,
+    "calculate_sentiment": _setup_calculate_sentiment,
+    "calculate_sentiment[fast]": lambda k: _setup_calculate_sentiment(k, "fast"),
+    "cluster_articles": _setup_cluster_articles,
+    "extract_adjusted_close+add_daily_returns": _setup_price_prep,
+    "plot_event_hpr_overlay": _setup_hpr_overlay,
+}
+
+
+def measure(fn, repeat=3):
+    fn()  # warm-up: lazy imports, caches, first-call costs
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(times), "peak_mb": peak / (1024 * 1024)}
+
+
+def run_benchmarks(names, scales, repeat=3):
+    results = {}
+    for name in names:
+        for scale in scales:
+            key = f"{name}@{scale}"
+            try:
+                fn = BENCHMARKS[name](SCALES[scale])
+            except LookupError as e:
+                # Missing offline data (e.g. the VADER lexicon) skips rather than fails.
+                print(f"{key:<50} skipped: {str(e).strip().splitlines()[0]}")
+                continue
+            results[key] = measure(fn, repeat)
+            r = results[key]
+            print(f"{key:<50} {r['seconds'] * 1000:10.1f} ms  {r['peak_mb']:8.1f} MB peak")
+    return results
+
+
+def compare(results, baseline, tolerance=1.5, min_seconds=0.005):
+    """Names of results slower or hungrier than ``tolerance`` x their baseline."""
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        slow = (r["seconds"] > base["seconds"] * tolerance
+                and r["seconds"] - base["seconds"] > min_seconds)
+        hungry = r["peak_mb"] > base["peak_mb"] * tolerance and r["peak_mb"] - base["peak_mb"] > 1
+        ratio = r["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        flag = "  REGRESSION" if slow or hungry else ""
+        print(f"{key:<50} {ratio:6.2f}x time  "
+              f"{r['peak_mb'] - base['peak_mb']:+8.1f} MB{flag}")
+        if slow or hungry:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the compute hot paths offline")
+    parser.add_argument("--only", help="Comma-separated benchmark names")
+    parser.add_argument("--scales", default=",".join(SCALES),
+                        help="Comma-separated scales (default: 1x,10x,100x)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Allowed slowdown / memory growth factor vs the baseline")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    scales = args.scales.split(",")
+    unknown = [n for n in names if n not in BENCHMARKS] + [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Unknown benchmark or scale: {', '.join(unknown)}")
+
+    # Overlays with hundreds of events trip matplotlib's layout/legend warnings.
+    warnings.filterwarnings("ignore", category=UserWarning)
+    results = run_benchmarks(names, scales, args.repeat)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError):
+            baseline = {}
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline updated -> {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except OSError:
+        print(f"No baseline at {args.baseline}; run with --update-baseline first",
+              file=sys.stderr)
+        return 0
+
+    print()
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.2f}x baseline",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
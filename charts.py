@@ -0,0 +1,236 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────
+# Chart builders
+# ─────────────────────────────────────────────
+#
+# matplotlib is imported inside each builder so importing this module stays
+# cheap. Builders return an open Figure; render_png turns it into image bytes
+# and always closes it, so long-lived servers do not accumulate figures.
+
+def plot_sentiment_distribution(sentiment, avg_sentiment, company_name, ticker):
+    counts, edges = np.histogram(sentiment, bins=30)
+    return plot_sentiment_histogram(counts, edges, avg_sentiment, company_name, ticker)
+
+
+def plot_sentiment_histogram(counts, edges, avg_sentiment, company_name, ticker):
+    """Distribution chart from pre-binned counts, e.g. a SentimentAccumulator's."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+           color='steelblue', edgecolor='black', alpha=0.7)
+    ax.axvline(x=0, color='red', linestyle='--', linewidth=2, label='Neutral')
+    ax.axvline(x=avg_sentiment, color='green', linestyle='--', linewidth=2,
+               label=f'Average ({avg_sentiment:.3f})')
+    ax.set_xlabel('Sentiment Score', fontsize=12)
+    ax.set_ylabel('Number of Articles', fontsize=12)
+    ax.set_title(f'Sentiment Distribution for {company_name} ({ticker})',
+                 fontsize=14, fontweight='bold')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+def plot_sentiment_timeline(published_at, sentiment, company_name, ticker, trend=None,
+                            daily=None):
+    """Scatter of scores over time with a trend line.
+
+    ``trend`` is ``(slope_per_second, intercept, origin)`` when the line was
+    fitted elsewhere (over more points than are plotted); otherwise it is
+    fitted to the plotted points, and left out when there are too few of
+    them to fit. ``daily`` rows with ``day`` and ``ema`` columns add the
+    daily EMA as a step line.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.scatter(published_at, sentiment,
+               alpha=0.6, s=50,
+               c=sentiment, cmap='RdYlGn',
+               edgecolors='black')
+    ax.axhline(y=0, color='red', linestyle='--', linewidth=1, alpha=0.5)
+
+    if trend is None and published_at.nunique() >= 2:
+        from scipy import stats
+        origin = published_at.min()
+        x_numeric = (published_at - origin).dt.total_seconds()
+        slope, intercept, *_ = stats.linregress(x_numeric, sentiment)
+        trend = slope, intercept, origin
+    if trend is not None:
+        slope, intercept, origin = trend
+        x_numeric = (published_at - origin).dt.total_seconds()
+        ax.plot(published_at, slope * x_numeric + intercept,
+                color='blue', linewidth=2, label='Trend', alpha=0.7)
+    if daily is not None and not daily.empty:
+        day = daily['day'].dt.tz_localize(published_at.dt.tz) + pd.Timedelta(hours=12)
+        ax.step(day, daily['ema'], where='mid',
+                color='purple', linewidth=1.5, label='Daily EMA', alpha=0.7)
+
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Sentiment Score', fontsize=12)
+    ax.set_title(f'Sentiment Timeline for {company_name} ({ticker})',
+                 fontsize=14, fontweight='bold')
+    if ax.get_legend_handles_labels()[0]:
+        ax.legend()
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig
+
+
+def plot_event_hpr_overlay(hpr_table, horizons=(1, 5, 10, 20), pre_post="post",
+                           event_col="earnings_date", horizon_col="days",
+                           value_col="hpr", title="Event HPR Overlay",
+                           ylabel="Holding Period Return (HPR)"):
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import PercentFormatter
+
+    df = hpr_table.copy()
+    df[event_col] = pd.to_datetime(df[event_col])
+    df[horizon_col] = df[horizon_col].astype(int)
+    df = df[df["pre_post"] == pre_post]
+
+    pivot = (
+        df.pivot(index=event_col, columns=horizon_col, values=value_col)
+        .sort_index()
+    )
+    horizons = [int(h) for h in horizons]
+    pivot = pivot.reindex(columns=horizons)
+
+    fig, ax = plt.subplots(figsize=(9, 5))
+    for event_dt, row in pivot.iterrows():
+        ax.plot(horizons, row.values, marker="o", label=event_dt.strftime("%Y-%m-%d"))
+
+    ax.axhline(0, linewidth=1, color="black", linestyle="--", alpha=0.4)
+    ax.set_xlabel("Holding period (trading days)")
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend(title="Event date", frameon=False)
+    ax.grid(True, alpha=0.3)
+    ax.yaxis.set_major_formatter(PercentFormatter(xmax=1.0))
+    fig.tight_layout()
+    return fig
+
+
+def plot_hpr_comparison(hpr_table, horizons=(1, 5, 10, 20), pre_post="post",
+                        ticker_col="ticker", horizon_col="days", value_col="hpr",
+                        title="Mean Event HPR by Ticker",
+                        ylabel="Mean Holding Period Return (HPR)"):
+    """One line per ticker: mean HPR across its events at each horizon."""
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import PercentFormatter
+
+    df = hpr_table[hpr_table["pre_post"] == pre_post]
+    horizons = [int(h) for h in horizons]
+    means = (
+        df.groupby([ticker_col, df[horizon_col].astype(int)])[value_col].mean()
+        .unstack(horizon_col)
+        .reindex(columns=horizons)
+    )
+
+    fig, ax = plt.subplots(figsize=(9, 5))
+    for ticker, row in means.iterrows():
+        ax.plot(horizons, row.values, marker="o", linewidth=2, label=ticker)
+
+    ax.axhline(0, linewidth=1, color="black", linestyle="--", alpha=0.4)
+    ax.set_xlabel("Holding period (trading days)")
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend(title="Ticker", frameon=False)
+    ax.grid(True, alpha=0.3)
+    ax.yaxis.set_major_formatter(PercentFormatter(xmax=1.0))
+    fig.tight_layout()
+    return fig
+
+
+def render_png(fig, dpi=150):
+    import matplotlib.pyplot as plt
+
+    try:
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+        return buf.getvalue()
+    finally:
+        plt.close(fig)
+
+
+# ─────────────────────────────────────────────
+# Content-addressed render cache
+# ─────────────────────────────────────────────
+
+def fingerprint(*parts):
+    """Stable hash of plot inputs: frames, series, arrays and plain values."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            label = list(part.columns) if isinstance(part, pd.DataFrame) else part.name
+            h.update(repr(label).encode())
+            h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        elif isinstance(part, np.ndarray):
+            h.update(repr((part.dtype, part.shape)).encode())
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class RenderCache:
+    """LRU of rendered PNG bytes, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            png = self._data.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._data[key] = png
+            self.current_bytes += len(png)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def get_or_render(self, key, build_figure, dpi=150):
+        """PNG for ``key``; on a miss ``build_figure()`` is drawn, rendered and closed."""
+        png = self.get(key)
+        if png is None:
+            png = render_png(build_figure(), dpi=dpi)
+            self.put(key, png)
+        return png
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._data),
+                "bytes": self.current_bytes}
+
+
+render_cache = RenderCache(max_bytes=int(os.getenv("CHART_CACHE_MB", "64")) * 1024 * 1024)
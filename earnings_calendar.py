@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────
+# Local earnings-calendar index
+# ─────────────────────────────────────────────
+#
+# ticker -> sorted earnings dates, loaded from a CSV snapshot (the same
+# ticker,event_date layout batch_scan --events reads) and bulk-imported from
+# any such file. Queries are a dict hit and two searchsorted calls on a
+# datetime64 array, so HPR runs never wait on the network. Tickers that are
+# missing or whose dates are older than ``max_age_seconds`` are refreshed
+# through yfinance on a background thread; new dates are merged into the
+# existing ones, so history the source no longer reports is kept. A failed
+# refresh is retried after ``retry_seconds`` rather than on every query.
+
+SNAPSHOT_COLUMNS = ["ticker", "event_date"]
+
+
+def fetch_yfinance_earnings(ticker, limit=40):
+    import yfinance as yf
+    table = yf.Ticker(ticker).get_earnings_dates(limit=limit)
+    if table is None or table.empty:
+        return []
+    return [d.strftime("%Y-%m-%d") for d in pd.DatetimeIndex(table.index)]
+
+
+def _as_days(dates):
+    days = pd.to_datetime(pd.Series(list(dates), dtype=object), errors="coerce").dropna()
+    return np.unique(days.to_numpy().astype("datetime64[D]"))
+
+
+def _write_atomic(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class EarningsCalendar:
+    def __init__(self, snapshot_path, seed=None, fetch_dates=fetch_yfinance_earnings,
+                 max_age_seconds=7 * 86400, retry_seconds=3600):
+        self.snapshot_path = snapshot_path
+        self.refreshed_path = os.path.splitext(snapshot_path)[0] + ".refreshed.json"
+        self.fetch_dates = fetch_dates
+        self.max_age_seconds = max_age_seconds
+        self.retry_seconds = retry_seconds
+        self.last_refresh_error = None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._failed = {}
+        self._fetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="earnings-refresh")
+        try:
+            with open(self.refreshed_path, "r", encoding="utf-8") as f:
+                self._refreshed = json.load(f)
+        except (OSError, ValueError):
+            self._refreshed = {}
+        self._dates = {}
+        self._merge(seed or {})
+        self._load_snapshot()
+
+    # ── index ────────────────────────────────
+
+    def _merge(self, by_ticker):
+        """Union ``{ticker: dates}`` into the index; returns the number of new dates."""
+        merged = dict(self._dates)
+        added = 0
+        for ticker, dates in by_ticker.items():
+            key = ticker.strip().upper()
+            known = merged.get(key, np.empty(0, dtype="datetime64[D]"))
+            combined = np.union1d(known, _as_days(dates))
+            added += len(combined) - len(known)
+            merged[key] = combined
+        # Swap the whole dict so readers never see a half-merged index.
+        self._dates = merged
+        return added
+
+    @staticmethod
+    def _from_frame(frame):
+        frame = frame.reindex(columns=SNAPSHOT_COLUMNS).dropna()
+        return {t: list(g["event_date"]) for t, g in frame.groupby("ticker", sort=False)}
+
+    def _load_snapshot(self):
+        try:
+            frame = pd.read_csv(self.snapshot_path, dtype=str)
+        except (OSError, ValueError):
+            return False
+        self._merge(self._from_frame(frame))
+        return True
+
+    def _save(self):
+        frame = pd.DataFrame(
+            [(t, str(d)) for t, dates in sorted(self._dates.items()) for d in dates],
+            columns=SNAPSHOT_COLUMNS,
+        )
+        _write_atomic(self.snapshot_path, lambda f: frame.to_csv(f, index=False))
+        refreshed = dict(self._refreshed)
+        _write_atomic(self.refreshed_path, lambda f: json.dump(refreshed, f))
+
+    def load_csv(self, path):
+        """Bulk-import a ticker,event_date CSV into the index; returns the number of new dates."""
+        frame = pd.read_csv(path, dtype=str)
+        frame.columns = [c.strip().lower() for c in frame.columns]
+        if "event_date" not in frame.columns and "date" in frame.columns:
+            frame = frame.rename(columns={"date": "event_date"})
+        with self._lock:
+            added = self._merge(self._from_frame(frame))
+            self._save()
+        return added
+
+    # ── queries ──────────────────────────────
+
+    def __len__(self):
+        return len(self._dates)
+
+    def __contains__(self, ticker):
+        return len(self._dates.get(ticker.strip().upper(), ())) > 0
+
+    def tickers(self):
+        return sorted(t for t, dates in self._dates.items() if len(dates))
+
+    def dates(self, ticker, start_year=None, end_year=None):
+        """Earnings dates for ``ticker`` as YYYY-MM-DD strings, optionally within a year range."""
+        days = self._dates.get(ticker.strip().upper())
+        if days is None or not len(days):
+            return []
+        lo = 0 if start_year is None else np.searchsorted(
+            days, np.datetime64(f"{int(start_year):04d}-01-01"), side="left")
+        hi = len(days) if end_year is None else np.searchsorted(
+            days, np.datetime64(f"{int(end_year) + 1:04d}-01-01"), side="left")
+        return [str(d) for d in days[lo:hi]]
+
+    def dates_by_year(self, ticker, start_year=None, end_year=None):
+        by_year = {}
+        for d in self.dates(ticker, start_year, end_year):
+            by_year.setdefault(int(d[:4]), []).append(d)
+        return by_year
+
+    def years(self, ticker):
+        return sorted(self.dates_by_year(ticker))
+
+    def query(self, tickers, start_year=None, end_year=None):
+        """{ticker: dates} for several tickers, the shape peer_event_hprs accepts."""
+        return {t: self.dates(t, start_year, end_year) for t in tickers}
+
+    # ── background refresh ───────────────────
+
+    def age(self, ticker):
+        stamp = self._refreshed.get(ticker.strip().upper())
+        return time.time() - stamp if stamp else None
+
+    def refresh(self, ticker):
+        """Fetch ``ticker``'s dates now (blocking) and merge them; returns the number of new dates."""
+        key = ticker.strip().upper()
+        try:
+            fetched = self.fetch_dates(key)
+        except Exception as e:
+            self._failed[key] = time.time()
+            self.last_refresh_error = f"{key}: {e}"
+            return None
+        with self._lock:
+            added = self._merge({key: fetched})
+            self._refreshed[key] = time.time()
+            self._save()
+        self._failed.pop(key, None)
+        self.last_refresh_error = None
+        return added
+
+    def refresh_in_background(self, ticker):
+        key = ticker.strip().upper()
+        if not key or self.fetch_dates is None or key in self._refreshing:
+            return False
+        self._refreshing.add(key)
+
+        def run():
+            try:
+                self.refresh(key)
+            finally:
+                self._refreshing.discard(key)
+
+        self._fetcher.submit(run)
+        return True
+
+    def refresh_if_stale(self, ticker):
+        failed = self._failed.get(ticker.strip().upper())
+        if failed is not None and time.time() - failed < self.retry_seconds:
+            return False
+        age = self.age(ticker)
+        if age is None or age > self.max_age_seconds:
+            return self.refresh_in_background(ticker)
+        return False
+
+
+def main(argv=None):
+    import analysis_core as core
+
+    parser = argparse.ArgumentParser(description="Inspect or update the local earnings calendar")
+    parser.add_argument("--import", dest="import_path",
+                        help="Merge a CSV of ticker,event_date into the calendar")
+    parser.add_argument("--refresh", help="Comma-separated tickers to refresh from yfinance now")
+    parser.add_argument("--show", help="Comma-separated tickers to print")
+    parser.add_argument("--years", help="Year range for --show, e.g. 2023-2025")
+    args = parser.parse_args(argv)
+
+    calendar = core.get_earnings_calendar()
+    if args.import_path:
+        print(f"{calendar.load_csv(args.import_path)} new dates imported from {args.import_path}")
+    for ticker in filter(None, (args.refresh or "").split(",")):
+        added = calendar.refresh(ticker)
+        print(f"{ticker.upper()}: " + (f"{added} new dates" if added is not None
+                                       else f"refresh failed ({calendar.last_refresh_error})"))
+    start = end = None
+    if args.years:
+        start, _, end = args.years.partition("-")
+        start, end = int(start), int(end or start)
+    for ticker in filter(None, (args.show or "").split(",")):
+        print(f"{ticker.upper()}: {', '.join(calendar.dates(ticker, start, end)) or '(none)'}")
+    if not (args.import_path or args.refresh or args.show):
+        print(f"{len(calendar.tickers())} tickers in {calendar.snapshot_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+from hpr_engine import compute_event_hprs_panel
+
+
+# ─────────────────────────────────────────────
+# Sentiment event study
+# ─────────────────────────────────────────────
+#
+# Links scored articles to the returns that followed them. Every article (or
+# every sentiment spike day) becomes an event on the first trading session
+# whose close is at or after its publication; events are aligned for all
+# tickers with one merge_asof, HPRs are computed once per distinct
+# (ticker, trading day) with the panel engine and joined back, and the
+# result is bucketed by sentiment quantile.
+
+MARKET_TZ = "America/New_York"
+MARKET_CLOSE_HOUR = 16
+
+
+def article_event_dates(published_at, tz=MARKET_TZ, close_hour=MARKET_CLOSE_HOUR):
+    """Calendar date of the first close at or after each publication time.
+
+    Articles published after the close roll over to the next calendar day;
+    weekends and holidays are resolved against the trading calendar by
+    align_to_calendar.
+    """
+    local = pd.to_datetime(published_at, utc=True).dt.tz_convert(tz)
+    after_close = (local.dt.hour >= close_hour).astype(int)
+    return (local.dt.normalize() + pd.to_timedelta(after_close, unit="D")).dt.tz_localize(None)
+
+
+def align_to_calendar(events, prices, ticker_col="ticker", date_col="date",
+                      event_col="event_date"):
+    """Attach ``event_trading_date``: the ticker's first trading date on or after ``event_col``.
+
+    Events past the end of a ticker's price history get NaT.
+    """
+    cal = (
+        prices[[ticker_col, date_col]]
+        .drop_duplicates()
+        .rename(columns={date_col: "event_trading_date"})
+    )
+    # merge_asof needs both keys at the same datetime resolution.
+    cal["event_trading_date"] = pd.to_datetime(cal["event_trading_date"]).astype("datetime64[ns]")
+    ev = events.copy()
+    ev[event_col] = pd.to_datetime(ev[event_col]).astype("datetime64[ns]")
+    aligned = pd.merge_asof(
+        ev.sort_values(event_col, kind="mergesort"),
+        cal.sort_values("event_trading_date", kind="mergesort"),
+        left_on=event_col,
+        right_on="event_trading_date",
+        by=ticker_col,
+        direction="forward",
+    )
+    return aligned
+
+
+def sentiment_spikes(articles, ticker_col="ticker", lookback=20, z_threshold=2.0,
+                     min_articles=3):
+    """Days whose mean sentiment departs from the trailing ``lookback``-day norm.
+
+    ``articles`` has ``ticker_col``, ``event_date`` and ``sentiment``. Returns
+    one row per spike with the day's mean ``sentiment``, ``articles`` and ``zscore``.
+    """
+    daily = (
+        articles.groupby([ticker_col, "event_date"], sort=True)["sentiment"]
+        .agg(sentiment="mean", articles="size")
+        .reset_index()
+    )
+    prior = daily.groupby(ticker_col)["sentiment"].shift(1)
+    grouped = prior.groupby(daily[ticker_col])
+    mean = grouped.transform(lambda s: s.rolling(lookback, min_periods=lookback // 2).mean())
+    std = grouped.transform(lambda s: s.rolling(lookback, min_periods=lookback // 2).std())
+    daily["zscore"] = (daily["sentiment"] - mean) / std.replace(0, np.nan)
+    spikes = (daily["zscore"].abs() >= z_threshold) & (daily["articles"] >= min_articles)
+    return daily[spikes].reset_index(drop=True)
+
+
+def sentiment_quantiles(sentiment, n_quantiles=5):
+    """Quantile bucket (1 = most negative) per score; ties are split by order."""
+    if len(sentiment) == 0:
+        return pd.Series(dtype="Int64", index=sentiment.index)
+    n = min(n_quantiles, len(sentiment))
+    ranks = sentiment.rank(method="first")
+    return pd.qcut(ranks, n, labels=range(1, n + 1)).astype(int)
+
+
+def sentiment_event_hprs(articles, prices, horizons=(1, 5, 10, 20), mode="article",
+                         n_quantiles=5, ticker_col="ticker", date_col="date",
+                         price_col="adj_close", **spike_kwargs):
+    """Pre/post HPRs for every article or spike day, tagged with its sentiment quantile.
+
+    ``articles`` is long-format (ticker, publishedAt, sentiment) for any number
+    of tickers; ``prices`` is a (ticker, date, adj_close) panel. ``mode`` is
+    "article" (one event per article) or "spike" (see sentiment_spikes).
+    Returns one row per (event, pre_post, horizon).
+    """
+    if mode not in ("article", "spike"):
+        raise ValueError(f"Unsupported mode: {mode!r}")
+
+    events = articles.copy()
+    events["event_date"] = article_event_dates(events["publishedAt"])
+    if mode == "spike":
+        events = sentiment_spikes(events, ticker_col=ticker_col, **spike_kwargs)
+    events = events.reset_index(drop=True)
+    events["event_id"] = np.arange(len(events))
+    events["sentiment_quantile"] = sentiment_quantiles(events["sentiment"], n_quantiles)
+
+    aligned = align_to_calendar(events, prices, ticker_col=ticker_col, date_col=date_col)
+    aligned = aligned.dropna(subset=["event_trading_date"])
+
+    # Many articles share a trading day; price each (ticker, day) once.
+    days = aligned[[ticker_col, "event_trading_date"]].drop_duplicates()
+    hprs = compute_event_hprs_panel(
+        prices, days, horizons=horizons, ticker_col=ticker_col, date_col=date_col,
+        price_col=price_col, event_col="event_trading_date",
+    )
+    hpr_cols = ["pre_post", "days", "start_date", "end_date", "hpr"]
+    if hprs.empty:
+        return aligned.iloc[0:0].reindex(columns=[*aligned.columns, *hpr_cols])
+    out = aligned.merge(
+        hprs[[ticker_col, "event_trading_date", *hpr_cols]],
+        on=[ticker_col, "event_trading_date"],
+        how="inner",
+    )
+    return (
+        out.sort_values(["event_id", "pre_post", "days"], kind="mergesort")
+        .reset_index(drop=True)
+    )
+
+
+def quantile_summary(study):
+    """Mean/median HPR and hit rate per (sentiment quantile, pre_post, horizon)."""
+    if study.empty:
+        return pd.DataFrame(columns=["sentiment_quantile", "pre_post", "days", "events",
+                                     "mean_sentiment", "mean_hpr", "median_hpr",
+                                     "hit_rate"])
+    return (
+        study.assign(up=study["hpr"] > 0)
+        .groupby(["sentiment_quantile", "pre_post", "days"], sort=True)
+        .agg(events=("hpr", "size"), mean_sentiment=("sentiment", "mean"),
+             mean_hpr=("hpr", "mean"), median_hpr=("hpr", "median"),
+             hit_rate=("up", "mean"))
+        .reset_index()
+    )
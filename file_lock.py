@@ -0,0 +1,35 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, only the callers' thread locks apply
+    fcntl = None
+
+
+# ─────────────────────────────────────────────
+# Cross-process locks for files under .cache/
+# ─────────────────────────────────────────────
+#
+# The app, prewarm.py and api_server.py can run as separate processes over
+# the same cache directory. Read-modify-write cycles on shared files (the
+# article archive, the NewsAPI token bucket) hold an flock on a sidecar
+# ".lock" file so that only one process at a time is inside them. flock locks
+# belong to the open file, so two threads of one process that each enter
+# file_lock also exclude each other.
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold an exclusive (or shared) advisory lock on ``path`` for the block."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock.
+        os.close(fd)
@@ -0,0 +1,361 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────
+# Vectorized event HPR engine
+# ─────────────────────────────────────────────
+#
+# Array-based counterpart of compute_event_hprs in analysis_core.py.
+# Works on a long-format panel (ticker, date, adj_close) so a whole universe
+# of tickers and earnings events is mapped with one searchsorted and priced
+# with one NumPy gather. compute_event_hprs stays as the reference path;
+# ``python hpr_engine.py`` checks the two agree (see parity_report).
+
+def _panel_keys(codes, date_rank, n_dates):
+    # Composite (ticker, date) key that is monotonic in the panel sort order.
+    return codes.astype(np.int64) * (n_dates + 2) + date_rank
+
+
+def map_events_to_positions(price_codes, price_dates, event_codes, event_dates,
+                            direction="backward"):
+    """Map every event to the row of its trading date in a (ticker, date) sorted panel.
+
+    Returns an int64 array of panel positions, -1 where the event falls
+    outside the ticker's price history.
+    """
+    if direction not in ("backward", "forward"):
+        raise ValueError(f"Unsupported direction: {direction!r}")
+
+    udates = np.unique(price_dates)
+    n_dates = len(udates)
+    price_rank = np.searchsorted(udates, price_dates) + 1
+    price_keys = _panel_keys(price_codes, price_rank, n_dates)
+
+    if direction == "backward":
+        ev_rank = np.searchsorted(udates, event_dates, side="right")
+        pos = np.searchsorted(price_keys, _panel_keys(event_codes, ev_rank, n_dates),
+                              side="right") - 1
+    else:
+        ev_rank = np.searchsorted(udates, event_dates, side="left") + 1
+        pos = np.searchsorted(price_keys, _panel_keys(event_codes, ev_rank, n_dates),
+                              side="left")
+
+    n_obs = len(price_keys)
+    in_range = (pos >= 0) & (pos < n_obs)
+    valid = np.zeros(len(pos), dtype=bool)
+    valid[in_range] = price_codes[pos[in_range]] == event_codes[in_range]
+    return np.where(valid, pos, -1)
+
+
+def compute_event_hprs_panel(prices, events, horizons=(1, 5, 10, 20),
+                             ticker_col="ticker", date_col="date", price_col="adj_close",
+                             event_col="event_date", direction="backward", benchmark=None,
+                             estimation_window=120, estimation_gap=None, min_estimation_obs=60):
+    """Pre/post event HPRs for many tickers in one pass.
+
+    ``prices`` is long-format (ticker, date, price); ``events`` has one row per
+    (ticker, event date). Output columns match compute_event_hprs.
+
+    With a ``benchmark`` frame (date, price), each event also gets a market
+    model fitted over ``estimation_window`` daily returns ending
+    ``estimation_gap`` sessions before the event (default: the longest
+    horizon), and the columns in ABNORMAL_COLUMNS.
+    """
+    out_cols = [ticker_col, event_col, "event_trading_date", "pre_post", "days",
+                "start_date", "end_date", "hpr"]
+    if benchmark is not None:
+        out_cols += ABNORMAL_COLUMNS
+
+    px = prices[[ticker_col, date_col, price_col]].copy()
+    px[date_col] = pd.to_datetime(px[date_col])
+    px = (
+        px.drop_duplicates(subset=[ticker_col, date_col], keep="last")
+        .sort_values([ticker_col, date_col], kind="mergesort")
+        .reset_index(drop=True)
+    )
+
+    ev = events[[ticker_col, event_col]].copy()
+    ev[event_col] = pd.to_datetime(ev[event_col])
+    ev = ev.sort_values([ticker_col, event_col], kind="mergesort").reset_index(drop=True)
+
+    tickers = pd.Index(px[ticker_col].unique())
+    price_codes = tickers.get_indexer(px[ticker_col])
+    event_codes = tickers.get_indexer(ev[ticker_col])
+
+    price_dates = px[date_col].to_numpy()
+    price_vals = px[price_col].to_numpy(dtype=float)
+
+    known = event_codes >= 0
+    pos = np.full(len(ev), -1, dtype=np.int64)
+    pos[known] = map_events_to_positions(
+        price_codes, price_dates, event_codes[known], ev[event_col].to_numpy()[known],
+        direction=direction,
+    )
+    keep = pos >= 0
+    ev, pos, event_codes = ev[keep].reset_index(drop=True), pos[keep], event_codes[keep]
+
+    if ev.empty:
+        return pd.DataFrame(columns=out_cols)
+
+    # Segment bounds of each event's ticker in the sorted panel.
+    seg_start = np.searchsorted(price_codes, event_codes, side="left")
+    seg_end = np.searchsorted(price_codes, event_codes, side="right")
+
+    h = np.asarray([int(n) for n in horizons], dtype=np.int64)
+    t = pos[:, None]
+    n_ev, n_h = len(ev), len(h)
+
+    # (event, horizon, pre/post) start/end positions, gathered in one shot.
+    starts = np.stack([t - h, np.broadcast_to(t, (n_ev, n_h))], axis=2)
+    ends = np.stack([np.broadcast_to(t - 1, (n_ev, n_h)), t + h], axis=2)
+    valid = np.stack([
+        (t - h) >= seg_start[:, None],
+        (t + h) < seg_end[:, None],
+    ], axis=2)
+    # Reference path requires the pre window to end on or after the first row.
+    valid[:, :, 0] &= (t - 1) >= seg_start[:, None]
+
+    ev_idx, h_idx, side_idx = np.nonzero(valid)
+    s = starts[ev_idx, h_idx, side_idx]
+    e = ends[ev_idx, h_idx, side_idx]
+
+    columns = {}
+    if benchmark is not None:
+        bench = benchmark[[date_col, price_col]].copy()
+        bench[date_col] = pd.to_datetime(bench[date_col])
+        bench = bench.drop_duplicates(subset=[date_col], keep="last").set_index(date_col)
+        bench_vals = bench[price_col].reindex(px[date_col]).to_numpy(dtype=float)
+        gap = int(estimation_gap if estimation_gap is not None else h.max())
+        columns = _market_model_columns(
+            price_vals, bench_vals, price_codes, pos, seg_start, ev_idx, s, e,
+            window=int(estimation_window), gap=gap, min_obs=int(min_estimation_obs),
+        )
+
+    result = pd.DataFrame({
+        ticker_col: ev[ticker_col].to_numpy()[ev_idx],
+        event_col: ev[event_col].to_numpy()[ev_idx],
+        "event_trading_date": price_dates[pos[ev_idx]],
+        "pre_post": np.array(["pre", "post"])[side_idx],
+        "days": h[h_idx],
+        "start_date": price_dates[s],
+        "end_date": price_dates[e],
+        "hpr": price_vals[e] / price_vals[s] - 1,
+        **columns,
+    })
+    if benchmark is not None:
+        result["abnormal_hpr"] = result["hpr"] - result.pop("expected_hpr")
+    return (
+        result.sort_values([ticker_col, event_col, "pre_post", "days"], kind="mergesort")
+        .reset_index(drop=True)
+    )
+
+
+# ─────────────────────────────────────────────
+# Market-model abnormal returns
+# ─────────────────────────────────────────────
+#
+# Per event: r = alpha + beta * m fitted by OLS on daily returns over a
+# pre-event estimation window. The five sums OLS needs (n, Σm, Σr, Σm², Σmr)
+# come from prefix sums over the whole panel, so every event's regression is
+# two gathers and a subtraction. Cumulative abnormal returns use the same
+# prefix sums; buy-and-hold abnormal HPRs compound the expected daily
+# returns over each window with one (rows x longest horizon) gather.
+
+ABNORMAL_COLUMNS = ["benchmark_hpr", "alpha", "beta", "estimation_obs", "car", "abnormal_hpr"]
+
+
+def _daily_returns(values, codes):
+    out = np.full(len(values), np.nan)
+    same = codes[1:] == codes[:-1]
+    out[1:][same] = values[1:][same] / values[:-1][same] - 1
+    return out
+
+
+def _prefix(x):
+    return np.concatenate([[0.0], np.cumsum(x)])
+
+
+def _market_model_columns(price_vals, bench_vals, price_codes, pos, seg_start, ev_idx, s, e,
+                          window, gap, min_obs):
+    r = _daily_returns(price_vals, price_codes)
+    m = _daily_returns(bench_vals, price_codes)
+    valid = np.isfinite(r) & np.isfinite(m)
+    rv, mv = np.where(valid, r, 0.0), np.where(valid, m, 0.0)
+    p_n, p_m, p_r = _prefix(valid.astype(float)), _prefix(mv), _prefix(rv)
+    p_mm, p_mr = _prefix(mv * mv), _prefix(mv * rv)
+
+    # Estimation returns (lo, hi] per event, kept inside the ticker's segment.
+    hi = pos - gap
+    lo = np.maximum(hi - window, seg_start - 1)
+    hi = np.maximum(hi, lo)
+
+    def window_sum(prefix):
+        return prefix[hi + 1] - prefix[lo + 1]
+
+    n, sm, sr, smm, smr = (window_sum(p) for p in (p_n, p_m, p_r, p_mm, p_mr))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = n * smm - sm * sm
+        beta = (n * smr - sm * sr) / var
+        alpha = (sr - beta * sm) / n
+    fitted = (n >= max(min_obs, 2)) & (var > 0)
+    alpha, beta = np.where(fitted, alpha, np.nan), np.where(fitted, beta, np.nan)
+
+    # Event windows: returns (s, e] per output row.
+    a, b = alpha[ev_idx], beta[ev_idx]
+    length = e - s
+    complete = (p_n[e + 1] - p_n[s + 1]) == length
+    car = (p_r[e + 1] - p_r[s + 1]) - a * length - b * (p_m[e + 1] - p_m[s + 1])
+
+    steps = np.arange(1, max(int(length.max(initial=0)), 1) + 1)
+    in_window = steps[None, :] <= length[:, None]
+    idx = np.minimum(s[:, None] + steps[None, :], len(m) - 1)
+    growth = np.where(in_window, 1 + a[:, None] + b[:, None] * m[idx], 1.0)
+
+    return {
+        "benchmark_hpr": bench_vals[e] / bench_vals[s] - 1,
+        "alpha": a,
+        "beta": b,
+        "estimation_obs": n[ev_idx].astype(np.int64),
+        "car": np.where(complete, car, np.nan),
+        "expected_hpr": np.where(complete, growth.prod(axis=1) - 1, np.nan),
+    }
+
+
+def events_frame(event_dates, ticker, ticker_col="ticker", event_col="event_date"):
+    """Long-format events for a single ticker, for use with compute_event_hprs_panel."""
+    return pd.DataFrame({ticker_col: ticker, event_col: pd.to_datetime(list(event_dates))})
+
+
+# ─────────────────────────────────────────────
+# Parity with the reference path
+# ─────────────────────────────────────────────
+#
+#   python hpr_engine.py --cases 20
+#
+# Random panels are deliberately messy: each ticker trades on its own
+# irregular calendar, rows arrive shuffled with some repeated, and events
+# include duplicates, non-trading days, dates outside the ticker's history
+# and a ticker with no prices at all. The reference path expects one clean,
+# deduplicated series per ticker, so it is given exactly that; the panel
+# gets the raw frame and has to clean it up itself.
+
+PARITY_KEYS = ["ticker", "event_date", "event_trading_date", "pre_post", "days"]
+
+
+def random_parity_case(seed, n_tickers=5, n_days=400, n_events=16, duplicate_share=0.05):
+    """(prices, events) long-format frames for one randomized parity check."""
+    rng = np.random.default_rng(seed)
+    calendar = pd.bdate_range("2020-01-01", periods=n_days)
+    price_parts, event_parts = [], []
+    for i in range(n_tickers):
+        ticker = f"T{i}"
+        first, last = np.sort(rng.choice(n_days, size=2, replace=False))
+        trading = calendar[first:last + 1]
+        trading = trading[rng.random(len(trading)) > 0.1]
+        closes = 100 * np.cumprod(1 + rng.normal(0.0005, 0.02, len(trading)))
+        price_parts.append(pd.DataFrame({"ticker": ticker, "date": trading,
+                                         "adj_close": closes}))
+        # Calendar days from a month before the history to a month after it.
+        span = pd.date_range(trading[0] - pd.Timedelta(days=30),
+                             trading[-1] + pd.Timedelta(days=30)) if len(trading) else calendar
+        picks = span[rng.choice(len(span), size=n_events)]
+        picks = picks.append(picks[:max(1, n_events // 8)])
+        event_parts.append(pd.DataFrame({"ticker": ticker, "event_date": picks}))
+    event_parts.append(pd.DataFrame({"ticker": "NOPRICES", "event_date": calendar[:3]}))
+
+    prices = pd.concat(price_parts, ignore_index=True)
+    repeats = prices.sample(frac=duplicate_share, random_state=seed)
+    prices = pd.concat([prices, repeats]).sample(frac=1, random_state=seed + 1)
+    events = pd.concat(event_parts, ignore_index=True).sample(frac=1, random_state=seed + 2)
+    return prices.reset_index(drop=True), events.reset_index(drop=True)
+
+
+def _parity_frame(table):
+    table = table.copy()
+    for col in ("event_date", "event_trading_date", "start_date", "end_date"):
+        table[col] = pd.to_datetime(table[col])
+    table["days"] = table["days"].astype(np.int64)
+    return table.sort_values(PARITY_KEYS + ["start_date"], kind="mergesort").reset_index(drop=True)
+
+
+def parity_report(prices, events, reference, horizons=(1, 5, 10, 20), direction="backward"):
+    """Deviation of compute_event_hprs_panel from ``reference`` (compute_event_hprs).
+
+    ``reference`` is called once per ticker on that ticker's deduplicated
+    prices; the panel engine gets ``prices`` and ``events`` as they are.
+    """
+    clean = prices.drop_duplicates(subset=["ticker", "date"], keep="last")
+    started = time.perf_counter()
+    parts = []
+    for ticker, group in events.groupby("ticker", sort=True):
+        series = clean[clean["ticker"] == ticker]
+        if not series.empty:
+            parts.append(reference(series, list(group["event_date"]), horizons=horizons,
+                                   ticker=ticker, direction=direction))
+    expected = (pd.concat([p for p in parts if not p.empty], ignore_index=True)
+                if any(not p.empty for p in parts) else pd.DataFrame(columns=PARITY_KEYS))
+    reference_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = compute_event_hprs_panel(prices, events, horizons=horizons, direction=direction)
+    panel_seconds = time.perf_counter() - started
+
+    report = {
+        "events": len(events),
+        "reference_rows": len(expected),
+        "panel_rows": len(actual),
+        "mismatched_rows": abs(len(expected) - len(actual)),
+        "max_abs_deviation": 0.0,
+        "reference_seconds": reference_seconds,
+        "panel_seconds": panel_seconds,
+    }
+    if len(expected) != len(actual) or expected.empty:
+        return report
+    expected, actual = _parity_frame(expected), _parity_frame(actual)
+    same_rows = np.ones(len(actual), dtype=bool)
+    for col in PARITY_KEYS + ["start_date", "end_date"]:
+        same_rows &= (expected[col].to_numpy() == actual[col].to_numpy())
+    deviation = np.abs(expected["hpr"].to_numpy(dtype=float) - actual["hpr"].to_numpy(dtype=float))
+    report["mismatched_rows"] = int((~same_rows).sum())
+    report["max_abs_deviation"] = float(deviation.max())
+    return report
+
+
+def main(argv=None):
+    from analysis_core import compute_event_hprs
+
+    parser = argparse.ArgumentParser(
+        description="Check compute_event_hprs_panel against compute_event_hprs")
+    parser.add_argument("--cases", type=int, default=20, help="Random panels per direction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=1e-12,
+                        help="Largest allowed absolute HPR deviation")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for direction in ("backward", "forward"):
+        totals = {"rows": 0, "mismatched": 0, "deviation": 0.0, "reference": 0.0, "panel": 0.0}
+        for case in range(args.cases):
+            prices, events = random_parity_case(args.seed + case)
+            report = parity_report(prices, events, compute_event_hprs, direction=direction)
+            totals["rows"] += report["panel_rows"]
+            totals["mismatched"] += report["mismatched_rows"]
+            totals["deviation"] = max(totals["deviation"], report["max_abs_deviation"])
+            totals["reference"] += report["reference_seconds"]
+            totals["panel"] += report["panel_seconds"]
+            if report["mismatched_rows"] or report["max_abs_deviation"] > args.tolerance:
+                failed += 1
+                print(f"{direction} case {args.seed + case}: {report}", file=sys.stderr)
+        print(f"{direction}: {args.cases} cases, {totals['rows']} rows, "
+              f"{totals['mismatched']} mismatched, max |Δ| {totals['deviation']:.2e}; "
+              f"reference {totals['reference'] * 1000:.0f} ms, panel {totals['panel'] * 1000:.0f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# ─────────────────────────────────────────────
+# Cold-start import timing
+# ─────────────────────────────────────────────
+#
+#   python import_timing.py --budget 3.0 --json import_timing.json
+#
+# Each module is imported in a fresh interpreter so nothing is shared with
+# earlier measurements. For the app itself we also report which heavy
+# libraries the import pulled in; with lazy imports that list should be empty.
+
+MODULES = ["stock_sentiment_app", "analysis_core"]
+HEAVY_MODULES = ["matplotlib", "yfinance", "newsapi", "scipy", "nltk"]
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy_loaded": heavy}}))
+"""
+
+
+def measure(module, runs=3):
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=here, capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "module": module,
+        "seconds": min(s["seconds"] for s in samples),
+        "heavy_loaded": samples[-1]["heavy_loaded"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import time of the app")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", type=float, help="Fail if the app import exceeds this many seconds")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    results = [measure(m, args.runs) for m in MODULES]
+    for r in results:
+        heavy = ", ".join(r["heavy_loaded"]) or "none"
+        print(f"{r['module']:<22} {r['seconds']:.3f}s  heavy modules loaded: {heavy}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.budget is not None and results[0]["seconds"] > args.budget:
+        print(f"Import of {MODULES[0]} exceeds budget of {args.budget:.2f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
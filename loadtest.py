@@ -0,0 +1,427 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data as syn
+from news_scheduler import NewsApiHttpClient, StubNewsApiServer
+from user_db import UserDB
+
+
+# ─────────────────────────────────────────────
+# Concurrent-session load test
+# ─────────────────────────────────────────────
+#
+#   python loadtest.py --sessions 1,5,10,25 --iterations 3
+#   python loadtest.py --news-latency 0.5 --articles 1000 --price-latency 1.0
+#
+# Streamlit runs every browser session's script on its own thread of one
+# process, so N concurrent users are simulated as N threads calling what the
+# app's buttons call: login (users.db), "Analyse Sentiment" (usage tracking,
+# cached_sentiment, the dashboard read) and "Run HPR Analysis" (calendar,
+# batched prices, cached_peer_event_hprs). Chart rendering is not included.
+#
+# NewsAPI is replaced by StubNewsApiServer over real HTTP, serving
+# ``--articles`` synthetic articles per query after ``--news-latency``
+# seconds. yf.download is replaced by a price source returning yfinance-shaped
+# frames after ``--price-latency`` seconds per call. Everything runs in a
+# scratch cache directory, so the real caches are never touched.
+#
+# Each level reports throughput, p50/p99 latency per step, peak RSS and
+# SQLite lock contention. Contention is sampled by a probe that tries to take
+# each database's write lock without waiting: "busy" is the share of
+# samples where another connection held it, and "wait" is how long the probe
+# then blocked. --max-p99-ms and any errors make the run exit non-zero, so it
+# can gate scaling regressions.
+
+STEPS = ("login", "sentiment", "hpr", "session")
+SQLITE_FILES = ("users.db", os.path.join("cache", "articles.db"),
+                os.path.join("cache", "sentiment_index.db"))
+
+
+class StubPriceSource:
+    """yf.download stand-in: deterministic random-walk prices after ``latency`` seconds per call."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _frame(self, ticker, start, end):
+        dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name="Date")
+        rng = np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+        close = 100.0 * np.cumprod(1 + rng.normal(0.0005, 0.02, len(dates)))
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99,
+                             "Close": close, "Adj Close": close,
+                             "Volume": np.full(len(dates), 1_000_000.0)}, index=dates)
+
+    def _wait(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def download(self, ticker, start, end):
+        self._wait()
+        return self._frame(ticker, start, end)
+
+    def download_many(self, tickers, start, end):
+        # One round trip for the batch, as with a multi-symbol yf.download.
+        self._wait()
+        return {t: self._frame(t, start, end) for t in tickers}
+
+
+def synthetic_news(n_articles):
+    """Per-query synthetic NewsAPI articles ending now, for StubNewsApiServer."""
+    cache = {}
+    lock = threading.Lock()
+    end = pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d %H:%M:%S")
+
+    def articles(query):
+        with lock:
+            if query not in cache:
+                cache[query] = syn.synthetic_articles(
+                    n_articles, seed=zlib.crc32(query.encode("utf-8")), end=end)
+            return list(cache[query])
+    return articles
+
+
+def current_rss():
+    """Resident set size in bytes (peak so far where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Monitor:
+    """Samples RSS and probes SQLite write locks on a background thread."""
+
+    def __init__(self, paths, interval=0.05, wait_timeout=5.0):
+        self.paths = paths
+        self.interval = interval
+        self.wait_timeout = wait_timeout
+        self._stop = threading.Event()
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        self.peak_rss = current_rss()
+        self.probes = {p: {"samples": 0, "busy": 0, "waits": []} for p in self.paths}
+
+    def _probe(self, path):
+        stats = self.probes[path]
+        if not os.path.exists(path):
+            return
+        conn = sqlite3.connect(path, timeout=0, isolation_level=None)
+        try:
+            stats["samples"] += 1
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("ROLLBACK")
+                return
+            except sqlite3.OperationalError:
+                stats["busy"] += 1
+            conn.execute(f"PRAGMA busy_timeout = {int(self.wait_timeout * 1000)}")
+            started = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("ROLLBACK")
+            except sqlite3.OperationalError:
+                pass
+            stats["waits"].append(time.perf_counter() - started)
+        finally:
+            conn.close()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+            for path in self.paths:
+                self._probe(path)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="loadtest-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def contention(self):
+        return {
+            os.path.basename(path): {
+                "samples": s["samples"],
+                "busy_pct": 100.0 * s["busy"] / s["samples"] if s["samples"] else 0.0,
+                "wait_p99_ms": float(np.percentile(s["waits"], 99)) * 1000 if s["waits"] else 0.0,
+                "wait_max_ms": max(s["waits"]) * 1000 if s["waits"] else 0.0,
+            }
+            for path, s in self.probes.items()
+        }
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = {step: [] for step in STEPS}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def record(self, step, seconds):
+        with self._lock:
+            self.timings[step].append(seconds)
+
+    def error(self, step, exc):
+        with self._lock:
+            self.errors.append(f"{step}: {type(exc).__name__}: {exc}")
+
+    def summary(self):
+        return {
+            step: {
+                "count": len(t),
+                "p50_ms": float(np.percentile(t, 50)) * 1000 if t else None,
+                "p99_ms": float(np.percentile(t, 99)) * 1000 if t else None,
+                "max_ms": max(t) * 1000 if t else None,
+            }
+            for step, t in self.timings.items()
+        }
+
+
+def run_session(core, db, user, rng, args, recorder):
+    """One simulated user: log in, then alternate sentiment and HPR runs."""
+    universe = args.universe
+    horizons = [int(h) for h in args.horizons.split(",")]
+    days_options = [int(d) for d in args.days.split(",")]
+
+    def timed(step, work):
+        started = time.perf_counter()
+        try:
+            work()
+        except Exception as e:
+            recorder.error(step, e)
+            return False
+        recorder.record(step, time.perf_counter() - started)
+        return True
+
+    def login():
+        if not db.verify_user(user, "loadtest"):
+            raise RuntimeError(f"login failed for {user}")
+
+    session_started = time.perf_counter()
+    if not timed("login", login):
+        return
+    for _ in range(args.iterations):
+        ticker = universe[rng.integers(len(universe))]
+        days = days_options[rng.integers(len(days_options))]
+
+        def sentiment():
+            db.track_api_usage(user)
+            core.cached_sentiment(ticker, days)
+            core.sentiment_dashboard(ticker, days)
+
+        peers = [str(t) for t in rng.permutation(universe)[:args.peers + 1] if t != ticker]
+        tickers = [ticker] + peers[:args.peers]
+
+        def hpr():
+            # The last three calendar years, as the HPR tab selects by default.
+            years = core.hpr_year_options(ticker)[-3:]
+            dates = core.earnings_dates(tickers, years[0], years[-1])
+            table = core.cached_peer_event_hprs(
+                tickers, dates, horizons, *core.hpr_price_window(years[0], years[-1],
+                                                                 max(horizons)),
+                event_col="earnings_date", benchmark=core.DEFAULT_BENCHMARK,
+            )
+            core.hpr_summary(table)
+
+        timed("sentiment", sentiment)
+        if args.think:
+            time.sleep(args.think)
+        timed("hpr", hpr)
+        if args.think:
+            time.sleep(args.think)
+    recorder.record("session", time.perf_counter() - session_started)
+
+
+def run_level(core, db, users, args, monitor, stubs):
+    recorder = Recorder()
+    if args.cold:
+        core.sentiment_results.clear()
+        core.hpr_results.clear()
+    news_before, prices_before = len(stubs["news"].requests), stubs["prices"].calls
+    monitor.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(users), thread_name_prefix="session") as pool:
+        futures = [pool.submit(run_session, core, db, user,
+                               np.random.default_rng([args.seed, len(users), i]), args, recorder)
+                   for i, user in enumerate(users)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                recorder.error("session", e)
+    wall = time.perf_counter() - started
+    steps = recorder.summary()
+    actions = steps["sentiment"]["count"] + steps["hpr"]["count"]
+    return {
+        "sessions": len(users),
+        "wall_seconds": wall,
+        "actions": actions,
+        "actions_per_second": actions / wall if wall else 0.0,
+        "steps": steps,
+        "errors": recorder.errors,
+        "peak_rss_mb": monitor.peak_rss / 2 ** 20,
+        "sqlite": monitor.contention(),
+        "news_requests": len(stubs["news"].requests) - news_before,
+        "price_downloads": stubs["prices"].calls - prices_before,
+    }
+
+
+def seed_caches(core, universe, cache_dir):
+    """Security master and earnings calendar snapshots, so no session goes to the network."""
+    from security_master import SNAPSHOT_COLUMNS
+    labels = core.get_popular_sp500_tickers()
+    pd.DataFrame(
+        [(t, labels.get(t, f"{t} - {t}").split(" - ", 1)[-1], "", "") for t in universe],
+        columns=SNAPSHOT_COLUMNS,
+    ).to_csv(os.path.join(cache_dir, "security_master.csv"), index=False)
+    n_days = syn.PRODUCTION_SIZES["price_days"]
+    calendar = core.get_earnings_calendar()
+    calendar.fetch_dates = None
+    path = os.path.join(cache_dir, "loadtest_calendar.csv")
+    pd.DataFrame(
+        [(t, d) for i, t in enumerate(universe)
+         for d in syn.synthetic_event_dates(syn.PRODUCTION_SIZES["events"], n_days, seed=i)],
+        columns=["ticker", "event_date"],
+    ).to_csv(path, index=False)
+    calendar.load_csv(path)
+
+
+def format_level(level):
+    s = level["steps"]
+
+    def ms(step, key):
+        value = s[step][key]
+        return f"{value:8.0f}" if value is not None else "       -"
+
+    lines = [
+        f"{level['sessions']:>3} sessions  {level['actions_per_second']:7.2f} actions/s  "
+        f"peak RSS {level['peak_rss_mb']:7.1f} MB  errors {len(level['errors'])}  "
+        f"(NewsAPI {level['news_requests']} req, prices {level['price_downloads']} downloads)"
+    ]
+    for step in STEPS:
+        lines.append(f"      {step:<10} p50 {ms(step, 'p50_ms')} ms  p99 {ms(step, 'p99_ms')} ms  "
+                     f"max {ms(step, 'max_ms')} ms  n={s[step]['count']}")
+    for name, c in level["sqlite"].items():
+        lines.append(f"      {name:<19} busy {c['busy_pct']:5.1f}% of {c['samples']} probes  "
+                     f"wait p99 {c['wait_p99_ms']:7.1f} ms  max {c['wait_max_ms']:7.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated app sessions")
+    parser.add_argument("--sessions", default="1,5,10,25",
+                        help="Comma-separated concurrency levels, run in order")
+    parser.add_argument("--iterations", type=int, default=3,
+                        help="Sentiment + HPR runs per session")
+    parser.add_argument("--tickers", type=int, default=20, help="Size of the ticker universe")
+    parser.add_argument("--peers", type=int, default=2, help="Peer tickers per HPR run")
+    parser.add_argument("--days", default="7,30", help="Sentiment windows sessions pick from")
+    parser.add_argument("--horizons", default="1,5,10,20")
+    parser.add_argument("--articles", type=int, default=300,
+                        help="Articles the NewsAPI stand-in holds per query")
+    parser.add_argument("--news-latency", type=float, default=0.2,
+                        help="Seconds per NewsAPI stand-in response")
+    parser.add_argument("--price-latency", type=float, default=0.3,
+                        help="Seconds per yf.download stand-in call")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="Seconds a session pauses between actions")
+    parser.add_argument("--cold", action="store_true",
+                        help="Clear in-memory result caches before each level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Scratch directory (default: a temporary one)")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float,
+                        help="Fail when any step's p99 latency exceeds this")
+    args = parser.parse_args(argv)
+    levels = [int(n) for n in args.sessions.split(",")]
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="loadtest-")
+    cache_dir = os.path.join(workdir, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    news = StubNewsApiServer(synthetic_news(args.articles), latency=args.news_latency)
+    prices = StubPriceSource(args.price_latency)
+
+    # The compute core reads its cache location at import time.
+    os.environ.update(SENTIMENT_CACHE_DIR=cache_dir, NEWSAPI_KEY="loadtest")
+    for var in ("NEWSAPI_FIXTURE_PATH", "PRICE_FIXTURE_DIR", "EARNINGS_CALENDAR_CSV",
+                "PREWARM_ENABLED"):
+        os.environ.pop(var, None)
+    os.environ.setdefault("NLTK_OFFLINE", "1")
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    import analysis_core as core
+
+    universe = list(core.get_popular_sp500_tickers())[:args.tickers]
+    if len(universe) < args.tickers:
+        universe += [f"LT{i:03d}" for i in range(args.tickers - len(universe))]
+    args.universe = universe
+    seed_caches(core, universe, cache_dir)
+    core.get_price_store().source = prices
+
+    db = UserDB(os.path.join(workdir, "users.db"))
+    users = [f"loadtest{i}" for i in range(max(levels))]
+    for user in users:
+        db.create_user(user, "loadtest")
+
+    monitor = Monitor([os.path.join(workdir, f) for f in SQLITE_FILES])
+    report = {"args": {k: v for k, v in vars(args).items() if k != "universe"}, "levels": []}
+    with news:
+        store = core.get_article_store("loadtest")
+        store.client = NewsApiHttpClient("loadtest", news.url)
+        # The stub has no plan to protect, so it is not charged to the NewsAPI quota.
+        store.bucket = None
+        monitor.start()
+        try:
+            for n in levels:
+                level = run_level(core, db, users[:n], args, monitor,
+                                  {"news": news, "prices": prices})
+                report["levels"].append(level)
+                print(format_level(level), flush=True)
+        finally:
+            monitor.stop()
+            db.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = False
+    for level in report["levels"]:
+        for message in level["errors"][:5]:
+            print(f"ERROR ({level['sessions']} sessions) {message}", file=sys.stderr)
+        failed |= bool(level["errors"])
+        if args.max_p99_ms is not None:
+            for step, stats in level["steps"].items():
+                if stats["p99_ms"] is not None and stats["p99_ms"] > args.max_p99_ms:
+                    print(f"REGRESSION ({level['sessions']} sessions) {step} p99 "
+                          f"{stats['p99_ms']:.0f} ms > {args.max_p99_ms:.0f} ms", file=sys.stderr)
+                    failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
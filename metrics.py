@@ -0,0 +1,223 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
+
+
+# ─────────────────────────────────────────────
+# Per-stage latency metrics
+# ─────────────────────────────────────────────
+#
+# Timing spans around each pipeline stage, per-ticker counters and
+# p50/p95/p99 over the most recent samples per stage, exported as Prometheus
+# text (HTTP endpoint and/or a periodically rewritten file). When disabled,
+# span() hands back one shared no-op context manager, so instrumented code
+# pays a method call and nothing else.
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NOOP = nullcontext()
+
+logger = logging.getLogger(__name__)
+
+
+def _quantile(sorted_samples, q):
+    # Nearest-rank quantile; samples are already sorted.
+    if not sorted_samples:
+        return float("nan")
+    idx = min(len(sorted_samples) - 1, max(0, int(round(q * len(sorted_samples))) - 1))
+    return sorted_samples[idx]
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class Metrics:
+    def __init__(self, enabled=False, window=2048, clock=time.perf_counter):
+        self.enabled = enabled
+        self.window = window
+        self.clock = clock
+        self._samples = {}
+        self._count = Counter()
+        self._sum = Counter()
+        self._errors = Counter()
+        self._by_ticker = Counter()
+        self._lock = threading.Lock()
+
+    def span(self, stage, ticker=None):
+        """Context manager timing one execution of ``stage``."""
+        if not self.enabled:
+            return _NOOP
+        return self._span(stage, ticker)
+
+    @contextmanager
+    def _span(self, stage, ticker):
+        started = self.clock()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.observe(stage, self.clock() - started, ticker=ticker, failed=failed)
+
+    def observe(self, stage, seconds, ticker=None, failed=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._count[stage] += 1
+            self._sum[stage] += seconds
+            if failed:
+                self._errors[stage] += 1
+            if ticker:
+                self._by_ticker[(stage, ticker)] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._count.clear()
+            self._sum.clear()
+            self._errors.clear()
+            self._by_ticker.clear()
+
+    # ── views ────────────────────────────────
+
+    def _snapshot(self):
+        # Everything the views need, copied under one acquisition so stages,
+        # totals and ticker counts are mutually consistent.
+        with self._lock:
+            samples = {stage: list(s) for stage, s in self._samples.items()}
+            counts, sums, errors = dict(self._count), dict(self._sum), dict(self._errors)
+            by_ticker = dict(self._by_ticker)
+        return samples, counts, sums, errors, by_ticker
+
+    @staticmethod
+    def _summarize(samples, counts, sums, errors):
+        return {
+            stage: {
+                "count": counts[stage],
+                "errors": errors.get(stage, 0),
+                "mean": sums[stage] / counts[stage],
+                **{f"p{int(q * 100)}": _quantile(values, q) for q in QUANTILES},
+            }
+            for stage, values in sorted((stage, sorted(v)) for stage, v in samples.items())
+        }
+
+    def summary(self):
+        """stage -> count, errors, mean and p50/p95/p99 seconds over the recent window."""
+        samples, counts, sums, errors, _ = self._snapshot()
+        return self._summarize(samples, counts, sums, errors)
+
+    def ticker_counts(self):
+        """(stage, ticker) -> number of spans."""
+        with self._lock:
+            return dict(self._by_ticker)
+
+    def prometheus_text(self, prefix="sentiment_app"):
+        samples, counts, sums, errors, by_ticker = self._snapshot()
+        summary = self._summarize(samples, counts, sums, errors)
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latency of each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, s in summary.items():
+            label = f'stage="{_label(stage)}"'
+            for q in QUANTILES:
+                lines.append(f'{prefix}_stage_seconds{{{label},quantile="{q}"}} '
+                             f'{s[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"{prefix}_stage_seconds_sum{{{label}}} {sums[stage]:.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{{{label}}} {s['count']}")
+        lines += [
+            f"# HELP {prefix}_stage_errors_total Spans that raised.",
+            f"# TYPE {prefix}_stage_errors_total counter",
+        ]
+        for stage in summary:
+            lines.append(f'{prefix}_stage_errors_total{{stage="{_label(stage)}"}} '
+                         f'{errors.get(stage, 0)}')
+        lines += [
+            f"# HELP {prefix}_ticker_requests_total Stage executions per ticker.",
+            f"# TYPE {prefix}_ticker_requests_total counter",
+        ]
+        for (stage, ticker), n in sorted(by_ticker.items()):
+            lines.append(f'{prefix}_ticker_requests_total{{stage="{_label(stage)}",'
+                         f'ticker="{_label(ticker)}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    # ── exporters ────────────────────────────
+
+    def write_file(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def start_file_exporter(self, path, interval=15.0):
+        """Rewrite ``path`` every ``interval`` seconds on a daemon thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_file(path)
+                except Exception:
+                    # Keep exporting; one bad write must not end the thread.
+                    logger.exception("Writing metrics to %s failed", path)
+
+        thread = threading.Thread(target=run, name="metrics-file", daemon=True)
+        thread.start()
+        return thread
+
+    def start_http_exporter(self, port, host="127.0.0.1"):
+        """Serve the Prometheus text at ``/metrics`` on a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+def metrics_from_env():
+    """Metrics configured from METRICS_ENABLED / METRICS_FILE / METRICS_PORT.
+
+    Setting either exporter implies METRICS_ENABLED.
+    """
+    path = os.getenv("METRICS_FILE")
+    port = os.getenv("METRICS_PORT")
+    enabled = bool(path or port) or os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+    metrics = Metrics(enabled=enabled)
+    if path:
+        metrics.start_file_exporter(path, float(os.getenv("METRICS_FILE_INTERVAL", "15")))
+    if port:
+        try:
+            metrics.start_http_exporter(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+        except OSError:
+            # Another process (e.g. a second Streamlit worker) already serves the port.
+            pass
+    return metrics
@@ -0,0 +1,105 @@
+import re
+import zlib
+
+import numpy as np
+
+
+# ─────────────────────────────────────────────
+# Near-duplicate clustering with MinHash / LSH
+# ─────────────────────────────────────────────
+#
+# Syndicated wire stories reach NewsAPI many times with small edits (source
+# suffixes, trimmed sentences). Each text becomes a MinHash signature over
+# word shingles; signatures are split into bands and hashed into buckets, so
+# a new text is only compared with the few earlier texts it shares a band
+# with. Clustering is streaming: every text joins the cluster of the first
+# earlier text whose estimated Jaccard similarity reaches the threshold, or
+# starts its own. Each bucket keeps one entry per cluster, so large clusters
+# do not slow down later lookups and total work stays roughly linear.
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PRIME = (1 << 31) - 1
+
+
+def shingles(text, size=3):
+    """Hashes of the distinct ``size``-word shingles of ``text`` (lowercased, punctuation dropped)."""
+    tokens = _TOKEN.findall(text.lower()) if isinstance(text, str) else []
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    grams = {" ".join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64,
+                       count=len(grams))
+
+
+class MinHasher:
+    def __init__(self, num_perm=64, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # (a * x + b) mod p with x, a, b < 2**31 stays below 2**63.
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """uint32 MinHash signature, or None for text with no words."""
+        h = shingles(text, self.shingle_size) % np.uint64(_PRIME)
+        if not len(h):
+            return None
+        return ((h[:, None] * self._a + self._b) % np.uint64(_PRIME)).min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Streaming near-duplicate clustering; see ``assign``.
+
+    With ``bands`` x ``num_perm // bands`` rows, pairs at the similarity
+    ``threshold`` are almost always bucketed together; candidates are then
+    confirmed against the full signature.
+    """
+
+    def __init__(self, threshold=0.6, num_perm=64, bands=16, shingle_size=3, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self._buckets = [{} for _ in range(bands)]  # band bytes -> {cluster: entry}
+        self._signatures = []
+        self._clusters = []
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _match(self, signature, band_keys):
+        candidates = set()
+        for key, bucket in zip(band_keys, self._buckets):
+            candidates.update(bucket.get(key, {}).values())
+        # Earliest entry first, so clusters are stable whatever the set order.
+        for entry in sorted(candidates):
+            if np.mean(self._signatures[entry] == signature) >= self.threshold:
+                return self._clusters[entry]
+        return None
+
+    def assign(self, texts, keys):
+        """Cluster key per text: the key of the first text seen in its cluster.
+
+        ``keys`` identify the texts (e.g. URL hashes); a text that starts a
+        new cluster gets its own key back.
+        """
+        out = np.empty(len(texts), dtype=np.uint64)
+        for i, (text, key) in enumerate(zip(texts, keys)):
+            signature = self.hasher.signature(text)
+            if signature is None:
+                out[i] = key
+                continue
+            band_keys = [signature[b * self.rows:(b + 1) * self.rows].tobytes()
+                         for b in range(self.bands)]
+            cluster = self._match(signature, band_keys)
+            cluster = key if cluster is None else cluster
+            entry = len(self._signatures)
+            self._signatures.append(signature)
+            self._clusters.append(cluster)
+            for band_key, bucket in zip(band_keys, self._buckets):
+                bucket.setdefault(band_key, {}).setdefault(cluster, entry)
+            out[i] = cluster
+        return out
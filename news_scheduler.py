@@ -0,0 +1,234 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from file_lock import file_lock
+
+
+# ─────────────────────────────────────────────
+# NewsAPI quota and HTTP client
+# ─────────────────────────────────────────────
+#
+# Every NewsAPI request spends one token from a bucket sized to the plan
+# (analysis_core.get_news_quota), whether it comes from an interactive
+# analysis, the pre-warmer or a batch scan; the pre-warmer keeps a reserve
+# of tokens for interactive use. NewsApiHttpClient talks to any
+# NewsAPI-compatible endpoint over urllib, such as the local stub below.
+
+NEWSAPI_URL = "https://newsapi.org/v2/everything"
+
+
+def _write_json(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class NewsApiError(RuntimeError):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class QuotaExhausted(NewsApiError):
+    def __init__(self, retry_after):
+        super().__init__(f"NewsAPI request quota exhausted; next request in {retry_after:.0f}s",
+                         status=429)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket shared by every NewsAPI caller in the process.
+
+    With a ``path`` the token count is persisted, so restarts do not refill
+    it, and every load-refill-spend-save cycle holds a lock on ``path``.lock,
+    so other processes over the same cache directory draw from the same
+    quota without overspending it. ArticleStore calls
+    ``acquire_blocking`` before every request.
+    """
+
+    def __init__(self, capacity, refill_per_second, clock=None, path=None):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.path = path
+        # Persisted timestamps have to mean the same thing after a restart.
+        self.clock = clock or (time.time if path else time.monotonic)
+        self.tokens = float(capacity)
+        self._updated = self.clock()
+        self._sync_lock = threading.Lock()
+
+    @classmethod
+    def per_day(cls, requests_per_day, burst=None, path=None):
+        return cls(burst or requests_per_day, requests_per_day / 86400.0, path=path)
+
+    def _locked(self):
+        return file_lock(self.path + ".lock") if self.path else nullcontext()
+
+    def _load(self):
+        data = _read_json(self.path) if self.path else None
+        if data:
+            self.tokens = min(float(self.capacity), float(data.get("tokens", self.capacity)))
+            self._updated = float(data.get("updated", self._updated))
+
+    def _save(self):
+        if self.path:
+            _write_json(self.path, {"tokens": self.tokens, "updated": self._updated})
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity,
+                          self.tokens + max(0.0, now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def available(self):
+        with self._sync_lock, self._locked():
+            self._load()
+            self._refill()
+            return self.tokens
+
+    def wait_time(self, reserve=0):
+        """Seconds until a token above ``reserve`` is available."""
+        return max(0.0, 1 + reserve - self.available()) / self.refill_per_second
+
+    def try_acquire(self, reserve=0):
+        """Take one token if more than ``reserve`` would be left; never waits."""
+        with self._sync_lock, self._locked():
+            self._load()
+            self._refill()
+            if self.tokens >= 1 + reserve:
+                self.tokens -= 1
+                self._save()
+                return True
+            return False
+
+    def acquire_blocking(self, max_wait=0.0):
+        """Take one token, sleeping up to ``max_wait`` seconds for it; else QuotaExhausted."""
+        deadline = time.monotonic() + max_wait
+        while not self.try_acquire():
+            wait = self.wait_time()
+            if time.monotonic() + wait > deadline:
+                raise QuotaExhausted(wait)
+            time.sleep(wait)
+
+
+def http_get_json(url, timeout=30):
+    req = urllib.request.Request(url, headers={"User-Agent": "stock-sentiment-app"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        raise NewsApiError(f"NewsAPI returned HTTP {e.code}", status=e.code) from e
+    except urllib.error.URLError as e:
+        raise NewsApiError(f"NewsAPI unreachable: {e.reason}") from e
+
+
+class NewsApiHttpClient:
+    """Blocking ``get_everything`` over http_get_json, the shape ArticleStore expects.
+
+    Lets the store talk to any NewsAPI-compatible endpoint, such as
+    StubNewsApiServer.
+    """
+
+    def __init__(self, api_key, base_url=NEWSAPI_URL, timeout=30):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def get_everything(self, q=None, from_param=None, to=None, language=None,
+                       sort_by=None, page=None, page_size=None, **kwargs):
+        params = {"q": q, "from": from_param, "to": to, "language": language,
+                  "sortBy": sort_by, "page": page, "pageSize": page_size,
+                  "apiKey": self.api_key}
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        payload = http_get_json(f"{self.base_url}?{query}", self.timeout)
+        if payload.get("status") == "error":
+            raise NewsApiError(payload.get("message", "NewsAPI error"))
+        return payload
+
+
+# ─────────────────────────────────────────────
+# Local stub server for offline runs
+# ─────────────────────────────────────────────
+
+class StubNewsApiServer:
+    """Serves /v2/everything on localhost from a list of articles.
+
+    The first ``fail_first`` requests answer 503 and ``latency``
+    delays every response, so NewsApiHttpClient can be driven without NewsAPI.
+    ``articles`` may also be a callable returning the articles for a query.
+    Responses are newest first and honour ``page``/``pageSize``.
+    """
+
+    def __init__(self, articles, latency=0.0, fail_first=0, port=0):
+        self.articles = articles
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+                stub.requests.append(params)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if len(stub.requests) <= stub.fail_first:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                from_param = params.get("from", "")
+                articles = (stub.articles(params.get("q", "")) if callable(stub.articles)
+                            else stub.articles)
+                matches = [a for a in articles
+                           if a.get("publishedAt", "").rstrip("Z")[:19] >= from_param]
+                total = len(matches)
+                if "pageSize" in params:
+                    matches.sort(key=lambda a: a.get("publishedAt", ""), reverse=True)
+                    size = int(params["pageSize"])
+                    start = (int(params.get("page", 1)) - 1) * size
+                    matches = matches[start:start + size]
+                body = json.dumps({"status": "ok", "totalResults": total,
+                                   "articles": matches}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v2/everything"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
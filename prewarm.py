@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+# ─────────────────────────────────────────────
+# Background pre-warming of watchlist tickers
+# ─────────────────────────────────────────────
+#
+# During off-peak windows a worker thread walks the watchlist, least recently
+# refreshed first, pulling new articles (scored into the memo, daily index
+# and archive) and prices into the same on-disk caches the UI reads. NewsAPI
+# calls draw from the shared token bucket (news_scheduler.TokenBucket) that
+# interactive fetches use, and the pre-warmer only spends while more than
+# ``reserve`` tokens are left, so the rest stays for interactive use.
+# Per-ticker refresh times are persisted and merged with what is on disk
+# before every write, so ages survive restarts and are shared with a
+# standalone ``python prewarm.py`` process.
+#
+# The refresh work itself is injected (see analysis_core.get_prewarmer), so
+# this module has no dependency on the compute core.
+
+
+def parse_windows(spec):
+    """[(start_minute, end_minute)] from "22:00-06:00,12:30-13:30"; empty or "always" -> []."""
+    spec = (spec or "").strip()
+    if not spec or spec.lower() == "always":
+        return []
+    windows = []
+    for part in spec.split(","):
+        start, end = part.strip().split("-")
+        windows.append(tuple(int(h) * 60 + int(m)
+                             for h, m in (t.strip().split(":") for t in (start, end))))
+    return windows
+
+
+def in_windows(windows, now):
+    if not windows:
+        return True
+    minute = now.hour * 60 + now.minute
+    for start, end in windows:
+        # Windows whose end is before their start wrap past midnight.
+        if (start <= minute < end) if start < end else (minute >= start or minute < end):
+            return True
+    return False
+
+
+def _write_json(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Prewarmer:
+    """Refreshes a watchlist in the background; see the module comment.
+
+    ``refresh_articles(ticker, max_requests)`` returns the NewsAPI requests it
+    spent, charging them to ``quota`` itself (ArticleStore does);
+    ``refresh_prices(tickers)`` refreshes prices for a batch.
+    """
+
+    def __init__(self, watchlist, refresh_articles, refresh_prices, state_path, quota,
+                 reserve=0, windows=(), interval=6 * 3600, poll_seconds=60, clock=time.time,
+                 now=datetime.now):
+        self.watchlist = list(dict.fromkeys(watchlist))
+        self.refresh_articles = refresh_articles
+        self.refresh_prices = refresh_prices
+        self.state_path = state_path
+        self.quota = quota
+        self.reserve = reserve
+        self.windows = list(windows)
+        self.interval = interval
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+        self.now = now
+        self._state = _read_json(state_path) or {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ── state ────────────────────────────────
+
+    def _load_state(self):
+        # Another process may have refreshed tickers since this one last looked.
+        on_disk = _read_json(self.state_path)
+        with self._lock:
+            if on_disk is not None:
+                self._state = on_disk
+            return {t: dict(s) for t, s in self._state.items()}
+
+    def _record(self, ticker, **fields):
+        with self._lock:
+            # Merge into the file's current state rather than overwriting it
+            # with this process's view.
+            state = _read_json(self.state_path) or self._state
+            state.setdefault(ticker, {}).update(fields)
+            _write_json(self.state_path, state)
+            self._state = state
+
+    def budget(self):
+        """NewsAPI requests the pre-warmer may spend now without dipping into the reserve."""
+        return max(0, int(self.quota.available() - self.reserve))
+
+    def ages(self):
+        """ticker -> seconds since its articles / prices were last refreshed (None if never)."""
+        now = self.clock()
+        state = self._load_state()
+        return {
+            ticker: {
+                kind: (now - state[ticker][kind]) if state.get(ticker, {}).get(kind) else None
+                for kind in ("articles", "prices")
+            }
+            for ticker in self.watchlist
+        }
+
+    def status(self):
+        """Per-ticker ages plus the last error, and the shared NewsAPI quota."""
+        ages = self.ages()
+        with self._lock:
+            errors = {t: s.get("error") for t, s in self._state.items()}
+        return {
+            "tickers": {t: {**a, "error": errors.get(t)} for t, a in ages.items()},
+            "requests_available": int(self.quota.available()),
+            "requests_reserved": self.reserve,
+            "in_window": in_windows(self.windows, self.now()),
+            "running": self.running,
+        }
+
+    def due(self, kind):
+        """Watchlist tickers whose ``kind`` refresh is older than ``interval``, oldest first."""
+        ages = self.ages()
+        stale = [t for t in self.watchlist
+                 if ages[t][kind] is None or ages[t][kind] >= self.interval]
+        return sorted(stale, key=lambda t: -(ages[t][kind] or float("inf")))
+
+    # ── work ─────────────────────────────────
+
+    def run_once(self, force=False):
+        """One pass over due tickers; returns {"prices": n, "articles": n, "requests": n}."""
+        done = {"prices": 0, "articles": 0, "requests": 0}
+        if not force and not in_windows(self.windows, self.now()):
+            return done
+
+        tickers = self.watchlist if force else self.due("prices")
+        if tickers:
+            try:
+                self.refresh_prices(tickers)
+            except Exception as e:
+                for ticker in tickers:
+                    self._record(ticker, error=f"prices: {e}")
+            else:
+                stamp = self.clock()
+                for ticker in tickers:
+                    self._record(ticker, prices=stamp)
+                done["prices"] = len(tickers)
+
+        for ticker in (self.watchlist if force else self.due("articles")):
+            if self._stop.is_set() or (not force and not in_windows(self.windows, self.now())):
+                break
+            budget = self.budget()
+            if budget < 1:
+                break
+            try:
+                spent = self.refresh_articles(ticker, budget)
+            except Exception as e:
+                self._record(ticker, error=f"articles: {e}")
+                continue
+            done["requests"] += spent
+            done["articles"] += 1
+            self._record(ticker, articles=self.clock(), error=None)
+        return done
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.poll_seconds)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prewarm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None):
+    import analysis_core as core
+
+    parser = argparse.ArgumentParser(description="Pre-warm caches for the watchlist tickers")
+    parser.add_argument("--once", action="store_true",
+                        help="Refresh the whole watchlist once now, ignoring the off-peak windows")
+    parser.add_argument("--status", action="store_true", help="Print refresh ages and exit")
+    args = parser.parse_args(argv)
+
+    prewarmer = core.get_prewarmer()
+    if args.status:
+        print(json.dumps(prewarmer.status(), indent=2, default=str))
+        return 0
+    if args.once:
+        print(prewarmer.run_once(force=True))
+        return 0
+    prewarmer.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        prewarmer.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
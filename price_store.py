@@ -0,0 +1,259 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────
+# On-disk incremental daily price store
+# ─────────────────────────────────────────────
+#
+# Each ticker is kept as two memory-mapped .npy files (int64 dates and a
+# float64 OHLCV matrix) plus a small JSON file recording the date range that
+# has been fetched from the source. Only the uncovered part of a request
+# is downloaded; everything else is read straight from disk. Coverage only
+# grows by ranges whose download returned rows, and stops before today.
+# Every downloaded range is also noted as checked, and for
+# ``recheck_seconds`` gaps inside it (weekends, holidays, today's bar,
+# pre-listing spans or a source outage) are served from disk rather than
+# downloaded again on every request.
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+def _normalize_frame(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name="Date"),
+                            dtype=float)
+    x = df.copy()
+    if isinstance(x.columns, pd.MultiIndex):
+        x.columns = x.columns.get_level_values(0)
+    x = x.reindex(columns=PRICE_COLUMNS).astype(float)
+    idx = pd.to_datetime(x.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    x.index = pd.DatetimeIndex(idx.normalize().as_unit("ns"), name="Date")
+    return x[~x.index.duplicated(keep="last")].sort_index()
+
+
+class YFinancePriceSource:
+    def download(self, ticker, start, end):
+        import yfinance as yf
+        return yf.download(ticker, start=start, end=end,
+                           interval="1d", auto_adjust=False, progress=False)
+
+    def download_many(self, tickers, start, end):
+        """{ticker: frame} from one multi-symbol yf.download call."""
+        import yfinance as yf
+        raw = yf.download(list(tickers), start=start, end=end, interval="1d",
+                          auto_adjust=False, progress=False, group_by="ticker")
+        if raw is None or raw.empty or not isinstance(raw.columns, pd.MultiIndex):
+            return {}
+        present = set(raw.columns.get_level_values(0))
+        return {t: raw[t].dropna(how="all") for t in tickers if t in present}
+
+
+class CsvPriceSource:
+    """Offline price source reading ``<directory>/<TICKER>.csv`` fixtures with a Date column."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.calls = []
+
+    def download(self, ticker, start, end):
+        self.calls.append((ticker, start, end))
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        df = pd.read_csv(path, parse_dates=["Date"], index_col="Date")
+        return df.loc[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+    def download_many(self, tickers, start, end):
+        return {t: self.download(t, start, end) for t in tickers}
+
+
+class PriceStore:
+    def __init__(self, directory, source=None, recheck_seconds=900, clock=time.time):
+        self.directory = directory
+        self.source = source or YFinancePriceSource()
+        self.recheck_seconds = recheck_seconds
+        self.clock = clock
+        os.makedirs(directory, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _paths(self, ticker):
+        stem = os.path.join(self.directory, re.sub(r"[^A-Za-z0-9._-]", "_", ticker))
+        return stem + ".dates.npy", stem + ".values.npy", stem + ".meta.json"
+
+    def _read_meta(self, ticker):
+        try:
+            with open(self._paths(ticker)[2], "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read(self, ticker, attempts=3):
+        dates_path, values_path, _ = self._paths(ticker)
+        for _ in range(attempts):
+            if not os.path.exists(dates_path):
+                return _normalize_frame(None)
+            dates = np.load(dates_path, mmap_mode="r")
+            values = np.load(values_path, mmap_mode="r")
+            # Another process may be between the two replaces; lengths only
+            # disagree for that instant, so read again.
+            if len(dates) == len(values):
+                break
+            time.sleep(0.05)
+        else:
+            raise OSError(f"Price store for {ticker} is inconsistent: "
+                          f"{len(dates)} dates, {len(values)} rows")
+        return pd.DataFrame(np.asarray(values), columns=PRICE_COLUMNS,
+                            index=pd.DatetimeIndex(np.asarray(dates).view("datetime64[ns]"),
+                                                   name="Date"))
+
+    def _temp_file(self, writer):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp
+
+    def _write(self, ticker, frame, meta):
+        # Every file is staged before any is replaced, and meta goes last, so a
+        # reader never sees coverage the arrays don't hold yet.
+        dates_path, values_path, meta_path = self._paths(ticker)
+        staged = []
+        try:
+            staged.append((self._temp_file(
+                lambda f: np.save(f, frame.index.values.view("int64"))), dates_path))
+            staged.append((self._temp_file(
+                lambda f: np.save(f, frame[PRICE_COLUMNS].to_numpy(dtype=float))), values_path))
+            staged.append((self._temp_file(
+                lambda f: f.write(json.dumps(meta).encode("utf-8"))), meta_path))
+        except BaseException:
+            for tmp, _ in staged:
+                os.unlink(tmp)
+            raise
+        for tmp, path in staged:
+            os.replace(tmp, path)
+
+    def _write_meta(self, ticker, meta):
+        tmp = self._temp_file(lambda f: f.write(json.dumps(meta).encode("utf-8")))
+        os.replace(tmp, self._paths(ticker)[2])
+
+    def _recently_checked(self, meta, start, end):
+        now = self.clock()
+        return any(s <= start and end <= e and now - checked < self.recheck_seconds
+                   for s, e, checked in meta.get("checked", []))
+
+    def missing_ranges(self, ticker, start, end):
+        """Half-open [start, end) date ranges to request from the source."""
+        meta = self._read_meta(ticker) or {}
+        if "start" not in meta:
+            ranges = [(start, end)]
+        else:
+            # Gaps extend to the covered range so coverage always stays contiguous.
+            ranges = []
+            if start < meta["start"]:
+                ranges.append((start, meta["start"]))
+            if end > meta["end"]:
+                ranges.append((meta["end"], end))
+        return [r for r in ranges if not self._recently_checked(meta, *r)]
+
+    def _merge(self, ticker, frame, fetched):
+        """Merge ``[((start, end), download), ...]`` into the store.
+
+        Coverage only grows by the ranges that came back with rows: an empty
+        download may be a source outage rather than a quiet period, so those
+        ranges stay missing. Every range is noted as checked, so it is asked
+        for again only after ``recheck_seconds``.
+        """
+        meta = self._read_meta(ticker) or {}
+        now = self.clock()
+        checked = [c for c in meta.get("checked", []) if now - c[2] < self.recheck_seconds]
+        parts = [frame]
+        # Today's bar may still change, so coverage stops before it.
+        today = date.today().strftime("%Y-%m-%d")
+        for (start, end), download in fetched:
+            checked.append([start, end, now])
+            download = _normalize_frame(download)
+            if download.empty:
+                continue
+            parts.append(download)
+            end = max(start, min(end, today))
+            if "start" in meta:
+                start, end = min(meta["start"], start), max(meta["end"], end)
+            meta.update(start=start, end=end)
+        meta["checked"] = checked
+        if len(parts) == 1:
+            self._write_meta(ticker, meta)
+            return frame
+
+        frame = pd.concat(parts)
+        frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+        self._write(ticker, frame, meta)
+        return frame
+
+    @staticmethod
+    def _window(frame, start, end):
+        window = frame.loc[(frame.index >= pd.Timestamp(start)) & (frame.index < pd.Timestamp(end))]
+        return window.dropna(how="all")
+
+    def get(self, ticker, start, end):
+        """Daily prices for [start, end) in yf.download's shape, downloading only gaps."""
+        start = pd.Timestamp(start).strftime("%Y-%m-%d")
+        end = pd.Timestamp(end).strftime("%Y-%m-%d")
+        with self._lock(ticker):
+            gaps = self.missing_ranges(ticker, start, end)
+            frame = self._read(ticker)
+            if gaps:
+                frame = self._merge(ticker, frame,
+                                    [((s, e), self.source.download(ticker, s, e)) for s, e in gaps])
+        return self._window(frame, start, end)
+
+    def get_many(self, tickers, start, end):
+        """{ticker: prices} for [start, end), fetching all gaps in batched downloads.
+
+        Tickers missing the same date range are fetched together with one
+        ``download_many`` call per distinct range.
+        """
+        start = pd.Timestamp(start).strftime("%Y-%m-%d")
+        end = pd.Timestamp(end).strftime("%Y-%m-%d")
+        tickers = list(dict.fromkeys(tickers))
+
+        by_range = defaultdict(list)
+        for ticker in tickers:
+            for gap in self.missing_ranges(ticker, start, end):
+                by_range[gap].append(ticker)
+        downloads = defaultdict(list)
+        for (s, e), batch in by_range.items():
+            if hasattr(self.source, "download_many"):
+                frames = self.source.download_many(batch, s, e)
+            else:
+                frames = {t: self.source.download(t, s, e) for t in batch}
+            for ticker in batch:
+                downloads[ticker].append(((s, e), frames.get(ticker)))
+
+        result = {}
+        for ticker in tickers:
+            with self._lock(ticker):
+                frame = self._read(ticker)
+                if ticker in downloads:
+                    frame = self._merge(ticker, frame, downloads[ticker])
+            result[ticker] = self._window(frame, start, end)
+        return result
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ─────────────────────────────────────────────
+# Process-wide result cache with single-flight
+# ─────────────────────────────────────────────
+#
+# Shared by every Streamlit session in the process. Entries expire after
+# ``ttl`` seconds and the least recently used ones are evicted beyond
+# ``maxsize``. Concurrent misses for the same key wait on the first caller's
+# computation instead of repeating it.
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.finished = False
+
+
+class ResultCache:
+    def __init__(self, maxsize=128, ttl=900, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if self.clock() >= expires:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key)
+        return value if found else default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_compute(self, key, compute):
+        """Cached value for ``key``, computing it at most once across concurrent callers.
+
+        Waiting callers share the leader's value or ``Exception``. A leader
+        stopped by anything else (KeyboardInterrupt, Streamlit's rerun and
+        stop signals raised from a progress callback) only stops itself, and
+        one of the waiting callers takes over the computation.
+        """
+        while True:
+            with self._lock:
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    return value
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    self.misses += 1
+                    flight = self._inflight[key] = _Flight()
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                break
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.finished:
+                return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            flight.finished = True
+            self.put(key, flight.value)
+            return flight.value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "size": len(self._data)}
@@ -0,0 +1,270 @@
+import bisect
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+
+# ─────────────────────────────────────────────
+# Local security master
+# ─────────────────────────────────────────────
+#
+# symbol -> (name, sector, aliases), loaded from a CSV snapshot. Lookups are
+# dict hits and prefix search is a bisect over sorted keys. The snapshot is
+# refreshed from Wikipedia on a background thread, and names for unknown
+# symbols are resolved through yfinance the same way, so interactive
+# requests never wait on either remote source.
+#
+# The snapshot holds the fetched listing plus the symbols resolved one by one
+# (flagged in its "resolved" column); a refresh replaces the listing and
+# keeps the resolved symbols. Seed securities only fill in until a listing
+# has been loaded and are never saved.
+
+Security = namedtuple("Security", ["symbol", "name", "sector", "aliases"])
+
+SNAPSHOT_COLUMNS = ["symbol", "name", "sector", "aliases"]
+SP500_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+
+
+def fetch_sp500_snapshot():
+    import urllib.request
+    req = urllib.request.Request(SP500_URL)
+    req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+    with urllib.request.urlopen(req) as response:
+        table = pd.read_html(response.read())[0]
+    snapshot = pd.DataFrame({
+        "symbol": table["Symbol"].astype(str),
+        "name": table["Security"].astype(str),
+        "sector": table.get("GICS Sector", pd.Series("", index=table.index)).astype(str),
+    })
+    # yfinance spells share classes with a dash (BRK-B) where the index uses a dot.
+    dashed = snapshot["symbol"].str.replace(".", "-", regex=False)
+    snapshot["aliases"] = dashed.where(dashed != snapshot["symbol"], "")
+    return snapshot
+
+
+def fetch_yfinance_name(symbol):
+    import yfinance as yf
+    name = yf.Ticker(symbol).info.get('longName')
+    return Security(symbol, name, "", ()) if name else None
+
+
+def _split_aliases(value):
+    if not isinstance(value, str) or not value:
+        return ()
+    return tuple(a.strip().upper() for a in value.split("|") if a.strip())
+
+
+class SecurityMaster:
+    def __init__(self, snapshot_path, seed=None, fetch_snapshot=fetch_sp500_snapshot,
+                 resolve_symbol=fetch_yfinance_name, max_age_seconds=7 * 86400):
+        self.snapshot_path = snapshot_path
+        self.fetch_snapshot = fetch_snapshot
+        self.resolve_symbol = resolve_symbol
+        self.max_age_seconds = max_age_seconds
+        self.last_refresh_error = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Event()
+        self._resolving = set()
+        self._listed = set()
+        self._resolved = set()
+        self._resolver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="security-resolve")
+        self._set_index(seed or [])
+        self._load_snapshot()
+
+    # ── index ────────────────────────────────
+
+    def _set_index(self, securities):
+        by_symbol = {s.symbol.upper(): s for s in securities}
+        aliases = {}
+        prefix_keys = []
+        for sec in by_symbol.values():
+            for alias in sec.aliases:
+                aliases[alias] = sec.symbol.upper()
+            prefix_keys.append((sec.symbol.upper(), sec.symbol.upper()))
+            if sec.name:
+                prefix_keys.append((sec.name.upper(), sec.symbol.upper()))
+        prefix_keys.sort()
+        # One assignment swaps the whole index, so a reader that unpacks
+        # self._index once never mixes structures from two builds.
+        self._index = (by_symbol, aliases, prefix_keys, [k for k, _ in prefix_keys])
+
+    @property
+    def _by_symbol(self):
+        return self._index[0]
+
+    def _load_snapshot(self):
+        try:
+            frame = pd.read_csv(self.snapshot_path, dtype=str, keep_default_na=False)
+        except (OSError, ValueError):
+            return False
+        securities = self._from_frame(frame)
+        flags = (frame["resolved"] if "resolved" in frame
+                 else pd.Series("", index=frame.index)).to_numpy()
+        self._resolved = {sec.symbol.upper() for sec, flag in zip(securities, flags) if flag}
+        self._listed = {sec.symbol.upper() for sec in securities} - self._resolved
+        if not self._listed:
+            # Only resolved symbols on disk so far: the seed still fills in.
+            securities = list(self._by_symbol.values()) + securities
+        self._set_index(securities)
+        return True
+
+    @staticmethod
+    def _from_frame(frame):
+        frame = frame.reindex(columns=SNAPSHOT_COLUMNS).fillna("")
+        return [
+            Security(sym, name, sector, _split_aliases(aliases))
+            for sym, name, sector, aliases in frame.itertuples(index=False, name=None)
+        ]
+
+    def _save_snapshot(self):
+        rows = []
+        for s in self._by_symbol.values():
+            key = s.symbol.upper()
+            if key in self._listed or key in self._resolved:
+                rows.append((s.symbol, s.name, s.sector, "|".join(s.aliases),
+                             "1" if key in self._resolved else ""))
+        frame = pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS + ["resolved"])
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            frame.to_csv(f, index=False)
+        os.replace(tmp, self.snapshot_path)
+
+    # ── queries ──────────────────────────────
+
+    def __len__(self):
+        return len(self._by_symbol)
+
+    def __contains__(self, symbol):
+        return self.lookup(symbol) is not None
+
+    def lookup(self, symbol):
+        key = symbol.upper()
+        by_symbol, aliases, _, _ = self._index
+        sec = by_symbol.get(key)
+        if sec is None and key in aliases:
+            sec = by_symbol.get(aliases[key])
+        return sec
+
+    def name(self, symbol, default=None):
+        sec = self.lookup(symbol)
+        if sec is not None and sec.name:
+            return sec.name
+        self.resolve_in_background(symbol)
+        return default if default is not None else symbol
+
+    def search(self, prefix, limit=10):
+        """Securities whose symbol or name starts with ``prefix``, symbol matches first."""
+        prefix = prefix.strip().upper()
+        if not prefix:
+            return []
+        by_symbol, _, keys, words = self._index
+        start = bisect.bisect_left(words, prefix)
+        matches = {}
+        for word, symbol in keys[start:]:
+            if not word.startswith(prefix) or len(matches) >= 4 * limit:
+                break
+            matches.setdefault(symbol, by_symbol[symbol])
+        ranked = sorted(matches.values(), key=lambda s: not s.symbol.upper().startswith(prefix))
+        return ranked[:limit]
+
+    def ticker_options(self, listed_only=False):
+        """symbol -> "SYMBOL - Name", the shape the ticker pickers use.
+
+        ``listed_only`` keeps just the fetched listing (empty until one has
+        been loaded), without seed or individually resolved symbols.
+        """
+        listed = self._listed
+        return {s.symbol: f"{s.symbol} - {s.name}" for s in self._by_symbol.values()
+                if not listed_only or s.symbol.upper() in listed}
+
+    # ── background refresh ───────────────────
+
+    def snapshot_age(self):
+        """Seconds since the snapshot was written, or None when no listing has been loaded."""
+        if not self._listed:
+            return None
+        try:
+            return time.time() - os.path.getmtime(self.snapshot_path)
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Fetch a fresh snapshot now (blocking); keeps the current index on failure."""
+        try:
+            fresh = self._from_frame(self.fetch_snapshot())
+        except Exception as e:
+            self.last_refresh_error = str(e)
+            return False
+        with self._lock:
+            # The fresh listing replaces the old one and the seed; symbols
+            # resolved individually that it does not list are kept.
+            listed = {s.symbol.upper() for s in fresh}
+            self._resolved -= listed
+            kept = [s for s in self._by_symbol.values() if s.symbol.upper() in self._resolved]
+            self._listed = listed
+            self._set_index(kept + fresh)
+            self._save_snapshot()
+        self.last_refresh_error = None
+        return True
+
+    def refresh_in_background(self):
+        if self._refreshing.is_set():
+            return False
+        self._refreshing.set()
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing.clear()
+
+        threading.Thread(target=run, name="security-master-refresh", daemon=True).start()
+        return True
+
+    def refresh_if_stale(self):
+        age = self.snapshot_age()
+        if age is None or age > self.max_age_seconds:
+            return self.refresh_in_background()
+        return False
+
+    def resolve_in_background(self, symbol):
+        key = symbol.upper()
+        if not key or self.resolve_symbol is None:
+            return
+        with self._lock:
+            if key in self._resolving:
+                return
+            self._resolving.add(key)
+
+        def run():
+            try:
+                sec = self.resolve_symbol(key)
+                if sec is None:
+                    return
+                with self._lock:
+                    if key not in self._listed:
+                        self._resolved.add(key)
+                    self._set_index(list(self._by_symbol.values()) + [sec])
+                    self._save_snapshot()
+            except Exception:
+                return
+            finally:
+                with self._lock:
+                    self._resolving.discard(key)
+
+        self._resolver.submit(run)
+
+
+def securities_from_ticker_labels(labels):
+    """Seed securities from a {symbol: "SYMBOL - Name"} mapping."""
+    return [
+        Security(symbol, label.split(" - ", 1)[-1], "", ())
+        for symbol, label in labels.items()
+    ]
@@ -0,0 +1,312 @@
+import argparse
+import math
+import os
+import string
+import sys
+import time
+
+from sentiment_scoring import load_vader
+
+
+# ─────────────────────────────────────────────
+# Pluggable sentiment scoring backends
+# ─────────────────────────────────────────────
+#
+# A backend turns a batch of texts into VADER compound scores:
+#
+#   backend.name                    # stable id, used for memo files and pool workers
+#   backend.compound_scores(texts)  # list of floats
+#
+# "vader" calls NLTK's SentimentIntensityAnalyzer per text. "fast" compiles
+# the same lexicon and rule tables once into a single token -> flags lookup
+# and reimplements the compound score without SentiText's per-text
+# punctuation x word dictionary, repeated lower-casing or per-token string
+# formatting. It is meant to match the reference exactly; parity_report
+# measures how closely it does. SENTIMENT_BACKEND picks one per deployment.
+
+DEFAULT_BACKEND = "vader"
+
+_PUNCTUATION = string.punctuation
+# Token flags in the compiled lookup.
+_LEXICON, _BOOSTER, _NEGATION = 1, 2, 4
+
+
+class VaderBackend:
+    name = "vader"
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+
+    def compound_scores(self, texts):
+        return [self.analyzer.polarity_scores(t)["compound"] for t in texts]
+
+
+class FastLexiconBackend:
+    name = "fast"
+
+    def __init__(self, lexicon, constants):
+        c = constants
+        self.c_incr = c.C_INCR
+        self.n_scalar = c.N_SCALAR
+        self.b_decr = c.B_DECR
+        self.boosters = dict(c.BOOSTER_DICT)
+        self.idioms = dict(c.SPECIAL_CASE_IDIOMS)
+        self.punc_list = frozenset(c.PUNC_LIST)
+        self.strip_punctuation = c.REGEX_REMOVE_PUNCTUATION
+        self.valence = dict(lexicon)
+        # One lookup answers "in lexicon?", "booster?" and "negation?" per
+        # lower-cased token.
+        flags = {}
+        for word in self.valence:
+            flags[word] = flags.get(word, 0) | _LEXICON
+        for word in self.boosters:
+            flags[word] = flags.get(word, 0) | _BOOSTER
+        for word in c.NEGATE:
+            flags[word] = flags.get(word, 0) | _NEGATION
+        self.flags = flags
+
+    @classmethod
+    def from_analyzer(cls, analyzer):
+        return cls(analyzer.lexicon, analyzer.constants)
+
+    def _tokens(self, text):
+        # SentiText._words_and_emoticons: drop one-character tokens, then strip
+        # a leading or trailing PUNC_LIST run when the rest is a word that
+        # appears in the punctuation-free text.
+        words_only = {w for w in self.strip_punctuation.sub("", text).split() if len(w) > 1}
+        tokens = []
+        for we in text.split():
+            if len(we) <= 1:
+                continue
+            if we not in words_only:
+                rest = we.lstrip(_PUNCTUATION)
+                if rest != we and we[:len(we) - len(rest)] in self.punc_list and rest in words_only:
+                    we = rest
+                else:
+                    rest = we.rstrip(_PUNCTUATION)
+                    if (rest != we and we[len(rest):] in self.punc_list
+                            and rest in words_only):
+                        we = rest
+            tokens.append(we)
+        return tokens
+
+    def _negated(self, lowered):
+        return self.flags.get(lowered, 0) & _NEGATION or "n't" in lowered
+
+    def _scalar(self, word, lowered, valence, is_cap_diff):
+        scalar = self.boosters.get(lowered)
+        if scalar is None:
+            return 0.0
+        if valence < 0:
+            scalar *= -1
+        if is_cap_diff and word.isupper():
+            scalar += self.c_incr if valence > 0 else -self.c_incr
+        return scalar
+
+    def _idioms(self, valence, words, i):
+        idioms = self.idioms
+        onezero = f"{words[i - 1]} {words[i]}"
+        twoonezero = f"{words[i - 2]} {words[i - 1]} {words[i]}"
+        twoone = f"{words[i - 2]} {words[i - 1]}"
+        threetwoone = f"{words[i - 3]} {words[i - 2]} {words[i - 1]}"
+        threetwo = f"{words[i - 3]} {words[i - 2]}"
+        for seq in (onezero, twoonezero, twoone, threetwoone, threetwo):
+            if seq in idioms:
+                valence = idioms[seq]
+                break
+        if len(words) - 1 > i:
+            zeroone = f"{words[i]} {words[i + 1]}"
+            if zeroone in idioms:
+                valence = idioms[zeroone]
+        if len(words) - 1 > i + 1:
+            zeroonetwo = f"{words[i]} {words[i + 1]} {words[i + 2]}"
+            if zeroonetwo in idioms:
+                valence = idioms[zeroonetwo]
+        if threetwo in self.boosters or twoone in self.boosters:
+            valence = valence + self.b_decr
+        return valence
+
+    def _valence(self, words, lower, i, is_cap_diff):
+        flags = self.flags
+        lw = lower[i]
+        valence = self.valence[lw]
+        if is_cap_diff and words[i].isupper():
+            valence += self.c_incr if valence > 0 else -self.c_incr
+
+        for start_i in range(3):
+            if i <= start_i:
+                break
+            j = i - (start_i + 1)
+            if flags.get(lower[j], 0) & _LEXICON:
+                continue
+            s = self._scalar(words[j], lower[j], valence, is_cap_diff)
+            if start_i == 1 and s != 0:
+                s = s * 0.95
+            if start_i == 2 and s != 0:
+                s = s * 0.9
+            valence = valence + s
+            # SentimentIntensityAnalyzer._never_check
+            if start_i == 0:
+                if self._negated(lower[i - 1]):
+                    valence = valence * self.n_scalar
+            elif start_i == 1:
+                if words[i - 2] == "never" and words[i - 1] in ("so", "this"):
+                    valence = valence * 1.5
+                elif self._negated(lower[j]):
+                    valence = valence * self.n_scalar
+            else:
+                if (words[i - 3] == "never" and words[i - 2] in ("so", "this")
+                        or words[i - 1] in ("so", "this")):
+                    valence = valence * 1.25
+                elif self._negated(lower[j]):
+                    valence = valence * self.n_scalar
+                valence = self._idioms(valence, words, i)
+
+        # SentimentIntensityAnalyzer._least_check
+        if i > 0 and lower[i - 1] == "least" and not flags.get("least", 0) & _LEXICON:
+            if i == 1 or lower[i - 2] not in ("at", "very"):
+                valence = valence * self.n_scalar
+        return valence
+
+    def compound(self, text):
+        words = self._tokens(text)
+        if not words:
+            return 0.0
+        lower = [w.lower() for w in words]
+        allcaps = sum(1 for w in words if w.isupper())
+        is_cap_diff = 0 < len(words) - allcaps < len(words)
+        flags = self.flags
+
+        # Repeated tokens reuse their first occurrence's valence, as in
+        # SentimentIntensityAnalyzer.polarity_scores.
+        first = {}
+        sentiments = []
+        for idx, word in enumerate(words):
+            i = first.setdefault(word, idx)
+            if i != idx:
+                sentiments.append(sentiments[i])
+                continue
+            lw = lower[i]
+            f = flags.get(lw, 0)
+            if (f & _BOOSTER or (lw == "kind" and i < len(words) - 1 and lower[i + 1] == "of")
+                    or not f & _LEXICON):
+                sentiments.append(0)
+            else:
+                sentiments.append(self._valence(words, lower, i, is_cap_diff))
+
+        if "but" in lower:
+            bi = lower.index("but")
+            sentiments = [s * 0.5 if k < bi else s * 1.5 if k > bi else s
+                          for k, s in enumerate(sentiments)]
+
+        sum_s = float(sum(sentiments))
+        ep = min(text.count("!"), 4) * 0.292
+        qm = text.count("?")
+        amplifier = ep + ((qm * 0.18 if qm <= 3 else 0.96) if qm > 1 else 0)
+        if sum_s > 0:
+            sum_s += amplifier
+        elif sum_s < 0:
+            sum_s -= amplifier
+        return round(sum_s / math.sqrt(sum_s * sum_s + 15), 4)
+
+    def compound_scores(self, texts):
+        compound = self.compound
+        return [compound(t) for t in texts]
+
+
+BACKENDS = {
+    "vader": VaderBackend,
+    "fast": FastLexiconBackend.from_analyzer,
+}
+
+
+def load_backend(name=None, analyzer=None, allow_download=None):
+    """Backend ``name`` (default: SENTIMENT_BACKEND, else "vader") over the VADER lexicon."""
+    name = name or os.getenv("SENTIMENT_BACKEND") or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {name!r}; choose from {', '.join(BACKENDS)}")
+    analyzer = analyzer or load_vader(allow_download=allow_download)
+    return BACKENDS[name](analyzer)
+
+
+# ─────────────────────────────────────────────
+# Parity against the reference scores
+# ─────────────────────────────────────────────
+#
+#   python sentiment_backends.py                 # fast vs vader on the sample corpus
+#   python sentiment_backends.py --texts x.txt   # one text per line
+#
+# Exits non-zero when any score deviates by more than --tolerance.
+
+PARITY_SAMPLES = [
+    "Nvidia beats estimates as record data center revenue drives a great quarter!",
+    "Shares are NOT good today, and analysts say the outlook is bad.",
+    "The results were good, but guidance was awful and the stock fell.",
+    "Hardly a great quarter: revenue was barely good enough.",
+    "At least the dividend is safe; the least bad option was to hold.",
+    "Is this a good time to buy?? Investors wonder whether the rally can last???",
+    "GREAT results from a very good team, never so bad as feared.",
+    "It was kind of good, sort of bad, and the kiss of death for bears.",
+    "Stock rally rally rally!!!!! good good bad",
+    "Company didn't disappoint; guidance isn't bad and margins aren't awful.",
+    "",
+    "---",
+    "(good) 'bad' \"great\" good... bad!? -awful great-",
+]
+
+
+def parity_report(texts, reference, candidate):
+    """Deviation of ``candidate`` from ``reference`` compound scores over ``texts``."""
+    started = time.perf_counter()
+    expected = reference.compound_scores(texts)
+    reference_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = candidate.compound_scores(texts)
+    candidate_seconds = time.perf_counter() - started
+
+    deviations = [abs(a - e) for a, e in zip(actual, expected)]
+    worst = max(range(len(deviations)), key=deviations.__getitem__) if deviations else None
+    return {
+        "texts": len(texts),
+        "max_abs_deviation": deviations[worst] if deviations else 0.0,
+        "mean_abs_deviation": sum(deviations) / len(deviations) if deviations else 0.0,
+        "mismatches": sum(1 for d in deviations if d > 0),
+        "worst_text": texts[worst] if deviations else None,
+        "reference_seconds": reference_seconds,
+        "candidate_seconds": candidate_seconds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a sentiment backend against VADER")
+    parser.add_argument("--backend", default="fast", choices=sorted(BACKENDS))
+    parser.add_argument("--texts", help="File with one text per line (default: sample corpus)")
+    parser.add_argument("--synthetic", type=int, default=2000,
+                        help="Synthetic articles added to the sample corpus")
+    parser.add_argument("--tolerance", type=float, default=1e-4,
+                        help="Largest allowed absolute deviation in compound score")
+    args = parser.parse_args(argv)
+
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [line.rstrip("\n") for line in f]
+    else:
+        import synthetic_data as syn
+        texts = PARITY_SAMPLES + [a["description"] for a in syn.synthetic_articles(args.synthetic)]
+
+    analyzer = load_vader()
+    report = parity_report(texts, VaderBackend(analyzer), load_backend(args.backend, analyzer))
+    print(f"{report['texts']} texts: max |Δ| {report['max_abs_deviation']:.6f}, "
+          f"mean |Δ| {report['mean_abs_deviation']:.6f}, {report['mismatches']} mismatches")
+    speedup = (report["reference_seconds"] / report["candidate_seconds"]
+               if report["candidate_seconds"] else float("inf"))
+    print(f"vader {report['reference_seconds'] * 1000:.1f} ms, {args.backend} "
+          f"{report['candidate_seconds'] * 1000:.1f} ms ({speedup:.1f}x)")
+    if report["max_abs_deviation"] > args.tolerance:
+        print(f"Worst text: {report['worst_text']!r}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────
+# Persistent daily sentiment index
+# ─────────────────────────────────────────────
+#
+# Per (ticker, UTC day): article count, score sum and sum of squares,
+# positive/negative label counts and an EMA of the daily mean. Articles are
+# recorded by URL, so feeding the same page twice is a no-op and an update
+# costs O(new articles) plus re-running the EMA from the earliest touched day.
+# Summaries and trend lines are read straight from the daily rows.
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+DAILY_COLUMNS = ["day", "count", "sum", "sum_sq", "positive", "negative", "ema"]
+
+
+class SentimentIndex:
+    def __init__(self, path, positive_threshold=POSITIVE_THRESHOLD,
+                 negative_threshold=NEGATIVE_THRESHOLD, ema_span=10):
+        if negative_threshold > positive_threshold:
+            raise ValueError("negative_threshold must not exceed positive_threshold")
+        self.path = path
+        self.positive_threshold = positive_threshold
+        self.negative_threshold = negative_threshold
+        self.ema_alpha = 2.0 / (ema_span + 1)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript('''
+        CREATE TABLE IF NOT EXISTS scored_articles
+        (ticker TEXT, url TEXT, day TEXT, sentiment REAL,
+         PRIMARY KEY (ticker, url));
+        CREATE TABLE IF NOT EXISTS daily_sentiment
+        (ticker TEXT, day TEXT, count INTEGER, sum REAL, sum_sq REAL,
+         positive INTEGER, negative INTEGER, ema REAL,
+         PRIMARY KEY (ticker, day));
+        CREATE TABLE IF NOT EXISTS index_meta
+        (key TEXT PRIMARY KEY, value TEXT);
+        ''')
+        self._conn.commit()
+        with self._lock:
+            self._check_settings()
+
+    def _settings(self):
+        return repr((self.positive_threshold, self.negative_threshold, self.ema_alpha))
+
+    def _check_settings(self):
+        row = self._conn.execute(
+            "SELECT value FROM index_meta WHERE key = 'settings'"
+        ).fetchone()
+        if row is not None and row[0] == self._settings():
+            return
+        # Label counts and EMAs depend on the settings; rebuild them from the articles.
+        self._rebuild()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO index_meta VALUES ('settings', ?)", (self._settings(),)
+        )
+        self._conn.commit()
+
+    def label(self, score):
+        if score > self.positive_threshold:
+            return "positive"
+        if score < self.negative_threshold:
+            return "negative"
+        return "neutral"
+
+    # ── updates ──────────────────────────────
+
+    def add(self, ticker, scored_df):
+        """Record scored articles (``url``, ``publishedAt``, ``sentiment``); returns how many were new."""
+        if scored_df.empty:
+            return 0
+        frame = pd.DataFrame({
+            "url": scored_df["url"].astype(str).to_numpy(),
+            "day": pd.to_datetime(scored_df["publishedAt"], utc=True).dt.strftime("%Y-%m-%d").to_numpy(),
+            "sentiment": scored_df["sentiment"].astype(float).to_numpy(),
+        }).drop_duplicates("url")
+
+        with self._lock:
+            # The check for known URLs and the inserts form one write
+            # transaction: other connections (another thread's instance,
+            # prewarm.py, api_server.py) may be adding the same articles.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                new = self._unseen(ticker, frame)
+                if not new.empty:
+                    self._insert(ticker, new)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return len(new)
+
+    def _unseen(self, ticker, frame):
+        seen = set()
+        urls = frame["url"].tolist()
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            seen.update(r[0] for r in self._conn.execute(
+                f"SELECT url FROM scored_articles WHERE ticker = ? "
+                f"AND url IN ({','.join('?' * len(chunk))})",
+                [ticker, *chunk],
+            ))
+        return frame[~frame["url"].isin(seen)]
+
+    def _insert(self, ticker, new):
+        self._conn.executemany(
+            "INSERT INTO scored_articles VALUES (?, ?, ?, ?)",
+            [(ticker, u, d, s) for u, d, s in new.itertuples(index=False, name=None)],
+        )
+        self._conn.executemany('''
+            INSERT INTO daily_sentiment VALUES (?, ?, ?, ?, ?, ?, ?, NULL)
+            ON CONFLICT (ticker, day) DO UPDATE SET
+                count = count + excluded.count,
+                sum = sum + excluded.sum,
+                sum_sq = sum_sq + excluded.sum_sq,
+                positive = positive + excluded.positive,
+                negative = negative + excluded.negative
+            ''',
+            [(ticker, *row) for row in self._bucket(new).itertuples(index=False, name=None)],
+        )
+        self._update_ema(ticker, new["day"].min())
+
+    def _bucket(self, frame):
+        s = frame["sentiment"]
+        return (
+            frame.assign(
+                sum_sq=s * s,
+                positive=(s > self.positive_threshold).astype(int),
+                negative=(s < self.negative_threshold).astype(int),
+            )
+            .groupby("day", sort=True)
+            .agg(count=("sentiment", "size"), sum=("sentiment", "sum"),
+                 sum_sq=("sum_sq", "sum"), positive=("positive", "sum"),
+                 negative=("negative", "sum"))
+            .reset_index()
+            .astype({"count": int, "positive": int, "negative": int})
+        )
+
+    def _update_ema(self, ticker, from_day):
+        # EMA over days that have articles; only days from the earliest touched one change.
+        prev = self._conn.execute(
+            "SELECT ema FROM daily_sentiment WHERE ticker = ? AND day < ? "
+            "ORDER BY day DESC LIMIT 1",
+            (ticker, from_day),
+        ).fetchone()
+        ema = prev[0] if prev else None
+        rows = self._conn.execute(
+            "SELECT day, sum, count FROM daily_sentiment WHERE ticker = ? AND day >= ? ORDER BY day",
+            (ticker, from_day),
+        ).fetchall()
+        updates = []
+        for day, total, count in rows:
+            mean = total / count
+            ema = mean if ema is None else self.ema_alpha * mean + (1 - self.ema_alpha) * ema
+            updates.append((ema, ticker, day))
+        self._conn.executemany(
+            "UPDATE daily_sentiment SET ema = ? WHERE ticker = ? AND day = ?", updates
+        )
+
+    def _rebuild(self):
+        self._conn.execute("DELETE FROM daily_sentiment")
+        articles = pd.read_sql_query(
+            "SELECT ticker, day, sentiment FROM scored_articles", self._conn
+        )
+        for ticker, frame in articles.groupby("ticker", sort=False):
+            self._conn.executemany(
+                "INSERT INTO daily_sentiment VALUES (?, ?, ?, ?, ?, ?, ?, NULL)",
+                [(ticker, *row) for row in self._bucket(frame).itertuples(index=False, name=None)],
+            )
+            self._update_ema(ticker, "")
+
+    def rebuild(self):
+        """Recompute every daily row from the recorded article scores."""
+        with self._lock:
+            self._rebuild()
+            self._conn.commit()
+
+    # ── queries ──────────────────────────────
+
+    def daily(self, ticker, start_day=None, end_day=None):
+        """Daily rows for ``ticker`` with derived mean, std and neutral count."""
+        sql = f"SELECT {', '.join(DAILY_COLUMNS)} FROM daily_sentiment WHERE ticker = ?"
+        params = [ticker]
+        if start_day:
+            sql += " AND day >= ?"
+            params.append(start_day)
+        if end_day:
+            sql += " AND day <= ?"
+            params.append(end_day)
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY day", self._conn, params=params)
+        df["day"] = pd.to_datetime(df["day"])
+        df["neutral"] = df["count"] - df["positive"] - df["negative"]
+        df["mean"] = df["sum"] / df["count"]
+        var = (df["sum_sq"] - df["sum"] ** 2 / df["count"]) / (df["count"] - 1)
+        df["std"] = np.sqrt(var.clip(lower=0)).where(df["count"] > 1)
+        return df
+
+    def summary(self, ticker, start_day=None, end_day=None):
+        """Same shape as analysis_core.summarize_sentiment, plus the score std."""
+        d = self.daily(ticker, start_day, end_day)
+        n = int(d["count"].sum())
+        total, total_sq = float(d["sum"].sum()), float(d["sum_sq"].sum())
+        positive, negative = int(d["positive"].sum()), int(d["negative"].sum())
+        return {
+            "articles": n,
+            "avg_sentiment": total / n if n else float("nan"),
+            "std_sentiment": float(np.sqrt(max(total_sq - total * total / n, 0) / (n - 1)))
+                             if n > 1 else float("nan"),
+            "positive": positive,
+            "neutral": n - positive - negative,
+            "negative": negative,
+        }
+
+    def trend(self, ticker, start_day=None, end_day=None):
+        """Least-squares line over every article, with each article placed at midday.
+
+        Returns ``(slope_per_second, intercept, origin)`` in the form
+        charts.plot_sentiment_timeline accepts, or None when the window has
+        no articles.
+        """
+        d = self.daily(ticker, start_day, end_day)
+        if d.empty:
+            return None
+        midday = (d["day"] + pd.Timedelta(hours=12)).dt.tz_localize("UTC")
+        origin = midday.iloc[0]
+        x = (midday - origin).dt.total_seconds().to_numpy()
+        c, s = d["count"].to_numpy(dtype=float), d["sum"].to_numpy()
+        n, sx, sy = c.sum(), (c * x).sum(), s.sum()
+        sxx, sxy = (c * x * x).sum(), (x * s).sum()
+        denom = n * sxx - sx * sx
+        if denom == 0:
+            return 0.0, sy / n, origin
+        slope = (n * sxy - sx * sy) / denom
+        return slope, (sy - slope * sx) / n, origin
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,360 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+# ─────────────────────────────────────────────
+# Batch sentiment scoring with a content-hash memo
+# ─────────────────────────────────────────────
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    # VADER is case- and punctuation-sensitive, so only whitespace is folded.
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SentimentMemo:
+    """Bounded LRU of compound scores keyed by text_key, optionally persisted as JSON."""
+
+    def __init__(self, maxsize=100_000, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, score):
+        with self._lock:
+            self._data[key] = score
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._dirty = True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    @classmethod
+    def load(cls, path, maxsize=100_000):
+        memo = cls(maxsize=maxsize, path=path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return memo
+        # Stored oldest-first, so replaying keeps the LRU order.
+        for key, score in items[-maxsize:]:
+            memo._data[key] = score
+        return memo
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path or not self._dirty:
+            return
+        with self._lock:
+            items = list(self._data.items())
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(items, f)
+        os.replace(tmp, path)
+
+
+# ─────────────────────────────────────────────
+# Offline VADER lexicon loading
+# ─────────────────────────────────────────────
+#
+# Lookup order: VADER_LEXICON_PATH (a vader_lexicon.txt/.zip file or an
+# nltk_data directory), an nltk_data directory next to the app, then NLTK's
+# own search path. Only if all of those miss, and NLTK_OFFLINE is not set, is
+# the lexicon downloaded.
+
+_BUNDLED_NLTK_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data")
+_LEXICON_RESOURCE = "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+
+
+def _read_lexicon_file(path):
+    if path.endswith(".zip"):
+        import zipfile
+        with zipfile.ZipFile(path) as zf:
+            return zf.read("vader_lexicon/vader_lexicon.txt").decode("utf-8")
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _analyzer_from_text(lexicon_text):
+    # Same state SentimentIntensityAnalyzer.__init__ builds, minus nltk.data.load.
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+    sia = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+    sia.lexicon_file = lexicon_text.strip("\n")
+    sia.lexicon = sia.make_lex_dict()
+    sia.constants = VaderConstants()
+    return sia
+
+
+def load_vader(lexicon_path=None, allow_download=None):
+    import nltk
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+    lexicon_path = lexicon_path or os.getenv("VADER_LEXICON_PATH")
+    if lexicon_path and os.path.isfile(lexicon_path):
+        return _analyzer_from_text(_read_lexicon_file(lexicon_path))
+
+    for root in (lexicon_path, _BUNDLED_NLTK_DATA):
+        if root and os.path.isdir(root) and root not in nltk.data.path:
+            nltk.data.path.insert(0, root)
+    try:
+        return SentimentIntensityAnalyzer(lexicon_file=_LEXICON_RESOURCE)
+    except LookupError:
+        if allow_download is None:
+            allow_download = not os.getenv("NLTK_OFFLINE")
+        if not allow_download:
+            raise
+    nltk.download('vader_lexicon', quiet=True)
+    return SentimentIntensityAnalyzer(lexicon_file=_LEXICON_RESOURCE)
+
+
+# Per-process backend for pool workers; the lexicon must already be on disk.
+_worker_backend = None
+
+
+def _init_worker(backend_name):
+    global _worker_backend
+    from sentiment_backends import load_backend
+    _worker_backend = load_backend(backend_name, allow_download=False)
+
+
+def _score_chunk(texts):
+    return _worker_backend.compound_scores(texts)
+
+
+class BatchSentimentScorer:
+    """Scores article text in batches, serving repeats from a SentimentMemo.
+
+    ``backend`` is a sentiment_backends backend. Unseen texts are scored
+    in-process for small batches and split across a process pool once there
+    are at least ``parallel_threshold`` of them.
+    """
+
+    def __init__(self, backend, memo=None, workers=None,
+                 parallel_threshold=2000, chunk_size=500):
+        self.backend = backend
+        self.memo = memo if memo is not None else SentimentMemo()
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.backend.name,))
+            return self._pool
+
+    def _score_uncached(self, texts):
+        if self.workers > 1 and len(texts) >= self.parallel_threshold:
+            chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+            scores = []
+            for part in self._get_pool().map(_score_chunk, chunks):
+                scores.extend(part)
+            return scores
+        return self.backend.compound_scores(texts)
+
+    def score(self, texts):
+        """Compound score per text; non-string entries score 0 like calculate_sentiment."""
+        scores = [0] * len(texts)
+        pending = {}
+        for i, text in enumerate(texts):
+            if not isinstance(text, str):
+                continue
+            key = text_key(text)
+            if key in pending:
+                pending[key][1].append(i)
+                continue
+            cached = self.memo.get(key)
+            if cached is not None:
+                scores[i] = cached
+            else:
+                pending[key] = (text, [i])
+
+        if pending:
+            keys = list(pending)
+            fresh = self._score_uncached([pending[k][0] for k in keys])
+            for key, score in zip(keys, fresh):
+                self.memo.put(key, score)
+                for i in pending[key][1]:
+                    scores[i] = score
+        return scores
+
+    def stats(self):
+        return self.memo.stats()
+
+    def close(self):
+        self.memo.save()
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+# ─────────────────────────────────────────────
+# Streaming aggregates
+# ─────────────────────────────────────────────
+
+class SentimentAccumulator:
+    """Running sentiment summary fed one scored page at a time.
+
+    Memory does not grow with the number of articles: the histogram uses
+    fixed bins, the timeline keeps a reservoir sample and the table keeps the
+    newest rows (pages arrive newest first). Persistent per-day aggregates
+    and the trend line live in sentiment_index.SentimentIndex.
+
+    Pages tagged by near-duplicate clustering (``cluster_key`` and
+    ``duplicate`` columns) also feed ``collapsed``, the same aggregates over
+    one article per cluster, ``clusters`` (how many there are) and
+    ``cluster_sizes``. Sizes are only kept for clusters with a row in either
+    table, which is every cluster a caller can display, so they stay bounded
+    too.
+    """
+
+    def __init__(self, bins=30, sample_size=2000, table_rows=500, seed=0,
+                 positive_threshold=0.05, negative_threshold=-0.05):
+        import numpy as np
+        self.positive_threshold = positive_threshold
+        self.negative_threshold = negative_threshold
+        self.edges = np.linspace(-1.0, 1.0, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.sample_size = sample_size
+        self.table_rows = table_rows
+        self.articles = 0
+        self.pages = 0
+        self.positive = 0
+        self.negative = 0
+        self._total = 0.0
+        self._sample_ts = []
+        self._sample_scores = []
+        self._recent = []
+        self._recent_rows = 0
+        self._rng = np.random.default_rng(seed)
+        self._settings = dict(bins=bins, sample_size=sample_size, table_rows=table_rows,
+                              seed=seed, positive_threshold=positive_threshold,
+                              negative_threshold=negative_threshold)
+        self.duplicates = 0
+        self.clusters = 0
+        self.cluster_sizes = Counter()
+        self._table_clusters = set()
+        self.collapsed = None
+
+    def add(self, page_df):
+        """Fold in a page with ``publishedAt`` (datetime) and ``sentiment`` columns."""
+        if "duplicate" in page_df and len(page_df):
+            duplicate = page_df["duplicate"].to_numpy(dtype=bool)
+            self.duplicates += int(duplicate.sum())
+            self.clusters += int((~duplicate).sum())
+            if self.collapsed is None:
+                self.collapsed = SentimentAccumulator(**self._settings)
+            firsts = page_df[~duplicate]
+            # Track the clusters of rows about to enter either table. Tables
+            # fill from the first pages, so any earlier copy of such a
+            # cluster was in a table too and its count is complete.
+            for frame, acc in ((page_df, self), (firsts, self.collapsed)):
+                room = max(0, self.table_rows - acc._recent_rows)
+                self._table_clusters.update(frame["cluster_key"].head(room).tolist())
+            self.cluster_sizes.update(
+                k for k in page_df["cluster_key"].tolist() if k in self._table_clusters
+            )
+            self.collapsed._fold(firsts)
+        return self._fold(page_df)
+
+    def _fold(self, page_df):
+        import numpy as np
+        import pandas as pd
+
+        scores = page_df['sentiment'].to_numpy(dtype=float)
+        if not len(scores):
+            return self
+        published = pd.to_datetime(page_df['publishedAt'])
+        seen = self.articles
+        self.pages += 1
+        self.articles += len(scores)
+        self._total += float(scores.sum())
+        self.positive += int((scores > self.positive_threshold).sum())
+        self.negative += int((scores < self.negative_threshold).sum())
+        self.counts += np.histogram(np.clip(scores, -1.0, 1.0), bins=self.edges)[0]
+
+        # Reservoir sample (algorithm R) for the timeline scatter.
+        for i, (ts, score) in enumerate(zip(published, scores)):
+            if len(self._sample_ts) < self.sample_size:
+                self._sample_ts.append(ts)
+                self._sample_scores.append(score)
+                continue
+            j = self._rng.integers(0, seen + i + 1)
+            if j < self.sample_size:
+                self._sample_ts[j] = ts
+                self._sample_scores[j] = score
+
+        if self._recent_rows < self.table_rows:
+            keep = page_df.head(self.table_rows - self._recent_rows)
+            self._recent.append(keep)
+            self._recent_rows += len(keep)
+        return self
+
+    def summary(self):
+        """Same shape as analysis_core.summarize_sentiment."""
+        return {
+            "articles": self.articles,
+            "avg_sentiment": self._total / self.articles if self.articles else float("nan"),
+            "positive": self.positive,
+            "neutral": self.articles - self.positive - self.negative,
+            "negative": self.negative,
+        }
+
+    def timeline_sample(self):
+        """Sampled (publishedAt, sentiment) rows, oldest first."""
+        import pandas as pd
+        frame = pd.DataFrame({"publishedAt": self._sample_ts, "sentiment": self._sample_scores})
+        return frame.sort_values("publishedAt", kind="mergesort").reset_index(drop=True)
+
+    def recent(self):
+        """The newest ``table_rows`` scored articles, newest first."""
+        import pandas as pd
+        if not self._recent:
+            return pd.DataFrame(columns=['title', 'description', 'publishedAt', 'url',
+                                         'source', 'sentiment'])
+        return pd.concat(self._recent, ignore_index=True)
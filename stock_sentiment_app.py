@@ -1,306 +1,247 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.ticker import PercentFormatter
-import yfinance as yf
-from newsapi import NewsApiClient
-from datetime import datetime, timedelta
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-import nltk
-import numpy as np
+import atexit
 import os
-from dotenv import load_dotenv
-import hashlib
-import sqlite3
-import uuid
 
-# Load environment variables
-load_dotenv()
-
-# ─────────────────────────────────────────────
-# NLTK / Sentiment
-# ─────────────────────────────────────────────
-
-@st.cache_resource
-def download_nltk_data():
-    nltk.download('vader_lexicon', quiet=True)
-    return SentimentIntensityAnalyzer()
-
-sia = download_nltk_data()
-pd.set_option("display.max_colwidth", 1000)
+import analysis_core as core
+import charts
+from user_db import UserDB
 
+# Return measure -> (hpr table column, short label, chart axis label)
+RETURN_MEASURES = {
+    "Raw HPR": ("hpr", "HPR", "Holding Period Return (HPR)"),
+    "Abnormal HPR": ("abnormal_hpr", "Abnormal HPR", "Buy-and-Hold Abnormal Return"),
+    "CAR": ("car", "CAR", "Cumulative Abnormal Return (CAR)"),
+}
 
 # ─────────────────────────────────────────────
 # Database / Auth
 # ─────────────────────────────────────────────
 
+@st.cache_resource
+def get_user_db():
+    db = UserDB('users.db')
+    atexit.register(db.close)
+    return db
+
 def init_db():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS users
-    (id TEXT PRIMARY KEY, username TEXT UNIQUE, password_hash TEXT, api_usage INTEGER)
-    ''')
-    conn.commit()
-    conn.close()
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return get_user_db()
 
 def create_user(username, password):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    user_id = str(uuid.uuid4())
-    try:
-        c.execute("INSERT INTO users VALUES (?, ?, ?, ?)",
-                  (user_id, username, hash_password(password), 0))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
+    return get_user_db().create_user(username, password)
 
 def verify_user(username, password):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    conn.close()
-    return result and result[0] == hash_password(password)
+    return get_user_db().verify_user(username, password)
 
 def track_api_usage(username):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute("UPDATE users SET api_usage = api_usage + 1 WHERE username = ?", (username,))
-    conn.commit()
-    conn.close()
+    get_user_db().track_api_usage(username)
+
+@st.cache_resource
+def start_api_server():
+    # Serves the HTTP API from this process so it shares the UI's caches
+    import api_server
+    return api_server.start_in_background(get_user_db())
 
 
 # ─────────────────────────────────────────────
 # Sentiment helpers
 # ─────────────────────────────────────────────
 
-def get_articles(query, from_date):
-    try:
-        api_key = os.getenv("NEWSAPI_KEY")
-        if not api_key:
-            st.error("Server configuration error: API key not found")
-            return []
-        newsapi = NewsApiClient(api_key=api_key)
-        articles = newsapi.get_everything(
-            q=query,
-            from_param=from_date,
-            language='en',
-            sort_by='publishedAt'
-        )
-        return articles.get('articles', [])
-    except Exception as e:
-        st.error(f"Error fetching articles: {str(e)}")
-        return []
-
-def calculate_sentiment(articles_df):
-    sentiment_scores = []
-    for text in articles_df['description']:
-        if isinstance(text, str):
-            sentiment_scores.append(sia.polarity_scores(text)['compound'])
+def get_sp500_tickers():
+    return core.get_sp500_tickers()
+
+def show_ticker_suggestions(ticker):
+    master = core.get_security_master()
+    if not ticker or ticker in master:
+        return
+    matches = master.search(ticker, limit=5)
+    if matches:
+        st.sidebar.caption("Did you mean: " + ", ".join(f"{m.symbol} ({m.name})" for m in matches))
+
+
+def chart_png(ticker, key, build_figure):
+    with core.get_metrics().span("render_chart", ticker):
+        return charts.render_cache.get_or_render(key, build_figure)
+
+def sentiment_slots():
+    """Placeholders the sentiment tab fills in, and refills as pages arrive."""
+    return {name: st.empty() for name in ("status", "metrics", "distribution", "timeline", "table")}
+
+def render_sentiment(slots, ticker, company_name, acc, days, done, collapse=False):
+    dashboard = core.sentiment_dashboard(ticker, days)
+    # Collapsed views count one article per near-duplicate cluster, which the
+    # daily index does not track, so they are summarised from the accumulator.
+    view = acc.collapsed if collapse and acc.collapsed is not None else acc
+    summary = dashboard["summary"] if view is acc else view.summary()
+    with slots["status"].container():
+        if done:
+            st.success(f"Found {acc.articles} articles for {company_name} ({ticker})")
         else:
-            sentiment_scores.append(0)
-    articles_df['sentiment'] = sentiment_scores
-    return articles_df
+            st.info(f"Scored {acc.articles} articles for {company_name} ({ticker}) "
+                    f"so far (page {acc.pages})...")
+        if acc.duplicates:
+            st.caption(
+                f"{acc.duplicates} near-duplicate copies in {acc.clusters} story clusters"
+                + (" — collapsed to one article per cluster" if view is not acc else "")
+            )
+        memo_stats = core.get_sentiment_scorer().stats()
+        st.caption(
+            f"Sentiment cache: {memo_stats['hits']} hits / {memo_stats['misses']} misses "
+            f"({memo_stats['size']} texts cached)"
+        )
 
-@st.cache_data(ttl=86400)
-def get_sp500_tickers():
-    try:
-        import urllib.request
-        url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-        with urllib.request.urlopen(req) as response:
-            tables = pd.read_html(response.read())
-        sp500_table = tables[0]
-        tickers_dict = {}
-        for _, row in sp500_table.iterrows():
-            tickers_dict[row['Symbol']] = f"{row['Symbol']} - {row['Security']}"
-        return tickers_dict
-    except Exception:
-        return get_popular_sp500_tickers()
-
-def get_popular_sp500_tickers():
-    return {
-        'AAPL': 'AAPL - Apple Inc.',
-        'MSFT': 'MSFT - Microsoft Corporation',
-        'GOOGL': 'GOOGL - Alphabet Inc. Class A',
-        'AMZN': 'AMZN - Amazon.com Inc.',
-        'NVDA': 'NVDA - NVIDIA Corporation',
-        'META': 'META - Meta Platforms Inc.',
-        'TSLA': 'TSLA - Tesla Inc.',
-        'BRK.B': 'BRK.B - Berkshire Hathaway Inc. Class B',
-        'JPM': 'JPM - JPMorgan Chase & Co.',
-        'JNJ': 'JNJ - Johnson & Johnson',
-        'V': 'V - Visa Inc.',
-        'UNH': 'UNH - UnitedHealth Group Inc.',
-        'XOM': 'XOM - Exxon Mobil Corporation',
-        'PG': 'PG - Procter & Gamble Co.',
-        'MA': 'MA - Mastercard Inc.',
-        'HD': 'HD - Home Depot Inc.',
-        'CVX': 'CVX - Chevron Corporation',
-        'BAC': 'BAC - Bank of America Corp.',
-        'ABBV': 'ABBV - AbbVie Inc.',
-        'KO': 'KO - Coca-Cola Co.',
-        'PEP': 'PEP - PepsiCo Inc.',
-        'COST': 'COST - Costco Wholesale Corporation',
-        'AVGO': 'AVGO - Broadcom Inc.',
-        'MRK': 'MRK - Merck & Co. Inc.',
-        'TMO': 'TMO - Thermo Fisher Scientific Inc.',
-        'WMT': 'WMT - Walmart Inc.',
-        'CSCO': 'CSCO - Cisco Systems Inc.',
-        'DIS': 'DIS - Walt Disney Co.',
-        'ABT': 'ABT - Abbott Laboratories',
-        'ACN': 'ACN - Accenture plc',
-        'ADBE': 'ADBE - Adobe Inc.',
-        'AMD': 'AMD - Advanced Micro Devices Inc.',
-        'NFLX': 'NFLX - Netflix Inc.',
-        'NKE': 'NKE - NIKE Inc.',
-        'ORCL': 'ORCL - Oracle Corporation',
-        'CRM': 'CRM - Salesforce Inc.',
-        'INTC': 'INTC - Intel Corporation',
-        'QCOM': 'QCOM - QUALCOMM Inc.',
-        'TXN': 'TXN - Texas Instruments Inc.',
-        'UPS': 'UPS - United Parcel Service Inc.',
-        'BA': 'BA - Boeing Co.',
-        'CAT': 'CAT - Caterpillar Inc.',
-        'GE': 'GE - General Electric Co.',
-        'IBM': 'IBM - International Business Machines Corp.',
-        'MMM': 'MMM - 3M Co.',
-        'GS': 'GS - Goldman Sachs Group Inc.',
-        'SPGI': 'SPGI - S&P Global Inc.',
-        'BLK': 'BLK - BlackRock Inc.',
-        'AXP': 'AXP - American Express Co.',
-        'NOW': 'NOW - ServiceNow Inc.',
-    }
-
-def get_company_name(ticker):
-    try:
-        return yf.Ticker(ticker).info.get('longName', ticker)
-    except Exception:
-        return ticker
+    with slots["metrics"].container():
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Average Sentiment", f"{summary['avg_sentiment']:.3f}")
+        with col2:
+            st.metric("Positive Articles", summary["positive"])
+        with col3:
+            st.metric("Neutral Articles", summary["neutral"])
+        with col4:
+            st.metric("Negative Articles", summary["negative"])
+
+    # Charts cost far more than metrics, so while streaming they are redrawn
+    # only when the page count reaches a power of two.
+    if not done and acc.pages & (acc.pages - 1):
+        return
+
+    avg_sentiment = summary["avg_sentiment"]
+    with slots["distribution"].container():
+        st.subheader("Sentiment Distribution")
+        st.image(chart_png(
+            ticker,
+            charts.fingerprint("distribution", view.counts, avg_sentiment, company_name, ticker),
+            lambda: charts.plot_sentiment_histogram(
+                view.counts, view.edges, avg_sentiment, company_name, ticker
+            ),
+        ))
+
+    with slots["timeline"].container():
+        st.subheader("Sentiment Over Time")
+        sample = view.timeline_sample()
+        if view is acc:
+            # The index trend is None for a window it has no articles for;
+            # the chart then fits the plotted points or leaves the line out.
+            trend, daily = dashboard["trend"], dashboard["daily"][["day", "ema"]]
+        else:
+            trend, daily = None, None
+        st.image(chart_png(
+            ticker,
+            charts.fingerprint("timeline", sample, trend, daily, company_name, ticker),
+            lambda: charts.plot_sentiment_timeline(
+                sample['publishedAt'], sample['sentiment'], company_name, ticker,
+                trend=trend, daily=daily,
+            ),
+        ))
+
+    if done:
+        with slots["table"].container():
+            render_articles_table(view, acc.cluster_sizes)
+
+def render_articles_table(acc, cluster_sizes=None):
+    st.subheader("Recent Articles")
+    articles_df = acc.recent()
+    if acc.articles > len(articles_df):
+        st.caption(f"Showing the newest {len(articles_df)} of {acc.articles} articles")
+
+    labels = {"positive": "🟢 Positive", "negative": "🔴 Negative", "neutral": "⚪ Neutral"}
+    index = core.get_sentiment_index()
+
+    def sentiment_label(score):
+        return labels[index.label(score)]
+
+    articles_df['sentiment_label'] = articles_df['sentiment'].apply(sentiment_label)
+    columns = ['publishedAt', 'title', 'source', 'sentiment', 'sentiment_label', 'url']
+    if cluster_sizes and 'cluster_key' in articles_df:
+        articles_df['copies'] = [cluster_sizes.get(k, 1) for k in articles_df['cluster_key'].tolist()]
+        columns.insert(3, 'copies')
+    display_df = articles_df[columns].copy()
+    display_df['publishedAt'] = display_df['publishedAt'].dt.strftime('%Y-%m-%d %H:%M')
+    display_df = display_df.sort_values('publishedAt', ascending=False)
+
+    st.dataframe(
+        display_df,
+        column_config={
+            "publishedAt": "Published",
+            "title": "Title",
+            "source": "Source",
+            "copies": st.column_config.NumberColumn(
+                "Copies", help="Articles in this story's near-duplicate cluster"
+            ),
+            "sentiment": st.column_config.NumberColumn("Score", format="%.3f"),
+            "sentiment_label": "Sentiment",
+            "url": st.column_config.LinkColumn("Link"),
+        },
+        hide_index=True,
+        use_container_width=True,
+    )
 
 
 # ─────────────────────────────────────────────
-# HPR helpers (ported from notebook)
+# Admin
 # ─────────────────────────────────────────────
 
-def download_daily_prices(ticker, start_date, end_date):
-    return yf.download(ticker, start=start_date, end=end_date,
-                       interval="1d", auto_adjust=False, progress=False)
-
-def extract_adjusted_close(df):
-    x = df.copy()
-    if isinstance(x.columns, pd.MultiIndex):
-        x.columns = x.columns.get_level_values(0)
-    return (
-        x[["Adj Close"]]
-        .rename(columns={"Adj Close": "adj_close"})
-        .reset_index()
-        .rename(columns={"Date": "date"})
-    )
-
-def add_daily_returns(df, price_col="adj_close"):
-    df = df.copy()
-    df["daily_return"] = df[price_col].pct_change()
-    return df
-
-def compute_event_hprs(prices, event_dates, horizons=(1, 5, 10, 20),
-                       ticker=None, date_col="date", price_col="adj_close",
-                       event_col="event_date", direction="backward"):
-    df = prices[[date_col, price_col]].copy()
-    df[date_col] = pd.to_datetime(df[date_col])
-    df = df.sort_values(date_col).reset_index(drop=True)
-    df["pos"] = df.index
-
-    cal = df[[date_col]].drop_duplicates().sort_values(date_col).reset_index(drop=True)
-    events = pd.DataFrame({event_col: pd.to_datetime(event_dates)}).sort_values(event_col)
-
-    event_map = (
-        pd.merge_asof(
-            events,
-            cal.rename(columns={date_col: "event_trading_date"}),
-            left_on=event_col,
-            right_on="event_trading_date",
-            direction=direction,
+def is_admin(username):
+    admins = {u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()}
+    return username in admins
+
+def show_latency_panel():
+    metrics = core.get_metrics()
+    with st.sidebar.expander("Admin — Stage latency", expanded=False):
+        if not metrics.enabled:
+            st.caption("Metrics are off. Set METRICS_ENABLED=1 (or METRICS_FILE / METRICS_PORT).")
+            return
+        summary = metrics.summary()
+        if not summary:
+            st.caption("No spans recorded yet.")
+            return
+        table = pd.DataFrame.from_dict(summary, orient="index")
+        for col in ("mean", "p50", "p95", "p99"):
+            table[col] = (table[col] * 1000).round(1)
+        st.dataframe(
+            table.rename(columns={c: f"{c} (ms)" for c in ("mean", "p50", "p95", "p99")}),
+            use_container_width=True,
         )
-        .merge(
-            df[[date_col, "pos"]].rename(columns={date_col: "event_trading_date"}),
-            on="event_trading_date",
-            how="left",
+        tickers = pd.Series(metrics.ticker_counts(), dtype="int64")
+        if not tickers.empty:
+            top = (tickers.groupby(level=1).sum().sort_values(ascending=False).head(10)
+                   .rename("spans").to_frame())
+            st.caption("Busiest tickers")
+            st.dataframe(top, use_container_width=True)
+        st.download_button("Download Prometheus metrics", metrics.prometheus_text(),
+                           file_name="metrics.prom", mime="text/plain")
+
+
+def format_age(seconds):
+    if seconds is None or pd.isna(seconds):
+        return "never"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} d"
+
+def show_prewarm_panel():
+    with st.sidebar.expander("Admin — Cache pre-warming", expanded=False):
+        prewarmer = core.get_prewarmer()
+        status = prewarmer.status()
+        state = "running" if status["running"] else "not running (set PREWARM_ENABLED=1)"
+        window = "inside" if status["in_window"] else "outside"
+        st.caption(
+            f"Pre-warmer {state}, {window} its off-peak window; "
+            f"{status['requests_available']} NewsAPI requests available, "
+            f"{status['requests_reserved']} of them reserved for interactive use"
+        )
+        table = pd.DataFrame.from_dict(status["tickers"], orient="index")
+        table = table.sort_values("articles", ascending=False, na_position="first")
+        for col in ("articles", "prices"):
+            table[col] = table[col].map(format_age)
+        st.dataframe(
+            table.rename(columns={"articles": "Articles age", "prices": "Prices age",
+                                  "error": "Last error"}),
+            use_container_width=True,
         )
-        .dropna(subset=["pos"])
-    )
-    event_map["pos"] = event_map["pos"].astype(int)
-
-    rows = []
-    n_obs = len(df)
-
-    for _, r in event_map.iterrows():
-        t = r["pos"]
-        for n in horizons:
-            s, e = t - n, t - 1
-            if s >= 0 and e >= 0:
-                rows.append({
-                    "ticker": ticker, event_col: r[event_col],
-                    "event_trading_date": r["event_trading_date"],
-                    "pre_post": "pre", "days": int(n),
-                    "start_date": df.loc[s, date_col],
-                    "end_date": df.loc[e, date_col],
-                    "hpr": df.loc[e, price_col] / df.loc[s, price_col] - 1,
-                })
-            s, e = t, t + n
-            if e < n_obs:
-                rows.append({
-                    "ticker": ticker, event_col: r[event_col],
-                    "event_trading_date": r["event_trading_date"],
-                    "pre_post": "post", "days": int(n),
-                    "start_date": df.loc[s, date_col],
-                    "end_date": df.loc[e, date_col],
-                    "hpr": df.loc[e, price_col] / df.loc[s, price_col] - 1,
-                })
-
-    return (
-        pd.DataFrame(rows)
-        .sort_values([event_col, "pre_post", "days"])
-        .reset_index(drop=True)
-    )
-
-def plot_event_hpr_overlay(hpr_table, horizons=(1, 5, 10, 20), pre_post="post",
-                           event_col="earnings_date", horizon_col="days",
-                           value_col="hpr", title="Event HPR Overlay"):
-    df = hpr_table.copy()
-    df[event_col] = pd.to_datetime(df[event_col])
-    df[horizon_col] = df[horizon_col].astype(int)
-    df = df[df["pre_post"] == pre_post]
-
-    pivot = (
-        df.pivot(index=event_col, columns=horizon_col, values=value_col)
-        .sort_index()
-    )
-    horizons = [int(h) for h in horizons]
-    pivot = pivot.reindex(columns=horizons)
-
-    fig, ax = plt.subplots(figsize=(9, 5))
-    for event_dt, row in pivot.iterrows():
-        ax.plot(horizons, row.values, marker="o", label=event_dt.strftime("%Y-%m-%d"))
-
-    ax.axhline(0, linewidth=1, color="black", linestyle="--", alpha=0.4)
-    ax.set_xlabel("Holding period (trading days)")
-    ax.set_ylabel("Holding Period Return (HPR)")
-    ax.set_title(title)
-    ax.legend(title="Event date", frameon=False)
-    ax.grid(True, alpha=0.3)
-    ax.yaxis.set_major_formatter(PercentFormatter(xmax=1.0))
-    fig.tight_layout()
-    return fig
 
 
 # ─────────────────────────────────────────────
@@ -315,6 +256,10 @@ def main():
     )
 
     init_db()
+    if core.prewarm_enabled():
+        core.get_prewarmer().start()
+    if os.getenv("API_SERVER_PORT"):
+        start_api_server()
 
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
@@ -403,14 +348,30 @@ def main():
             help="Enter a stock ticker (e.g., AAPL, GOOGL, TSLA, NVDA)",
             key="hpr_manual"
         ).upper()
+        show_ticker_suggestions(hpr_ticker)
+    hpr_peers_text = st.sidebar.text_input(
+        "Compare with peers (optional)",
+        value="",
+        placeholder="e.g. AMD, AVGO",
+        key="hpr_peers",
+    )
 
     # ── HPR configuration ─────────────────────
     st.sidebar.subheader("HPR — Configuration")
+    # Years and dates come from the local earnings calendar; a ticker it does
+    # not know yet is fetched in the background while dates can be typed in
+    calendar = core.get_earnings_calendar()
+    if hpr_ticker:
+        calendar.refresh_if_stale(hpr_ticker)
+    year_options = core.hpr_year_options(hpr_ticker)
+    calendar_dates = (
+        calendar.dates_by_year(hpr_ticker, year_options[0], year_options[-1]) if hpr_ticker else {}
+    )
     hpr_years = st.sidebar.multiselect(
         "Years to display",
-        options=[2023, 2024, 2025],
-        default=[2023, 2024, 2025],
-        key="hpr_years"
+        options=year_options,
+        default=year_options[-3:],
+        key=f"hpr_years_{hpr_ticker}"
     )
     hpr_pre_post = st.sidebar.radio(
         "Pre or Post earnings",
@@ -424,20 +385,33 @@ def main():
         default=[1, 5, 10, 20],
         key="hpr_horizons"
     )
+    hpr_benchmark = st.sidebar.text_input(
+        "Benchmark",
+        value=core.DEFAULT_BENCHMARK,
+        help="Market model (alpha/beta over the pre-event window) for abnormal returns",
+        key="hpr_benchmark",
+    ).strip().upper()
+    hpr_measure = st.sidebar.radio(
+        "Return measure",
+        options=list(RETURN_MEASURES),
+        index=0,
+        key="hpr_measure",
+    )
     st.sidebar.subheader("Earnings Dates")
-    default_dates = {
-        2025: "2025-02-26\n2025-05-28\n2025-08-27\n2025-11-19",
-        2024: "2024-02-21\n2024-05-22\n2024-08-28\n2024-11-20",
-        2023: "2023-02-22\n2023-05-24\n2023-08-23\n2023-11-21",
-    }
+    if hpr_ticker and not calendar_dates:
+        st.sidebar.caption(f"No earnings dates cached for {hpr_ticker} yet — they are being "
+                           "fetched in the background. Enter dates below or rerun shortly.")
+    else:
+        st.sidebar.caption(f"{hpr_ticker} dates from the local earnings calendar; edit to "
+                           "override. Peers use their own calendar dates.")
     earnings_inputs = {}
-    for yr in [2023, 2024, 2025]:
+    for yr in hpr_years:
         with st.sidebar.expander(f"{yr} dates", expanded=False):
             earnings_inputs[yr] = st.text_area(
                 f"Dates ({yr})",
-                value=default_dates[yr],
+                value="\n".join(calendar_dates.get(yr, [])),
                 height=110,
-                key=f"hpr_dates_{yr}",
+                key=f"hpr_dates_{hpr_ticker}_{yr}",
                 label_visibility="collapsed"
             )
     run_hpr = st.sidebar.button(
@@ -481,12 +455,29 @@ def main():
             help="Enter a stock ticker (e.g., AAPL, GOOGL, TSLA, NVDA)",
             key="sent_manual"
         ).upper()
-    days = st.sidebar.slider("Days to analyse", min_value=7, max_value=30, value=30, key="sent_days")
+        show_ticker_suggestions(ticker)
+    days = st.sidebar.select_slider(
+        "Days to analyse",
+        options=list(range(7, core.LIVE_WINDOW_DAYS + 1)) + [60, 90, 180, 365, 730, 1095, 1825],
+        value=30,
+        help=f"Windows beyond {core.LIVE_WINDOW_DAYS} days are served from the local article archive",
+        key="sent_days"
+    )
+    duplicate_view = st.sidebar.radio(
+        "Near-duplicate stories",
+        ["Show cluster sizes", "Collapse duplicates"],
+        help="Syndicated copies of one story are scored once; collapsing also counts them once",
+        key="sent_duplicates"
+    )
+    collapse = duplicate_view == "Collapse duplicates"
     analyze_button = st.sidebar.button(
         "🔍 Analyse Sentiment", type="primary", use_container_width=True, key="sent_btn"
     )
 
     st.sidebar.divider()
+    if is_admin(st.session_state.username):
+        show_latency_panel()
+        show_prewarm_panel()
 
     # Top-level tabs
     tab_hpr, tab_sentiment = st.tabs(["📊 HPR Overlay", "📰 Sentiment Analysis"])
@@ -496,9 +487,11 @@ def main():
     # ══════════════════════════════════════════
     with tab_sentiment:
         st.markdown(
-            "Analyse sentiment distribution for the last 30 days from top news articles for any S&P 500 stock."
+            "Analyse sentiment distribution for the selected window of top news articles for any S&P 500 stock."
         )
 
+        slots = sentiment_slots()
+
         if analyze_button:
             if not ticker:
                 st.error("⚠️ Please enter a stock ticker")
@@ -506,121 +499,43 @@ def main():
 
             with st.spinner(f'Fetching news articles for {ticker}...'):
                 track_api_usage(st.session_state.username)
-                company_name = get_company_name(ticker)
-                from_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-                search_query = f"{ticker} stock OR {company_name} stock"
-                articles = get_articles(search_query, from_date)
-
-                if not articles:
-                    st.warning(f"No articles found for {ticker} in the last {days} days")
+                try:
+                    with core.get_metrics().span("analyse_sentiment", ticker):
+                        company_name, acc = core.cached_sentiment(
+                            ticker, days,
+                            on_page=lambda name, partial: render_sentiment(
+                                slots, ticker, name, partial, days, done=False,
+                                collapse=collapse,
+                            ),
+                        )
+                except core.ConfigurationError:
+                    st.error("Server configuration error: API key not found")
+                    return
+                except Exception as e:
+                    st.error(f"Error fetching articles: {str(e)}")
                     return
 
-                articles_df = pd.DataFrame(articles)
-                articles_df = articles_df[['title', 'description', 'publishedAt', 'url', 'source']]
-                articles_df['source'] = articles_df['source'].apply(lambda x: x['name'])
-                articles_df = calculate_sentiment(articles_df)
-
-                st.success(f"Found {len(articles_df)} articles for {company_name} ({ticker})")
-
-                col1, col2, col3, col4 = st.columns(4)
-                avg_sentiment = articles_df['sentiment'].mean()
-                positive_count = len(articles_df[articles_df['sentiment'] > 0.05])
-                negative_count = len(articles_df[articles_df['sentiment'] < -0.05])
-                neutral_count = len(articles_df) - positive_count - negative_count
-
-                with col1:
-                    st.metric("Average Sentiment", f"{avg_sentiment:.3f}")
-                with col2:
-                    st.metric("Positive Articles", positive_count)
-                with col3:
-                    st.metric("Neutral Articles", neutral_count)
-                with col4:
-                    st.metric("Negative Articles", negative_count)
-
-                # Distribution chart
-                st.subheader("Sentiment Distribution")
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.hist(articles_df['sentiment'], bins=30, color='steelblue', edgecolor='black', alpha=0.7)
-                ax.axvline(x=0, color='red', linestyle='--', linewidth=2, label='Neutral')
-                ax.axvline(x=avg_sentiment, color='green', linestyle='--', linewidth=2,
-                           label=f'Average ({avg_sentiment:.3f})')
-                ax.set_xlabel('Sentiment Score', fontsize=12)
-                ax.set_ylabel('Number of Articles', fontsize=12)
-                ax.set_title(f'Sentiment Distribution for {company_name} ({ticker})',
-                             fontsize=14, fontweight='bold')
-                ax.legend()
-                ax.grid(True, alpha=0.3)
-                st.pyplot(fig)
-
-                # Sentiment over time
-                st.subheader("Sentiment Over Time")
-                articles_df['publishedAt'] = pd.to_datetime(articles_df['publishedAt'])
-                articles_df = articles_df.sort_values('publishedAt')
-
-                fig2, ax2 = plt.subplots(figsize=(12, 6))
-                ax2.scatter(articles_df['publishedAt'], articles_df['sentiment'],
-                            alpha=0.6, s=50,
-                            c=articles_df['sentiment'], cmap='RdYlGn',
-                            edgecolors='black')
-                ax2.axhline(y=0, color='red', linestyle='--', linewidth=1, alpha=0.5)
-
-                from scipy import stats
-                x_numeric = (
-                    articles_df['publishedAt'] - articles_df['publishedAt'].min()
-                ).dt.total_seconds()
-                slope, intercept, *_ = stats.linregress(x_numeric, articles_df['sentiment'])
-                trend_line = slope * x_numeric + intercept
-                ax2.plot(articles_df['publishedAt'], trend_line,
-                         color='blue', linewidth=2, label='Trend', alpha=0.7)
-
-                ax2.set_xlabel('Date', fontsize=12)
-                ax2.set_ylabel('Sentiment Score', fontsize=12)
-                ax2.set_title(f'Sentiment Timeline for {company_name} ({ticker})',
-                              fontsize=14, fontweight='bold')
-                ax2.legend()
-                ax2.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                st.pyplot(fig2)
-
-                # Articles table
-                st.subheader("Recent Articles")
-
-                def sentiment_label(score):
-                    if score > 0.05:
-                        return "🟢 Positive"
-                    elif score < -0.05:
-                        return "🔴 Negative"
-                    else:
-                        return "⚪ Neutral"
-
-                articles_df['sentiment_label'] = articles_df['sentiment'].apply(sentiment_label)
-                display_df = articles_df[
-                    ['publishedAt', 'title', 'source', 'sentiment', 'sentiment_label', 'url']
-                ].copy()
-                display_df['publishedAt'] = display_df['publishedAt'].dt.strftime('%Y-%m-%d %H:%M')
-                display_df = display_df.sort_values('publishedAt', ascending=False)
-
-                st.dataframe(
-                    display_df,
-                    column_config={
-                        "publishedAt": "Published",
-                        "title": "Title",
-                        "source": "Source",
-                        "sentiment": st.column_config.NumberColumn("Score", format="%.3f"),
-                        "sentiment_label": "Sentiment",
-                        "url": st.column_config.LinkColumn("Link"),
-                    },
-                    hide_index=True,
-                    use_container_width=True,
-                )
+            if acc.articles == 0:
+                st.session_state.sentiment_result = None
+                st.warning(f"No articles found for {ticker} in the last {days} days")
+                return
+            st.session_state.sentiment_result = (ticker, company_name, acc, days)
+
+        # Keep the last analysis on screen across widget-triggered reruns.
+        if st.session_state.get("sentiment_result") is not None:
+            ticker, company_name, acc, days = st.session_state.sentiment_result
+            render_sentiment(slots, ticker, company_name, acc, days, done=True,
+                             collapse=collapse)
 
     # ══════════════════════════════════════════
     # TAB 2 — HPR OVERLAY
     # ══════════════════════════════════════════
     with tab_hpr:
         st.markdown(
-            "Post-earnings Holding Period Return (HPR) overlay for NVDA across 2023–2025. "
-            "Each line represents one quarterly earnings event; horizons are +1, +5, +10, +20 trading days."
+            "Post-earnings Holding Period Return (HPR) overlay by year, using each ticker's "
+            "earnings dates from the local calendar. "
+            "Each line represents one quarterly earnings event; horizons are +1, +5, +10, +20 trading days. "
+            "Add peer tickers in the sidebar to compare them around their own earnings."
         )
 
         if run_hpr:
@@ -634,16 +549,8 @@ def main():
                 st.error("Please select at least one horizon.")
                 st.stop()
 
-            with st.spinner(f"Downloading price data for {hpr_ticker}..."):
-                try:
-                    raw = download_daily_prices(hpr_ticker, "2022-01-01", "2025-12-31")
-                    if raw.empty:
-                        st.error(f"No price data found for {hpr_ticker}.")
-                        st.stop()
-                    prices = add_daily_returns(extract_adjusted_close(raw))
-                except Exception as e:
-                    st.error(f"Failed to download price data: {e}")
-                    st.stop()
+            peers = [p.strip().upper() for p in hpr_peers_text.replace(";", ",").split(",")]
+            hpr_tickers = list(dict.fromkeys([hpr_ticker] + [p for p in peers if p]))
 
             # Parse earnings dates per year
             parsed_dates = {}
@@ -662,65 +569,153 @@ def main():
                     st.error(err)
                 st.stop()
 
-            # Build HPR tables and render one chart per year
-            st.subheader(
-                f"{'Post' if hpr_pre_post == 'post' else 'Pre'}-Earnings HPR Overlay — {hpr_ticker}"
-            )
-
-            for yr in sorted(hpr_years):
-                dates_for_year = parsed_dates[yr]
-                if not dates_for_year:
-                    st.warning(f"No earnings dates found for {yr}.")
-                    continue
-
-                with st.spinner(f"Computing HPRs for {yr}..."):
+            hpr_messages = {
+                yr: f"No earnings dates found for {yr}."
+                for yr in hpr_years if not parsed_dates[yr]
+            }
+            # The sidebar dates are the main ticker's; peers come from the calendar
+            years = set(hpr_years)
+            event_dates = {
+                t: [d for d in dates if int(d[:4]) in years]
+                for t, dates in core.earnings_dates(hpr_tickers, min(years), max(years)).items()
+            }
+            event_dates[hpr_ticker] = sorted({d for yr in hpr_years for d in parsed_dates[yr]})
+            for peer in hpr_tickers[1:]:
+                if not event_dates[peer]:
+                    st.warning(f"No earnings dates cached for {peer} in the selected years yet.")
+            all_dates = event_dates[hpr_ticker]
+            price_start, price_end = core.hpr_price_window(min(years), max(years),
+                                                           max(hpr_horizons))
+
+            # One batched download and one HPR pass for every ticker and year;
+            # identical runs from any session share results
+            with core.get_metrics().span("run_hpr", hpr_ticker):
+                with st.spinner(f"Downloading prices and computing HPRs for "
+                                f"{', '.join(hpr_tickers)}..."):
                     try:
-                        hpr_table = compute_event_hprs(
-                            prices=prices,
-                            event_dates=dates_for_year,
-                            horizons=hpr_horizons,
-                            ticker=hpr_ticker,
-                            date_col="date",
-                            price_col="adj_close",
+                        hpr_table = core.cached_peer_event_hprs(
+                            hpr_tickers,
+                            event_dates,
+                            hpr_horizons,
+                            price_start,
+                            price_end,
                             event_col="earnings_date",
-                        )
+                            benchmark=hpr_benchmark or None,
+                        ) if all_dates else pd.DataFrame()
+                    except Exception as e:
+                        st.error(f"Failed to compute HPRs: {e}")
+                        st.stop()
 
-                        if hpr_table.empty:
-                            st.warning(f"No HPR data computed for {yr} — dates may be outside price data range.")
-                            continue
+            if all_dates and (hpr_table.empty or hpr_ticker not in set(hpr_table["ticker"])):
+                st.error(f"No price data found for {hpr_ticker}.")
+                st.stop()
+
+            st.session_state.hpr_result = (
+                hpr_tickers, list(hpr_horizons), sorted(hpr_years), hpr_table, hpr_messages,
+                hpr_benchmark,
+            )
 
-                        fig = plot_event_hpr_overlay(
-                            hpr_table,
-                            horizons=hpr_horizons,
+        # Re-render the last run on widget changes; pre/post is a view setting
+        if st.session_state.get("hpr_result") is not None:
+            (result_tickers, result_horizons, result_years, hpr_table, hpr_messages,
+             result_benchmark) = st.session_state.hpr_result
+            side = "Post" if hpr_pre_post == "post" else "Pre"
+            # The return measure is a view setting: every column is computed
+            # on each run whenever a benchmark is set
+            value_col, measure_label, axis_label = RETURN_MEASURES[hpr_measure]
+            if value_col not in hpr_table.columns or (
+                    not hpr_table.empty and hpr_table[value_col].isna().all()):
+                if value_col != "hpr":
+                    st.warning(f"No abnormal returns — no price data for benchmark "
+                               f"{result_benchmark or '(none)'}; showing raw HPR.")
+                value_col, measure_label, axis_label = RETURN_MEASURES["Raw HPR"]
+            elif value_col != "hpr":
+                st.caption(f"{measure_label} vs {result_benchmark}: market model fitted over "
+                           f"{core.ESTIMATION_WINDOW_DAYS} trading days ending "
+                           f"{max(result_horizons)} days before each event.")
+            found = set(hpr_table["ticker"]) if not hpr_table.empty else set()
+            for missing in [t for t in result_tickers if t not in found]:
+                st.warning(f"No price data or HPRs for {missing}.")
+            result_tickers = [t for t in result_tickers if t in found] or result_tickers
+
+            if len(result_tickers) > 1 and not hpr_table.empty:
+                st.subheader(f"{side}-Earnings HPR — Cross-Ticker Summary")
+                summary = core.hpr_summary(hpr_table[hpr_table["pre_post"] == hpr_pre_post],
+                                           value_col=value_col)
+                summary = summary[["ticker", "days", "events", "mean_hpr", "median_hpr", "hit_rate"]]
+                for col in ["mean_hpr", "median_hpr", "hit_rate"]:
+                    summary[col] = summary[col].map(lambda x: f"{x:.2%}")
+                summary.columns = ["Ticker", "Horizon (days)", "Events", f"Mean {measure_label}",
+                                   f"Median {measure_label}", "Hit Rate"]
+                st.dataframe(summary, hide_index=True, use_container_width=True)
+
+            st.subheader(f"{side}-Earnings HPR Overlay — {', '.join(result_tickers)}")
+
+            for yr in result_years:
+                if yr in hpr_messages:
+                    st.warning(hpr_messages[yr])
+                    continue
+                year_table = (
+                    hpr_table[hpr_table["year"] == yr] if not hpr_table.empty else hpr_table
+                )
+                if year_table.empty:
+                    st.warning(f"No HPR data computed for {yr} — dates may be outside price data range.")
+                    continue
+
+                if len(result_tickers) > 1:
+                    title = f"Mean {side}-Earnings HPR by Ticker {yr}"
+                    st.image(chart_png(
+                        ",".join(result_tickers),
+                        charts.fingerprint("hpr_comparison", year_table, result_horizons,
+                                           hpr_pre_post, value_col, title),
+                        lambda: charts.plot_hpr_comparison(
+                            year_table,
+                            horizons=result_horizons,
+                            pre_post=hpr_pre_post,
+                            value_col=value_col,
+                            title=title,
+                            ylabel=f"Mean {axis_label}",
+                        ),
+                    ))
+
+                for result_ticker in result_tickers:
+                    ticker_table = year_table[year_table["ticker"] == result_ticker]
+                    if ticker_table.empty:
+                        continue
+                    title = f"{result_ticker} {side}-Earnings HPR Overlay by Quarter {yr}"
+                    st.image(chart_png(
+                        result_ticker,
+                        charts.fingerprint("hpr_overlay", ticker_table, result_horizons,
+                                           hpr_pre_post, value_col, title),
+                        lambda: charts.plot_event_hpr_overlay(
+                            ticker_table,
+                            horizons=result_horizons,
                             pre_post=hpr_pre_post,
                             event_col="earnings_date",
-                            title=(
-                                f"{hpr_ticker} "
-                                f"{'Post' if hpr_pre_post == 'post' else 'Pre'}-Earnings "
-                                f"HPR Overlay by Quarter {yr}"
-                            ),
+                            value_col=value_col,
+                            title=title,
+                            ylabel=axis_label,
+                        ),
+                    ))
+
+                    # Summary table under each chart
+                    with st.expander(f"Show HPR data table — {result_ticker} {yr}"):
+                        show_df = (
+                            ticker_table[ticker_table["pre_post"] == hpr_pre_post]
+                            [["earnings_date", "days", *dict.fromkeys(["hpr", value_col])]]
+                            .copy()
                         )
-                        st.pyplot(fig)
-                        plt.close(fig)
-
-                        # Summary table under each chart
-                        with st.expander(f"Show HPR data table — {yr}"):
-                            show_df = (
-                                hpr_table[hpr_table["pre_post"] == hpr_pre_post]
-                                [["earnings_date", "days", "hpr"]]
-                                .copy()
-                            )
-                            show_df["earnings_date"] = pd.to_datetime(
-                                show_df["earnings_date"]
-                            ).dt.strftime("%Y-%m-%d")
-                            show_df["hpr"] = show_df["hpr"].map(lambda x: f"{x:.2%}")
-                            show_df.columns = ["Earnings Date", "Horizon (days)", "HPR"]
-                            st.dataframe(show_df, hide_index=True, use_container_width=True)
-
-                    except Exception as e:
-                        st.error(f"Error computing HPR for {yr}: {e}")
-
-            st.success("HPR analysis complete.")
+                        show_df["earnings_date"] = pd.to_datetime(
+                            show_df["earnings_date"]
+                        ).dt.strftime("%Y-%m-%d")
+                        for col in dict.fromkeys(["hpr", value_col]):
+                            show_df[col] = show_df[col].map(lambda x: f"{x:.2%}")
+                        show_df.columns = ["Earnings Date", "Horizon (days)",
+                                           *dict.fromkeys(["HPR", measure_label])]
+                        st.dataframe(show_df, hide_index=True, use_container_width=True)
+
+            if run_hpr:
+                st.success("HPR analysis complete.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────
+# Deterministic synthetic data
+# ─────────────────────────────────────────────
+#
+# Stand-ins for yfinance downloads, earnings calendars and NewsAPI pages,
+# sized in multiples of what one interactive analysis handles today. The
+# same (scale, seed) always yields the same data, so timings are comparable
+# across runs and machines.
+
+# One analysis: ~4 years of daily prices, 4 earnings a year over 3 years,
+# one NewsAPI page of articles.
+PRODUCTION_SIZES = {"price_days": 1000, "events": 12, "articles": 100}
+
+_POSITIVE = ["strong", "beats", "growth", "record", "upgrade", "surge", "great", "win"]
+_NEGATIVE = ["misses", "weak", "lawsuit", "downgrade", "plunge", "bad", "loss", "fears"]
+_NEUTRAL = ["shares", "quarter", "report", "market", "investors", "company", "guidance",
+            "analysts", "revenue", "today", "said", "stock"]
+_SOURCES = ["Reuters", "Bloomberg", "Yahoo Entertainment", "CNBC", "MarketWatch", "Benzinga"]
+
+
+def price_dates(n_days, end="2025-12-31"):
+    # Calendar days rather than business days so 100x histories stay within
+    # pandas' Timestamp range.
+    return pd.date_range(end=end, periods=n_days, freq="D", name="Date")
+
+
+def synthetic_prices(n_days, seed=0, start_price=100.0):
+    """Adjusted closes as a geometric random walk: (date, adj_close)."""
+    rng = np.random.default_rng(seed)
+    dates = price_dates(n_days)
+    closes = start_price * np.cumprod(1 + rng.normal(0.0005, 0.02, n_days))
+    return pd.DataFrame({"date": dates, "adj_close": closes})
+
+
+def synthetic_download(n_days, ticker="SYN", seed=0):
+    """A yf.download-shaped frame: Date index and (Price, Ticker) MultiIndex columns."""
+    prices = synthetic_prices(n_days, seed=seed)
+    close = prices["adj_close"].to_numpy()
+    frame = pd.DataFrame(
+        {
+            ("Adj Close", ticker): close,
+            ("Close", ticker): close,
+            ("High", ticker): close * 1.01,
+            ("Low", ticker): close * 0.99,
+            ("Open", ticker): close,
+            ("Volume", ticker): np.full(n_days, 1_000_000),
+        },
+        index=prices["date"],
+    )
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=["Price", "Ticker"])
+    return frame
+
+
+def synthetic_panel(n_days, tickers, seed=0):
+    """Long-format (ticker, date, adj_close) panel for several tickers."""
+    return pd.concat(
+        [synthetic_prices(n_days, seed=seed + i).assign(ticker=t)
+         for i, t in enumerate(tickers)],
+        ignore_index=True,
+    )[["ticker", "date", "adj_close"]]
+
+
+def synthetic_event_dates(n_events, n_days, seed=0, margin=25):
+    """Sorted, distinct event dates inside the price history, clear of its edges."""
+    rng = np.random.default_rng(seed)
+    dates = price_dates(n_days)[margin:-margin]
+    picks = rng.choice(len(dates), size=min(n_events, len(dates)), replace=False)
+    return [d.strftime("%Y-%m-%d") for d in dates[np.sort(picks)]]
+
+
+def synthetic_articles(n_articles, seed=0, end="2025-12-31"):
+    """NewsAPI article dicts with distinct, sentiment-bearing descriptions."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(_POSITIVE + _NEGATIVE + _NEUTRAL)
+    lengths = rng.integers(12, 40, n_articles)
+    words = rng.choice(vocab, size=int(lengths.sum()))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    published = pd.Timestamp(end, tz="UTC") - pd.to_timedelta(
+        np.sort(rng.integers(0, 30 * 86400, n_articles)), unit="s"
+    )
+    sources = rng.choice(_SOURCES, n_articles)
+    return [
+        {
+            "title": f"Synthetic story {i}",
+            # The index keeps every text distinct, so the memo cannot hide scoring cost.
+            "description": " ".join(words[offsets[i]:offsets[i + 1]]) + f" #{i}",
+            "publishedAt": published[i].strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "url": f"https://example.com/synthetic/{seed}/{i}",
+            "source": {"id": None, "name": str(sources[i])},
+        }
+        for i in range(n_articles)
+    ]
+
+
+def synthetic_hpr_table(n_events, horizons=(1, 5, 10, 20), seed=0):
+    """An event HPR table shaped like compute_event_hprs output."""
+    rng = np.random.default_rng(seed)
+    events = pd.date_range("2023-01-01", periods=n_events, freq="7D")
+    grid = pd.MultiIndex.from_product(
+        [events, ["pre", "post"], list(horizons)], names=["earnings_date", "pre_post", "days"]
+    ).to_frame(index=False)
+    grid["hpr"] = rng.normal(0, 0.05, len(grid))
+    return grid
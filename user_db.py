@@ -0,0 +1,131 @@
+import hashlib
+import queue
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+
+# ─────────────────────────────────────────────
+# Shared users.db connection manager
+# ─────────────────────────────────────────────
+#
+# One instance per process: the schema is created once, WAL-mode connections
+# are pooled and reused across Streamlit's script threads (and with them
+# sqlite3's prepared statement cache), and api_usage increments are buffered
+# and flushed in one transaction by a background thread.
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+class UserDB:
+    def __init__(self, path='users.db', flush_interval=5.0, flush_threshold=100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pool = queue.LifoQueue()
+        self._pending = Counter()
+        self._pending_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._closed = threading.Event()
+        self._init_schema()
+        self._flusher = threading.Thread(target=self._flush_loop, name="usage-flusher",
+                                         daemon=True)
+        self._flusher.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, cached_statements=64,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _init_schema(self):
+        with self.connection() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS users
+            (id TEXT PRIMARY KEY, username TEXT UNIQUE, password_hash TEXT, api_usage INTEGER)
+            ''')
+            conn.commit()
+
+    def create_user(self, username, password):
+        with self.connection() as conn:
+            try:
+                with conn:
+                    conn.execute("INSERT INTO users VALUES (?, ?, ?, ?)",
+                                 (str(uuid.uuid4()), username, hash_password(password), 0))
+                return True
+            except sqlite3.IntegrityError:
+                return False
+
+    def verify_user(self, username, password):
+        with self.connection() as conn:
+            result = conn.execute(
+                "SELECT password_hash FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return bool(result) and result[0] == hash_password(password)
+
+    def track_api_usage(self, username, count=1):
+        """Buffer a usage increment; it reaches the database on the next flush."""
+        with self._pending_lock:
+            self._pending[username] += count
+            if sum(self._pending.values()) >= self.flush_threshold:
+                self._flush_event.set()
+
+    def get_api_usage(self, username):
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT api_usage FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        if row is None:
+            return None
+        with self._pending_lock:
+            return row[0] + self._pending.get(username, 0)
+
+    def flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        try:
+            with self.connection() as conn, conn:
+                conn.executemany(
+                    "UPDATE users SET api_usage = api_usage + ? WHERE username = ?",
+                    [(count, username) for username, count in pending.items()],
+                )
+        except sqlite3.Error:
+            # Put the increments back so a transient lock does not lose usage.
+            with self._pending_lock:
+                self._pending.update(pending)
+            raise
+        return len(pending)
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        self._closed.set()
+        self._flush_event.set()
+        self._flusher.join()
+        self.flush()
+        while not self._pool.empty():
+            self._pool.get_nowait().close()